@@ -0,0 +1,712 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📊 Remote Desktop Web - Benchmark
+Genera carga contra el servidor de sockets con N clientes socket.io
+concurrentes y guarda latencias (p50/p99), throughput y RSS del servidor en
+un informe JSON comparable entre ejecuciones.
+
+Escenarios (cada cliente es un socket autenticado):
+    viewers    reciben screen_frame (todos los sockets reciben pantalla)
+    movers     tormentas de mouse_move en input_batch
+    uploaders  subidas por chunks (file_upload_start + file_chunk)
+    chatters   ráfagas de chat_send
+
+Uso:
+    python benchmark.py --spawn                          # Servidor local con captura y entrada simuladas
+    python benchmark.py --spawn --cluster 4              # Mismo escenario en modo cluster
+    python benchmark.py --url http://127.0.0.1:8443      # Servidor ya arrancado
+    python benchmark.py --spawn --output base.json       # Guardar informe
+    python benchmark.py --spawn --compare base.json      # Comparar con un informe anterior
+    python benchmark.py --spawn --compare base.json --max-regression 15
+
+Requiere: pip install "python-socketio[asyncio_client]" aiohttp
+"""
+
+# asyncio, aiohttp y socketio se importan en las funciones que los usan para
+# que `--help` arranque rápido
+import os
+import sys
+import time
+import json
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+SERVER_DIR = ROOT_DIR / 'server'
+
+DEFAULT_PORT = 8443
+SPAWN_PORT = 18443
+READY_TIMEOUT = 30
+RSS_INTERVAL = 1.0
+ACK_TIMEOUT = 10
+
+# Cabecera binaria de screen_frame (server/src/utils/streamProtocol.js)
+SCREEN_HEADER_FORMAT = '<BBBxIdHHH'
+
+# Métricas comparadas con --compare: (ruta en el informe, mayor es mejor)
+COMPARED_METRICS = [
+    ('screen.fps_per_viewer', True),
+    ('screen.latency_ms.p99', False),
+    ('input.ack_ms.p99', False),
+    ('input.server_latency_ms.p99', False),
+    ('upload.throughput_mb_s', True),
+    ('upload.chunk_ack_ms.p99', False),
+    ('chat.latency_ms.p99', False),
+    ('ping.rtt_ms.p99', False),
+    ('server.rss_mb.max', False),
+]
+
+
+class Colors:
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+
+def import_clients():
+    """Importa los clientes asíncronos o termina con instrucciones de instalación"""
+    try:
+        import aiohttp
+        import socketio
+    except ImportError as e:
+        print(f"{Colors.RED}❌ Falta una dependencia: {e.name}{Colors.ENDC}")
+        print('   pip install "python-socketio[asyncio_client]" aiohttp')
+        sys.exit(2)
+    return aiohttp, socketio
+
+
+def percentiles(values):
+    """p50/p99/máximo de una lista de muestras (ms)"""
+    if not values:
+        return {'count': 0, 'p50': None, 'p99': None, 'max': None}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'count': len(ordered),
+        'p50': round(pick(0.50), 2),
+        'p99': round(pick(0.99), 2),
+        'max': round(ordered[-1], 2),
+    }
+
+
+class Stats:
+    """Muestras compartidas por todos los clientes de una ejecución"""
+
+    def __init__(self):
+        self.frames = 0
+        self.frame_bytes = 0
+        self.frame_latency = []
+        self.input_events = 0
+        self.input_batches = 0
+        self.input_ack = []
+        self.input_server = []
+        self.upload_bytes = 0
+        self.upload_files = 0
+        self.upload_ack = []
+        self.chat_sent = 0
+        self.chat_received = 0
+        self.chat_latency = []
+        self.chat_errors = 0
+        self.ping_rtt = []
+        self.rss = []
+        self.errors = []
+
+
+# ---------------------------------------------------------------------------
+# Servidor local (--spawn)
+# ---------------------------------------------------------------------------
+
+async def spawn_server(args, work_dir):
+    """Arranca el servidor con captura, entrada y sesiones preparadas para carga"""
+    import asyncio
+
+    work_dir = Path(work_dir)
+    (work_dir / 'uploads').mkdir()
+
+    env = dict(os.environ)
+    env.update({
+        'NODE_ENV': 'production',
+        'PORT': str(args.port),
+        'NETWORK_MODE': 'local',
+        'ADMIN_PASSWORD': args.password,
+        'SCREEN_SOURCE': 'synthetic',
+        'SCREEN_SYNTHETIC_SIZE': args.screen_size,
+        'SCREEN_ENGINE': args.engine,
+        'INPUT_BACKEND': 'noop',
+        'ALLOW_CONCURRENT_SESSIONS': 'true',
+        'RATE_LIMIT_MAX': '100000',
+        'CHAT_EVENTS_PER_SECOND': str(max(5, int(args.chat_rate * 2))),
+        'UPLOAD_DIR': str(work_dir / 'uploads'),
+        'CLUSTER_WORKERS': str(args.cluster),
+        'LOG_LEVEL': 'warn',
+    })
+    entry = 'src/cluster.js' if args.cluster > 1 else 'src/index.js'
+
+    # La salida va a un archivo: una tubería sin leer bloquearía al servidor
+    with open(work_dir / 'server.log', 'wb') as log:
+        process = await asyncio.create_subprocess_exec(
+            'node', entry,
+            cwd=SERVER_DIR,
+            env=env,
+            stdout=log,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True
+        )
+    process.log_path = work_dir / 'server.log'
+    return process
+
+
+async def wait_ready(session, url, process=None):
+    """Espera a que /api/health/ping responda"""
+    import asyncio
+
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process is not None and process.returncode is not None:
+            output = process.log_path.read_text(errors='replace')
+            raise RuntimeError(f'El servidor terminó al arrancar:\n{output[-2000:]}')
+        try:
+            async with session.get(f'{url}/api/health/ping') as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f'El servidor no respondió en {READY_TIMEOUT}s')
+
+
+async def stop_server(process):
+    import asyncio
+    import signal
+
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        await asyncio.wait_for(process.wait(), 10)
+    except (ProcessLookupError, asyncio.TimeoutError):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+async def login(session, url, password):
+    """Obtiene un token JWT (se reutiliza en todos los clientes)"""
+    async with session.post(f'{url}/api/auth/login', json={'password': password}) as response:
+        body = await response.json(content_type=None)
+        if response.status != 200:
+            raise RuntimeError(f"Login fallido ({response.status}): {body.get('error')}")
+        return body['token']
+
+
+def parse_rss(text):
+    """Suma process_resident_memory_bytes de todos los workers"""
+    total = 0
+    found = False
+    for line in text.splitlines():
+        if line.startswith('process_resident_memory_bytes'):
+            total += float(line.rsplit(' ', 1)[1])
+            found = True
+    return total if found else None
+
+
+def read_proc_rss(pid):
+    """RSS de un proceso local (Linux) cuando /metrics no está disponible"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+async def sample_rss(session, url, stats, stopping, headers, pid=None):
+    import asyncio
+
+    while not stopping.is_set():
+        rss = None
+        try:
+            async with session.get(f'{url}/metrics', headers=headers) as response:
+                if response.status == 200:
+                    rss = parse_rss(await response.text())
+        except OSError:
+            pass
+        if rss is None and pid is not None:
+            rss = read_proc_rss(pid)
+        if rss is not None:
+            stats.rss.append(rss / (1024 * 1024))
+        try:
+            await asyncio.wait_for(stopping.wait(), RSS_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Clientes
+# ---------------------------------------------------------------------------
+
+async def connect_client(socketio, url, token, stats):
+    """Socket autenticado con protocolo binario que cuenta los frames recibidos"""
+    import struct
+
+    client = socketio.AsyncClient(reconnection=False)
+
+    @client.on('screen_frame')
+    async def on_frame(header, buffers=None):
+        stats.frames += 1
+        if isinstance(header, (bytes, bytearray)):
+            _, _, _, _, timestamp, _, _, _ = struct.unpack_from(SCREEN_HEADER_FORMAT, header)
+            stats.frame_bytes += sum(len(b) for b in buffers or [])
+        else:
+            timestamp = header.get('timestamp', 0)
+        if timestamp:
+            stats.frame_latency.append(time.time() * 1000 - timestamp)
+
+    @client.on('error')
+    async def on_error(data):
+        stats.errors.append(data)
+
+    await client.connect(
+        url,
+        auth={'token': token, 'binary': True},
+        transports=['websocket'],
+        wait_timeout=ACK_TIMEOUT
+    )
+    return client
+
+
+async def run_pinger(client, stats, stopping):
+    """ping_test cada segundo: responsividad del event loop bajo carga"""
+    import asyncio
+
+    pending = {}
+
+    @client.on('pong_test')
+    async def on_pong(timestamp):
+        sent = pending.pop(timestamp, None)
+        if sent is not None:
+            stats.ping_rtt.append((time.perf_counter() - sent) * 1000)
+
+    while not stopping.is_set():
+        timestamp = int(time.time() * 1000)
+        pending[timestamp] = time.perf_counter()
+        await client.emit('ping_test', timestamp)
+        try:
+            await asyncio.wait_for(stopping.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_mover(client, stats, stopping, args, index):
+    """Tormenta de movimientos: un input_batch por frame de animación"""
+    import math
+    import asyncio
+
+    interval = 1.0 / args.move_rate
+    step = index * 1000
+    while not stopping.is_set():
+        events = []
+        for _ in range(args.moves_per_batch):
+            step += 1
+            events.append({
+                'event': 'mouse_move',
+                'x': int(960 + 800 * math.cos(step / 50)),
+                'y': int(540 + 400 * math.sin(step / 50))
+            })
+        started = time.perf_counter()
+        try:
+            await client.call('input_batch', {'events': events}, timeout=ACK_TIMEOUT)
+            stats.input_ack.append((time.perf_counter() - started) * 1000)
+            stats.input_events += len(events)
+            stats.input_batches += 1
+        except Exception as e:
+            stats.errors.append(f'input_batch: {e}')
+        await asyncio.sleep(max(0, interval - (time.perf_counter() - started)))
+
+    try:
+        server = await client.call('input_stats', timeout=ACK_TIMEOUT)
+        if server and server.get('latencyMs'):
+            stats.input_server.append(server['latencyMs'])
+    except Exception as e:
+        stats.errors.append(f'input_stats: {e}')
+
+
+async def run_uploader(client, stats, stopping, args, index):
+    """Sube archivos por chunks, uno tras otro, hasta agotar el tiempo"""
+    import uuid
+
+    chunk_size = args.chunk_kb * 1024
+    file_size = args.upload_mb * 1024 * 1024
+    payload = os.urandom(chunk_size)
+    number = 0
+
+    while not stopping.is_set():
+        number += 1
+        transfer_id = str(uuid.uuid4())
+        ready = await client.call('file_upload_start', {
+            'transferId': transfer_id,
+            'filename': f'benchmark_{index}_{number}.txt',
+            'fileSize': file_size
+        }, timeout=ACK_TIMEOUT)
+        if ready.get('error'):
+            stats.errors.append(f"file_upload_start: {ready['error']}")
+            return
+
+        offset = ready.get('offset', 0)
+        while offset < file_size:
+            if stopping.is_set():
+                await client.emit('file_upload_abort', {'transferId': transfer_id})
+                return
+            chunk = payload[:min(chunk_size, file_size - offset)]
+            started = time.perf_counter()
+            ack = await client.call('file_chunk', {
+                'transferId': transfer_id,
+                'chunk': chunk,
+                'offset': offset,
+                'isLast': offset + len(chunk) >= file_size
+            }, timeout=ACK_TIMEOUT)
+            if ack.get('error'):
+                stats.errors.append(f"file_chunk: {ack['error']}")
+                return
+            stats.upload_ack.append((time.perf_counter() - started) * 1000)
+            stats.upload_bytes += len(chunk)
+            offset = ack['offset']
+        stats.upload_files += 1
+
+
+async def run_chatter(client, stats, stopping, args, index):
+    """Ráfagas de chat: latencia hasta recibir el propio broadcast"""
+    import asyncio
+
+    pending = {}
+
+    @client.on('chat_message')
+    async def on_message(message):
+        content = message.get('content', '') if isinstance(message, dict) else ''
+        sent = pending.pop(content, None)
+        if sent is not None:
+            stats.chat_received += 1
+            stats.chat_latency.append((time.perf_counter() - sent) * 1000)
+
+    # En ráfagas el servidor agrupa los broadcasts en chat_messages
+    @client.on('chat_messages')
+    async def on_messages(messages):
+        for message in messages or []:
+            await on_message(message)
+
+    @client.on('chat_error')
+    async def on_chat_error(data):
+        stats.chat_errors += 1
+
+    await client.emit('chat_join', {'username': f'bench_{index}'})
+    await asyncio.sleep(0.5)
+
+    number = 0
+    while not stopping.is_set():
+        for _ in range(args.chat_burst):
+            number += 1
+            content = f'bench {index}:{number}'
+            pending[content] = time.perf_counter()
+            await client.emit('chat_send', {'content': content})
+            stats.chat_sent += 1
+        try:
+            await asyncio.wait_for(stopping.wait(), args.chat_burst / args.chat_rate)
+        except asyncio.TimeoutError:
+            pass
+
+    await client.emit('chat_leave')
+
+
+# ---------------------------------------------------------------------------
+# Ejecución
+# ---------------------------------------------------------------------------
+
+async def run_benchmark(args):
+    import asyncio
+    import tempfile
+    aiohttp, socketio = import_clients()
+
+    stats = Stats()
+    process = None
+    work_dir = None
+    url = args.url.rstrip('/')
+    metrics_headers = {'Authorization': f'Bearer {args.metrics_token}'} if args.metrics_token else {}
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=ACK_TIMEOUT)) as session:
+        try:
+            if args.spawn:
+                work_dir = tempfile.TemporaryDirectory(prefix='rdw-bench-')
+                process = await spawn_server(args, work_dir.name)
+                url = f'http://127.0.0.1:{args.port}'
+                print(f"{Colors.CYAN}🚀 Servidor de prueba en {url} (pid {process.pid}){Colors.ENDC}")
+            await wait_ready(session, url, process)
+
+            token = await login(session, url, args.password)
+
+            roles = (
+                [('viewer', None)] * args.viewers
+                + [('mover', run_mover)] * args.movers
+                + [('uploader', run_uploader)] * args.uploaders
+                + [('chatter', run_chatter)] * args.chatters
+            )
+            try:
+                clients = await asyncio.gather(*(connect_client(socketio, url, token, stats) for _ in roles))
+            except socketio.exceptions.ConnectionError as e:
+                raise RuntimeError(f'No se pudo conectar el socket: {e}')
+            print(f"{Colors.CYAN}🔌 {len(clients)} clientes conectados, midiendo {args.duration}s...{Colors.ENDC}")
+
+            # La medición empieza con todos los clientes conectados
+            stats.frames = stats.frame_bytes = 0
+            stats.frame_latency.clear()
+
+            stopping = asyncio.Event()
+            tasks = [asyncio.ensure_future(sample_rss(
+                session, url, stats, stopping, metrics_headers, process.pid if process else None
+            ))]
+            for index, ((role, runner), client) in enumerate(zip(roles, clients)):
+                tasks.append(asyncio.ensure_future(run_pinger(client, stats, stopping)))
+                if runner:
+                    tasks.append(asyncio.ensure_future(runner(client, stats, stopping, args, index)))
+
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            stopping.set()
+            elapsed = time.perf_counter() - started
+
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    stats.errors.append(f'{type(result).__name__}: {result}')
+
+            await asyncio.gather(*(client.disconnect() for client in clients), return_exceptions=True)
+        finally:
+            if process is not None:
+                await stop_server(process)
+            if work_dir is not None:
+                work_dir.cleanup()
+
+    return build_report(args, url, stats, elapsed, len(roles))
+
+
+def build_report(args, url, stats, elapsed, clients):
+    """Informe JSON: mismas claves en cada ejecución para poder compararlas"""
+    viewers = max(1, clients)
+    server_latency = [s for s in stats.input_server if s.get('p99') is not None]
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'url': url,
+            'spawned': args.spawn,
+            'cluster_workers': args.cluster if args.spawn else None,
+            'duration_s': round(elapsed, 2),
+            'python': sys.version.split()[0],
+            'scenario': {
+                'viewers': args.viewers,
+                'movers': args.movers,
+                'uploaders': args.uploaders,
+                'chatters': args.chatters,
+                'screen_size': args.screen_size if args.spawn else None,
+                'screen_engine': args.engine if args.spawn else None,
+                'move_rate_hz': args.move_rate,
+                'moves_per_batch': args.moves_per_batch,
+                'upload_mb': args.upload_mb,
+                'chunk_kb': args.chunk_kb,
+                'chat_rate': args.chat_rate,
+                'chat_burst': args.chat_burst,
+            },
+        },
+        'screen': {
+            'frames': stats.frames,
+            'fps_per_viewer': round(stats.frames / viewers / elapsed, 2),
+            'throughput_mb_s': round(stats.frame_bytes / elapsed / 1e6, 3),
+            'latency_ms': percentiles(stats.frame_latency),
+        },
+        'input': {
+            'events': stats.input_events,
+            'batches': stats.input_batches,
+            'events_per_s': round(stats.input_events / elapsed, 1),
+            'ack_ms': percentiles(stats.input_ack),
+            # Peor sesión: tiempo en cola hasta aplicar el evento (input_stats)
+            'server_latency_ms': {
+                'p50': max((s['p50'] for s in server_latency), default=None),
+                'p99': max((s['p99'] for s in server_latency), default=None),
+            },
+        },
+        'upload': {
+            'bytes': stats.upload_bytes,
+            'files': stats.upload_files,
+            'throughput_mb_s': round(stats.upload_bytes / elapsed / 1e6, 3),
+            'chunk_ack_ms': percentiles(stats.upload_ack),
+        },
+        'chat': {
+            'sent': stats.chat_sent,
+            'received': stats.chat_received,
+            'errors': stats.chat_errors,
+            'latency_ms': percentiles(stats.chat_latency),
+        },
+        'ping': {
+            'rtt_ms': percentiles(stats.ping_rtt),
+        },
+        'server': {
+            'rss_mb': {
+                'start': round(stats.rss[0], 1) if stats.rss else None,
+                'max': round(max(stats.rss), 1) if stats.rss else None,
+                'end': round(stats.rss[-1], 1) if stats.rss else None,
+            },
+        },
+        'errors': [str(e) for e in stats.errors[:20]],
+        'error_count': len(stats.errors),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Salida y comparación
+# ---------------------------------------------------------------------------
+
+def lookup(report, path):
+    value = report
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(report, baseline, max_regression):
+    """Cambio porcentual de cada métrica; devuelve las regresiones que superan el límite"""
+    rows = []
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS:
+        current, previous = lookup(report, path), lookup(baseline, path)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous * 100
+        worse = -change if higher_is_better else change
+        rows.append((path, previous, current, change, worse))
+        if max_regression is not None and worse > max_regression:
+            regressions.append(path)
+    return rows, regressions
+
+
+def print_report(report):
+    ms = lambda p: f"p50 {p['p50']} ms · p99 {p['p99']} ms · n={p['count']}" if p.get('count') else '-'
+    meta = report['meta']
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}📊 Benchmark ({meta['duration_s']}s, {meta['url']}){Colors.ENDC}\n")
+    print(f"{Colors.BOLD}Pantalla{Colors.ENDC}")
+    print(f"   {report['screen']['fps_per_viewer']} fps/cliente · {report['screen']['throughput_mb_s']} MB/s")
+    print(f"   latencia captura→cliente: {ms(report['screen']['latency_ms'])}")
+    print(f"{Colors.BOLD}Entrada{Colors.ENDC}")
+    print(f"   {report['input']['events_per_s']} eventos/s · ack: {ms(report['input']['ack_ms'])}")
+    server = report['input']['server_latency_ms']
+    if server['p99'] is not None:
+        print(f"   cola del servidor: p50 {server['p50']} ms · p99 {server['p99']} ms")
+    print(f"{Colors.BOLD}Subidas{Colors.ENDC}")
+    print(f"   {report['upload']['throughput_mb_s']} MB/s · {report['upload']['files']} archivos · chunk: {ms(report['upload']['chunk_ack_ms'])}")
+    print(f"{Colors.BOLD}Chat{Colors.ENDC}")
+    print(f"   {report['chat']['received']}/{report['chat']['sent']} recibidos · {ms(report['chat']['latency_ms'])}")
+    if report['chat']['errors']:
+        print(f"   {Colors.YELLOW}⚠️ {report['chat']['errors']} chat_error (¿límite CHAT_EVENTS_PER_SECOND?){Colors.ENDC}")
+    print(f"{Colors.BOLD}Servidor{Colors.ENDC}")
+    print(f"   ping: {ms(report['ping']['rtt_ms'])}")
+    rss = report['server']['rss_mb']
+    if rss['max'] is not None:
+        print(f"   RSS: {rss['start']} → {rss['end']} MB (máx {rss['max']} MB)")
+    else:
+        print(f"   {Colors.YELLOW}RSS no disponible (¿/metrics sin acceso? usa --metrics-token){Colors.ENDC}")
+
+    if report['error_count']:
+        print(f"\n{Colors.YELLOW}⚠️ {report['error_count']} errores, p. ej.: {report['errors'][0]}{Colors.ENDC}")
+
+
+def print_comparison(rows, regressions, max_regression):
+    print(f"\n{Colors.CYAN}{Colors.BOLD}🔍 Comparación con la referencia{Colors.ENDC}\n")
+    for path, previous, current, change, worse in rows:
+        if max_regression is not None and worse > max_regression:
+            color = Colors.RED
+        elif worse > 0:
+            color = Colors.YELLOW
+        else:
+            color = Colors.GREEN
+        print(f"   {path:32} {previous:>10} → {current:>10}  {color}{change:+6.1f}%{Colors.ENDC}")
+    if regressions:
+        print(f"\n{Colors.RED}❌ Regresiones por encima del {max_regression}%: {', '.join(regressions)}{Colors.ENDC}")
+
+
+def main():
+    import asyncio
+
+    parser = argparse.ArgumentParser(
+        description='Genera carga socket.io contra el servidor y mide latencia, throughput y memoria'
+    )
+    target = parser.add_argument_group('servidor')
+    target.add_argument('--url', default=f'http://127.0.0.1:{DEFAULT_PORT}', help='Servidor ya arrancado (por defecto: %(default)s)')
+    target.add_argument('--spawn', action='store_true', help='Arrancar un servidor local con captura y entrada simuladas')
+    target.add_argument('--port', type=int, default=SPAWN_PORT, help='Puerto del servidor de --spawn (por defecto: %(default)s)')
+    target.add_argument('--cluster', type=int, default=1, help='Workers del servidor de --spawn (por defecto: 1)')
+    target.add_argument('--screen-size', default='1280x720', help='Resolución sintética de --spawn (por defecto: %(default)s)')
+    target.add_argument('--engine', choices=['jpeg', 'ffmpeg'], default='jpeg', help='Motor de captura de --spawn (ffmpeg requiere FFmpeg con libx264; por defecto: %(default)s)')
+    target.add_argument('--password', default=os.environ.get('ADMIN_PASSWORD', 'benchmark'), help='Contraseña de admin (por defecto: $ADMIN_PASSWORD)')
+    target.add_argument('--metrics-token', default=os.environ.get('METRICS_TOKEN'), help='Token de /metrics para leer el RSS')
+
+    scenario = parser.add_argument_group('escenario')
+    scenario.add_argument('--duration', type=float, default=20, help='Segundos de medición (por defecto: %(default)s)')
+    scenario.add_argument('--viewers', type=int, default=4, help='Clientes que solo reciben pantalla (por defecto: %(default)s)')
+    scenario.add_argument('--movers', type=int, default=2, help='Clientes con tormentas de ratón (por defecto: %(default)s)')
+    scenario.add_argument('--uploaders', type=int, default=1, help='Clientes subiendo archivos (por defecto: %(default)s)')
+    scenario.add_argument('--chatters', type=int, default=2, help='Clientes enviando chat (por defecto: %(default)s)')
+    scenario.add_argument('--move-rate', type=float, default=60, help='input_batch por segundo y cliente (por defecto: %(default)s)')
+    scenario.add_argument('--moves-per-batch', type=int, default=8, help='mouse_move por lote (por defecto: %(default)s)')
+    scenario.add_argument('--upload-mb', type=int, default=8, help='Tamaño de cada archivo subido (por defecto: %(default)s MB)')
+    scenario.add_argument('--chunk-kb', type=int, default=256, help='Tamaño de chunk (por defecto: %(default)s KB)')
+    scenario.add_argument('--chat-rate', type=float, default=2, help='Mensajes de chat por segundo y cliente (por defecto: %(default)s)')
+    scenario.add_argument('--chat-burst', type=int, default=5, help='Mensajes por ráfaga (por defecto: %(default)s)')
+
+    output = parser.add_argument_group('informe')
+    output.add_argument('--output', help='Guardar el informe JSON en este archivo')
+    output.add_argument('--json', action='store_true', help='Mostrar el informe en JSON')
+    output.add_argument('--compare', help='Informe JSON de referencia con el que comparar')
+    output.add_argument('--max-regression', type=float, help='Falla (código 1) si alguna métrica empeora más de este porcentaje')
+    args = parser.parse_args()
+
+    if args.max_regression is not None and not args.compare:
+        parser.error('--max-regression requiere --compare')
+
+    try:
+        report = asyncio.run(run_benchmark(args))
+    except (RuntimeError, OSError) as e:
+        print(f"{Colors.RED}❌ {e}{Colors.ENDC}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"\n{Colors.GREEN}💾 Informe guardado en {args.output}{Colors.ENDC}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        rows, regressions = compare(report, baseline, args.max_regression)
+        print_comparison(rows, regressions, args.max_regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,16 @@ import React, { useState, useEffect, useRef, useCallback } from 'react';
 import toast from 'react-hot-toast';
 import './AudioStream.css';
 
+// Códigos de códec de la cabecera binaria
+const AUDIO_CODECS = ['pcm_s16le', 'opus', 'aac'];
+
+// Opus/AAC se decodifican con WebCodecs; sin soporte solo se ofrece PCM
+const SUPPORTS_WEBCODECS = typeof window !== 'undefined' && 'AudioDecoder' in window;
+
+// Margen inicial y máximo del jitter buffer (segundos)
+const JITTER_TARGET = 0.15;
+const JITTER_MAX = 0.6;
+
 const AudioStream = ({ socket, isPublic }) => {
   const [isMinimized, setIsMinimized] = useState(false);
   const [isStreaming, setIsStreaming] = useState(false);
@@ -11,6 +21,12 @@ const AudioStream = ({ socket, isPublic }) => {
   const [audioContext, setAudioContext] = useState(null);
   
   const audioQueue = useRef([]);
+  const pendingBytes = useRef(null);
+  const nextPlayTime = useRef(0);
+  const lastSeq = useRef(0);
+  const decoderRef = useRef(null);
+  const volumeRef = useRef(80);
+  const audioContextRef = useRef(null);
   const isPlaying = useRef(false);
   const canvasRef = useRef(null);
   const animationRef = useRef(null);
@@ -18,10 +34,22 @@ const AudioStream = ({ socket, isPublic }) => {
   useEffect(() => {
     if (!socket) return;
 
-    // Escuchar datos de audio
-    socket.on('audio_data', (data) => {
-      if (isStreaming && data.audio) {
-        playAudioChunk(data.audio);
+    // Escuchar lotes de audio
+    socket.on('audio_data', (data, chunk) => {
+      if (!isStreaming) return;
+
+      if (data instanceof ArrayBuffer) {
+        handleAudioBatch(parseBinaryBatch(data, chunk));
+      } else if (data.audio) {
+        const bytes = decodeBase64(data.audio);
+        handleAudioBatch({
+          codec: data.codec || 'pcm_s16le',
+          seq: data.seq || 0,
+          sampleRate: data.sampleRate || 44100,
+          channels: data.channels || 2,
+          duration: data.duration || 0,
+          frames: splitFrames(bytes, data.frames || [bytes.length])
+        });
       }
     });
 
@@ -47,70 +75,201 @@ const AudioStream = ({ socket, isPublic }) => {
       socket.off('audio_started');
       socket.off('audio_stopped');
       socket.off('audio_error');
-      stopAudio();
     };
   }, [socket, isStreaming]);
 
+  // Liberar decodificador y AudioContext al desmontar
+  useEffect(() => () => {
+    if (decoderRef.current && decoderRef.current.decoder.state !== 'closed') {
+      decoderRef.current.decoder.close();
+    }
+    if (audioContextRef.current && audioContextRef.current.state !== 'closed') {
+      audioContextRef.current.close();
+    }
+  }, []);
+
   // Inicializar AudioContext
+  // (ref: los manejadores de socket pueden tener un closure antiguo)
   const initAudioContext = useCallback(() => {
-    if (!audioContext) {
+    if (!audioContextRef.current || audioContextRef.current.state === 'closed') {
       const ctx = new (window.AudioContext || window.webkitAudioContext)({
         sampleRate: 44100
       });
+      audioContextRef.current = ctx;
       setAudioContext(ctx);
-      return ctx;
     }
-    return audioContext;
-  }, [audioContext]);
+    return audioContextRef.current;
+  }, []);
+
+  // Convertir base64 a bytes (clientes sin protocolo binario)
+  const decodeBase64 = (base64Audio) => {
+    const binaryString = atob(base64Audio);
+    const bytes = new Uint8Array(binaryString.length);
+    for (let i = 0; i < binaryString.length; i++) {
+      bytes[i] = binaryString.charCodeAt(i);
+    }
+    return bytes;
+  };
 
-  // Reproducir chunk de audio
-  const playAudioChunk = useCallback((base64Audio) => {
-    try {
-      const ctx = initAudioContext();
-      if (ctx.state === 'suspended') {
-        ctx.resume();
-      }
+  // Separar los frames concatenados de un lote
+  const splitFrames = (bytes, lengths) => {
+    const frames = [];
+    let offset = 0;
+    for (const length of lengths) {
+      frames.push(bytes.subarray(offset, offset + length));
+      offset += length;
+    }
+    return frames;
+  };
 
-      // Convertir base64 a ArrayBuffer
-      const binaryString = atob(base64Audio);
-      const bytes = new Uint8Array(binaryString.length);
-      for (let i = 0; i < binaryString.length; i++) {
-        bytes[i] = binaryString.charCodeAt(i);
-      }
+  // Cabecera binaria de audio: ver server/src/utils/streamProtocol.js
+  const parseBinaryBatch = (header, chunk) => {
+    const view = new DataView(header);
+    const frameCount = view.getUint8(3);
+    const lengths = [];
+    for (let i = 0; i < frameCount; i++) {
+      lengths.push(view.getUint32(24 + 4 * i, true));
+    }
+    const bytes = new Uint8Array(chunk);
+    return {
+      codec: AUDIO_CODECS[view.getUint8(1)] || 'pcm_s16le',
+      channels: view.getUint8(2),
+      seq: view.getUint32(4, true),
+      sampleRate: view.getUint32(16, true),
+      duration: view.getUint32(20, true),
+      frames: frameCount ? splitFrames(bytes, lengths) : [bytes]
+    };
+  };
 
-      // Convertir a Float32Array (PCM 16-bit)
-      const int16Array = new Int16Array(bytes.buffer);
-      const float32Array = new Float32Array(int16Array.length);
-      
-      for (let i = 0; i < int16Array.length; i++) {
-        float32Array[i] = int16Array[i] / 32768.0;
+  // Jitter buffer: los lotes se encadenan en la línea de tiempo del AudioContext
+  // con un margen inicial; si se vacía se vuelve a cebar y si crece demasiado se descarta.
+  const scheduleBuffer = useCallback((audioBuffer) => {
+    const ctx = initAudioContext();
+    if (ctx.state === 'suspended') {
+      ctx.resume();
+    }
+
+    const now = ctx.currentTime;
+    if (nextPlayTime.current < now + 0.005) {
+      nextPlayTime.current = now + JITTER_TARGET;
+    } else if (nextPlayTime.current - now > JITTER_MAX) {
+      // Demasiado retraso acumulado: descartar para recuperar latencia
+      return;
+    }
+
+    const source = ctx.createBufferSource();
+    source.buffer = audioBuffer;
+    source.connect(ctx.destination);
+    source.start(nextPlayTime.current);
+    nextPlayTime.current += audioBuffer.duration;
+
+    // Visualizar
+    visualizeAudio(audioBuffer.getChannelData(0));
+  }, [initAudioContext]);
+
+  // PCM 16-bit little-endian intercalado -> AudioBuffer
+  const pcmToAudioBuffer = (chunkBytes, sampleRate, channels) => {
+    const ctx = initAudioContext();
+
+    // Unir con el resto del lote anterior si quedó una muestra cortada
+    let bytes = chunkBytes;
+    if (pendingBytes.current) {
+      bytes = new Uint8Array(pendingBytes.current.length + chunkBytes.length);
+      bytes.set(pendingBytes.current, 0);
+      bytes.set(chunkBytes, pendingBytes.current.length);
+      pendingBytes.current = null;
+    }
+    const frameSize = 2 * channels;
+    const usable = bytes.length - (bytes.length % frameSize);
+    if (usable < bytes.length) {
+      pendingBytes.current = bytes.slice(usable);
+    }
+    if (usable === 0) return null;
+
+    const view = new DataView(bytes.buffer, bytes.byteOffset, usable);
+    const frames = usable / frameSize;
+    const gain = volumeRef.current / 100;
+
+    // Crear buffer de audio y separar canales
+    const audioBuffer = ctx.createBuffer(channels, frames, sampleRate);
+
+    for (let ch = 0; ch < channels; ch++) {
+      const channelData = audioBuffer.getChannelData(ch);
+      for (let i = 0; i < frames; i++) {
+        channelData[i] = (view.getInt16((i * channels + ch) * 2, true) / 32768.0) * gain;
       }
+    }
 
-      // Crear buffer de audio
-      const audioBuffer = ctx.createBuffer(2, float32Array.length / 2, 44100);
-      
-      // Separar canales
-      const leftChannel = audioBuffer.getChannelData(0);
-      const rightChannel = audioBuffer.getChannelData(1);
-      
-      for (let i = 0; i < float32Array.length / 2; i++) {
-        leftChannel[i] = float32Array[i * 2] * (volume / 100);
-        rightChannel[i] = float32Array[i * 2 + 1] * (volume / 100);
+    return audioBuffer;
+  };
+
+  // Decodificador WebCodecs (Opus/AAC), recreado si cambia la configuración
+  const getDecoder = (codec, sampleRate, channels) => {
+    const key = `${codec}:${sampleRate}:${channels}`;
+    if (decoderRef.current && decoderRef.current.key === key && decoderRef.current.decoder.state !== 'closed') {
+      return decoderRef.current.decoder;
+    }
+    if (decoderRef.current && decoderRef.current.decoder.state !== 'closed') {
+      decoderRef.current.decoder.close();
+    }
+
+    const decoder = new window.AudioDecoder({
+      output: (audioData) => {
+        const ctx = initAudioContext();
+        const audioBuffer = ctx.createBuffer(audioData.numberOfChannels, audioData.numberOfFrames, audioData.sampleRate);
+        const gain = volumeRef.current / 100;
+        for (let ch = 0; ch < audioData.numberOfChannels; ch++) {
+          const channelData = audioBuffer.getChannelData(ch);
+          audioData.copyTo(channelData, { planeIndex: ch, format: 'f32-planar' });
+          if (gain !== 1) {
+            for (let i = 0; i < channelData.length; i++) channelData[i] *= gain;
+          }
+        }
+        audioData.close();
+        scheduleBuffer(audioBuffer);
+      },
+      error: (err) => console.error('Error decodificando audio:', err)
+    });
+    decoder.configure({
+      codec: codec === 'aac' ? 'mp4a.40.2' : 'opus',
+      sampleRate,
+      numberOfChannels: channels
+    });
+
+    decoderRef.current = { key, decoder };
+    return decoder;
+  };
+
+  // Reproducir un lote de audio
+  const handleAudioBatch = useCallback((batch) => {
+    try {
+      // Hueco en la secuencia: el jitter buffer se re-ceba solo si se vacía
+      if (lastSeq.current && batch.seq > lastSeq.current + 1) {
+        console.warn(`Audio: ${batch.seq - lastSeq.current - 1} lotes perdidos`);
       }
+      lastSeq.current = batch.seq;
 
-      // Crear source y reproducir
-      const source = ctx.createBufferSource();
-      source.buffer = audioBuffer;
-      source.connect(ctx.destination);
-      source.start();
+      if (batch.codec === 'pcm_s16le') {
+        const audioBuffer = pcmToAudioBuffer(batch.frames[0], batch.sampleRate, batch.channels);
+        if (audioBuffer) scheduleBuffer(audioBuffer);
+        return;
+      }
 
-      // Visualizar
-      visualizeAudio(float32Array);
+      if (!SUPPORTS_WEBCODECS) return;
 
+      const decoder = getDecoder(batch.codec, batch.sampleRate, batch.channels);
+      const frameDuration = batch.duration / batch.frames.length;
+      batch.frames.forEach((frame, i) => {
+        decoder.decode(new window.EncodedAudioChunk({
+          type: 'key',
+          timestamp: Math.round((batch.seq - 1) * batch.duration + i * frameDuration),
+          data: frame
+        }));
+      });
     } catch (err) {
       console.error('Error reproduciendo audio:', err);
     }
-  }, [initAudioContext, volume]);
+  }, [initAudioContext, scheduleBuffer]);
 
   // Visualización simple
   const visualizeAudio = (audioData) => {
@@ -252,15 +411,27 @@ const AudioStream = ({ socket, isPublic }) => {
     if (audioContext && audioContext.state !== 'closed') {
       audioContext.suspend();
     }
+    if (decoderRef.current && decoderRef.current.decoder.state !== 'closed') {
+      decoderRef.current.decoder.close();
+    }
+    decoderRef.current = null;
+    nextPlayTime.current = 0;
+    lastSeq.current = 0;
+    pendingBytes.current = null;
     setIsStreaming(false);
   };
 
   const handleVolumeChange = (e) => {
-    setVolume(parseInt(e.target.value));
+    const value = parseInt(e.target.value);
+    volumeRef.current = value;
+    setVolume(value);
   };
 
   const handleQualityChange = (newQuality) => {
     setQuality(newQuality);
+    // El servidor reinicia el stream: la secuencia vuelve a empezar
+    lastSeq.current = 0;
+    pendingBytes.current = null;
     if (isStreaming) {
       socket.emit('audio_set_quality', { quality: newQuality });
       toast.info(`Calidad de audio cambiada a: ${newQuality}`);
@@ -331,6 +502,15 @@ const AudioStream = ({ socket, isPublic }) => {
             >
               Alta
             </button>
+            {SUPPORTS_WEBCODECS && (
+              <button 
+                className={`audio-quality-btn ${quality === 'opus' ? 'active' : ''}`}
+                onClick={() => handleQualityChange('opus')}
+                title="Audio comprimido (Opus): ~20 veces menos ancho de banda"
+              >
+                Opus
+              </button>
+            )}
           </div>
           
           <div className="audio-status">
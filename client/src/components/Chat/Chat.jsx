@@ -10,32 +10,48 @@ const Chat = ({ socket, userId, username }) => {
   const [selectedRecipient, setSelectedRecipient] = useState('broadcast');
   const [isTyping, setIsTyping] = useState(false);
   const [unreadCount, setUnreadCount] = useState(0);
+  // Cursor para pedir mensajes anteriores (null = no hay más)
+  const [historyCursor, setHistoryCursor] = useState(null);
   
   const messagesEndRef = useRef(null);
   const typingTimeoutRef = useRef(null);
+  // Al cargar mensajes anteriores no se salta al final
+  const prependingRef = useRef(false);
 
   useEffect(() => {
     if (!socket) return;
 
-    // Escuchar mensajes entrantes
-    socket.on('chat_message', (message) => {
-      setMessages(prev => [...prev, message]);
+    // Escuchar mensajes entrantes (en ráfagas llegan agrupados en chat_messages)
+    const receiveMessages = (incoming) => {
+      setMessages(prev => [...prev, ...incoming]);
       
       // Incrementar contador si está minimizado
       if (isMinimized) {
-        setUnreadCount(prev => prev + 1);
+        setUnreadCount(prev => prev + incoming.length);
       }
       
       // Mostrar notificación para mensajes privados
-      if (message.type === 'private' && message.to?.id === userId) {
-        toast.success(`💬 Mensaje privado de ${message.from.name}`, {
-          duration: 3000
+      incoming
+        .filter(message => message.type === 'private' && message.to?.id === userId)
+        .forEach(message => {
+          toast.success(`💬 Mensaje privado de ${message.from.name}`, {
+            duration: 3000
+          });
         });
-      }
-    });
+    };
 
+    socket.on('chat_message', (message) => receiveMessages([message]));
+    socket.on('chat_messages', receiveMessages);
+
+    // Página de historial: la primera sustituye, las siguientes van delante
     socket.on('chat_history', (history) => {
-      setMessages(history);
+      if (history.before) {
+        prependingRef.current = true;
+        setMessages(prev => [...history.messages, ...prev]);
+      } else {
+        setMessages(history.messages);
+      }
+      setHistoryCursor(history.nextCursor);
     });
 
     socket.on('chat_users', (users) => {
@@ -64,6 +80,7 @@ const Chat = ({ socket, userId, username }) => {
 
     return () => {
       socket.off('chat_message');
+      socket.off('chat_messages');
       socket.off('chat_history');
       socket.off('chat_users');
       socket.off('chat_user_joined');
@@ -75,6 +92,10 @@ const Chat = ({ socket, userId, username }) => {
 
   // Auto-scroll al último mensaje
   useEffect(() => {
+    if (prependingRef.current) {
+      prependingRef.current = false;
+      return;
+    }
     if (!isMinimized && messagesEndRef.current) {
       messagesEndRef.current.scrollIntoView({ behavior: 'smooth' });
     }
@@ -94,6 +115,11 @@ const Chat = ({ socket, userId, username }) => {
     setIsTyping(false);
   }, [inputMessage, socket, selectedRecipient]);
 
+  const handleLoadOlder = useCallback(() => {
+    if (!socket || historyCursor === null) return;
+    socket.emit('chat_get_history', { before: historyCursor });
+  }, [socket, historyCursor]);
+
   const handleKeyPress = (e) => {
     if (e.key === 'Enter' && !e.shiftKey) {
       e.preventDefault();
@@ -169,6 +195,11 @@ const Chat = ({ socket, userId, username }) => {
       {!isMinimized && (
         <>
           <div className="chat-messages">
+            {historyCursor !== null && (
+              <button className="chat-load-older" onClick={handleLoadOlder}>
+                Cargar mensajes anteriores
+              </button>
+            )}
             {messages.length === 0 ? (
               <div className="chat-empty-state">
                 <div className="chat-empty-state-icon">💬</div>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import toast from 'react-hot-toast';
 import './ClipboardSync.css';
 
@@ -9,6 +9,8 @@ const ClipboardSync = ({ socket, isPublic }) => {
   const [lastSync, setLastSync] = useState(null);
   const [showToast, setShowToast] = useState(false);
   const [toastMessage, setToastMessage] = useState('');
+  // Contenido remoto que llega en varios clipboard_chunk
+  const pendingRef = useRef(null);
 
   useEffect(() => {
     if (!socket) return;
@@ -26,11 +28,40 @@ const ClipboardSync = ({ socket, isPublic }) => {
       showToastNotification('Portapapeles sincronizado');
     });
 
-    socket.on('clipboard_updated', (data) => {
-      // Notificación de que otro cliente actualizó el portapapeles
+    const applyRemoteContent = (content, timestamp) => {
+      setClipboardContent(content);
+      setLastSync(new Date(timestamp));
       showToastNotification('Portapapeles actualizado remotamente');
-      // Solicitar el nuevo contenido
-      socket.emit('clipboard_get');
+    };
+
+    // El servidor envía el contenido nuevo solo cuando cambia (los propios
+    // cambios de este cliente se ignoran)
+    socket.on('clipboard_updated', (data) => {
+      if (data.source === socket.id) return;
+
+      if (data.tooLarge) {
+        showToastNotification('Portapapeles remoto demasiado grande para sincronizar');
+        return;
+      }
+
+      if (data.chunks > 0) {
+        pendingRef.current = { hash: data.hash, timestamp: data.timestamp, parts: new Array(data.chunks), received: 0 };
+        return;
+      }
+
+      applyRemoteContent(data.data, data.timestamp);
+    });
+
+    socket.on('clipboard_chunk', ({ hash, index, data }) => {
+      const pending = pendingRef.current;
+      if (!pending || pending.hash !== hash || pending.parts[index] !== undefined) return;
+
+      pending.parts[index] = data;
+      pending.received++;
+      if (pending.received === pending.parts.length) {
+        pendingRef.current = null;
+        applyRemoteContent(pending.parts.join(''), pending.timestamp);
+      }
     });
 
     socket.on('clipboard_error', (error) => {
@@ -45,6 +76,7 @@ const ClipboardSync = ({ socket, isPublic }) => {
       socket.off('clipboard_content');
       socket.off('clipboard_set_success');
       socket.off('clipboard_updated');
+      socket.off('clipboard_chunk');
       socket.off('clipboard_error');
     };
   }, [socket]);
@@ -6,6 +6,7 @@ import FileTransfer from '../FileTransfer/FileTransfer';
 import ClipboardSync from '../ClipboardSync/ClipboardSync';
 import AudioStream from '../AudioStream/AudioStream';
 import Chat from '../Chat/Chat';
+import VideoStreamPlayer from './videoStream';
 import './DesktopViewer.css';
 
 
@@ -31,6 +32,12 @@ export default function DesktopViewer({ token, onLogout, connectionType = 'priva
   const isPublic = connectionType === 'public' || (connectionInfo?.type === 'public');
   
   const frameCount = useRef(0);
+  const drawQueue = useRef(Promise.resolve());
+  // Reproductor MSE para el motor de vídeo del servidor (se crea con el primer init)
+  const videoPlayer = useRef(null);
+  // Eventos de entrada pendientes: se envían juntos una vez por frame de animación
+  const inputQueue = useRef([]);
+  const inputFrame = useRef(null);
 
   const lastTime = useRef(Date.now());
   const latencyInterval = useRef(null);
@@ -40,7 +47,8 @@ export default function DesktopViewer({ token, onLogout, connectionType = 'priva
     setConnecting(true);
     
     const socket = io(WS_URL, {
-      auth: { token },
+      // binary: recibir frames y audio como adjuntos binarios (sin base64)
+      auth: { token, binary: true },
       transports: ['websocket', 'polling'],
       reconnection: true,
       reconnectionAttempts: 10,
@@ -83,32 +91,121 @@ export default function DesktopViewer({ token, onLogout, connectionType = 'priva
       console.error('Connection error:', error);
     });
 
-    socket.on('screen_frame', (frame) => {
-      const img = new Image();
-      img.onload = () => {
-        const canvas = canvasRef.current;
-        if (!canvas) return;
-        
-        const ctx = canvas.getContext('2d');
-        
+    // Los frames se dibujan en orden: un delta solo es válido sobre el frame anterior
+    const loadImage = (data) => {
+      if (typeof data !== 'string') {
+        return createImageBitmap(new Blob([data], { type: 'image/jpeg' }));
+      }
+      return new Promise((resolve, reject) => {
+        const img = new Image();
+        img.onload = () => resolve(img);
+        img.onerror = reject;
+        img.src = `data:image/jpeg;base64,${data}`;
+      });
+    };
+
+    // Cabecera binaria: ver server/src/utils/streamProtocol.js
+    const FRAME_TYPES = ['full', 'delta', 'init', 'video'];
+    const parseBinaryFrame = (header, buffers) => {
+      const view = new DataView(header);
+      const tileCount = view.getUint16(20, true);
+      const tiles = [];
+      for (let i = 0; i < tileCount; i++) {
+        const offset = 24 + 8 * i;
+        tiles.push({
+          x: view.getUint16(offset, true),
+          y: view.getUint16(offset + 2, true),
+          width: view.getUint16(offset + 4, true),
+          height: view.getUint16(offset + 6, true),
+          data: buffers[i]
+        });
+      }
+      const type = FRAME_TYPES[view.getUint8(1)] || 'full';
+      return {
+        type,
+        key: (view.getUint8(3) & 0x01) !== 0,
+        seq: view.getUint32(4, true),
+        timestamp: view.getFloat64(8, true),
+        width: view.getUint16(16, true),
+        height: view.getUint16(18, true),
+        tiles,
+        data: type === 'delta' ? undefined : tiles[0].data
+      };
+    };
+
+    // Cuenta un frame dibujado para el indicador de FPS
+    const countFrame = () => {
+      frameCount.current++;
+      const now = Date.now();
+      if (now - lastTime.current >= 1000) {
+        setFps(frameCount.current);
+        frameCount.current = 0;
+        lastTime.current = now;
+      }
+    };
+
+    // Segmentos de vídeo (SCREEN_ENGINE=ffmpeg): van directos al SourceBuffer
+    const toBytes = (data) => {
+      if (typeof data !== 'string') return new Uint8Array(data);
+      const binary = atob(data);
+      const bytes = new Uint8Array(binary.length);
+      for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+      return bytes;
+    };
+
+    const handleVideoSegment = (frame) => {
+      if (frame.type === 'init') {
+        if (!videoPlayer.current) {
+          videoPlayer.current = new VideoStreamPlayer(canvasRef.current, {
+            onFrame: countFrame,
+            onResize: (width, height) => setScreenSize({ width, height }),
+            onError: (error) => toast.error(`Error de vídeo: ${error.message}`)
+          });
+        }
+        videoPlayer.current.init(toBytes(frame.data), frame.codec);
+      } else if (videoPlayer.current) {
+        videoPlayer.current.append(toBytes(frame.data));
+      }
+    };
+
+    const drawFrame = async (frame) => {
+      const canvas = canvasRef.current;
+      if (!canvas) return;
+
+      const ctx = canvas.getContext('2d');
+
+      if (frame.type === 'delta') {
+        // Solo se dibujan las regiones que cambiaron
+        const images = await Promise.all(frame.tiles.map((tile) => loadImage(tile.data)));
+        images.forEach((img, i) => {
+          ctx.drawImage(img, frame.tiles[i].x, frame.tiles[i].y);
+          if (img.close) img.close();
+        });
+      } else {
+        const img = await loadImage(frame.data);
+
         if (canvas.width !== img.width || canvas.height !== img.height) {
           canvas.width = img.width;
           canvas.height = img.height;
           setScreenSize({ width: img.width, height: img.height });
         }
-        
+
         ctx.drawImage(img, 0, 0);
-        
-        // Calcular FPS
-        frameCount.current++;
-        const now = Date.now();
-        if (now - lastTime.current >= 1000) {
-          setFps(frameCount.current);
-          frameCount.current = 0;
-          lastTime.current = now;
-        }
-      };
-      img.src = `data:image/jpeg;base64,${frame.data}`;
+        if (img.close) img.close();
+      }
+
+      countFrame();
+    };
+
+    socket.on('screen_frame', (payload, buffers) => {
+      const frame = payload instanceof ArrayBuffer ? parseBinaryFrame(payload, buffers) : payload;
+      if (frame.type === 'init' || frame.type === 'video') {
+        handleVideoSegment(frame);
+        return;
+      }
+      drawQueue.current = drawQueue.current
+        .then(() => drawFrame(frame))
+        .catch((error) => console.error('Frame error:', error));
     });
 
     socket.on('pong_test', (timestamp) => {
@@ -131,10 +228,44 @@ export default function DesktopViewer({ token, onLogout, connectionType = 'priva
 
     return () => {
       clearInterval(latencyInterval.current);
+      cancelAnimationFrame(inputFrame.current);
+      inputFrame.current = null;
+      inputQueue.current = [];
+      if (videoPlayer.current) {
+        videoPlayer.current.close();
+        videoPlayer.current = null;
+      }
       socket.disconnect();
     };
   }, [token, onLogout]);
 
+  // Encolar un evento de entrada; movimientos y scrolls consecutivos se fusionan
+  const queueInput = useCallback((input) => {
+    const queue = inputQueue.current;
+    const last = queue[queue.length - 1];
+
+    if (last && last.event === 'mouse_move' && input.event === 'mouse_move') {
+      last.x = input.x;
+      last.y = input.y;
+    } else if (last && last.event === 'scroll' && input.event === 'scroll') {
+      last.deltaX += input.deltaX;
+      last.deltaY += input.deltaY;
+    } else {
+      queue.push(input);
+    }
+
+    if (inputFrame.current === null) {
+      inputFrame.current = requestAnimationFrame(() => {
+        inputFrame.current = null;
+        const events = inputQueue.current;
+        inputQueue.current = [];
+        if (events.length > 0 && socketRef.current) {
+          socketRef.current.emit('input_batch', { events });
+        }
+      });
+    }
+  }, []);
+
   // Manejadores de input
   const handleMouseMove = useCallback((e) => {
     if (!connected || !socketRef.current) return;
@@ -148,30 +279,30 @@ export default function DesktopViewer({ token, onLogout, connectionType = 'priva
     const x = (e.clientX - rect.left) * scaleX;
     const y = (e.clientY - rect.top) * scaleY;
     
-    socketRef.current.emit('mouse_move', { x, y });
-  }, [connected]);
+    queueInput({ event: 'mouse_move', x, y });
+  }, [connected, queueInput]);
 
   const handleMouseDown = useCallback((e) => {
     if (!connected || !socketRef.current) return;
     e.preventDefault();
     
     const button = e.button === 2 ? 'right' : e.button === 1 ? 'middle' : 'left';
-    socketRef.current.emit('mouse_click', { button, type: 'down' });
-  }, [connected]);
+    queueInput({ event: 'mouse_click', button, type: 'down' });
+  }, [connected, queueInput]);
 
   const handleMouseUp = useCallback((e) => {
     if (!connected || !socketRef.current) return;
     
     const button = e.button === 2 ? 'right' : e.button === 1 ? 'middle' : 'left';
-    socketRef.current.emit('mouse_click', { button, type: 'up' });
-  }, [connected]);
+    queueInput({ event: 'mouse_click', button, type: 'up' });
+  }, [connected, queueInput]);
 
   const handleMouseClick = useCallback((e) => {
     if (!connected || !socketRef.current) return;
     
     const button = e.button === 2 ? 'right' : e.button === 1 ? 'middle' : 'left';
-    socketRef.current.emit('mouse_click', { button, type: 'click' });
-  }, [connected]);
+    queueInput({ event: 'mouse_click', button, type: 'click' });
+  }, [connected, queueInput]);
 
   const handleContextMenu = useCallback((e) => {
     e.preventDefault();
@@ -182,11 +313,8 @@ export default function DesktopViewer({ token, onLogout, connectionType = 'priva
     if (!connected || !socketRef.current) return;
     e.preventDefault();
     
-    socketRef.current.emit('scroll', {
-      deltaX: e.deltaX,
-      deltaY: e.deltaY
-    });
-  }, [connected]);
+    queueInput({ event: 'scroll', deltaX: e.deltaX, deltaY: e.deltaY });
+  }, [connected, queueInput]);
 
   // Captura de teclado
   useEffect(() => {
@@ -204,15 +332,12 @@ export default function DesktopViewer({ token, onLogout, connectionType = 'priva
       if (e.shiftKey) modifiers.push('Shift');
       if (e.metaKey) modifiers.push('Meta');
       
-      socketRef.current.emit('key_press', {
-        key: e.key,
-        modifiers
-      });
+      queueInput({ event: 'key_press', key: e.key, modifiers });
     };
 
     window.addEventListener('keydown', handleKeyDown);
     return () => window.removeEventListener('keydown', handleKeyDown);
-  }, [connected]);
+  }, [connected, queueInput]);
 
   const handleQualityChange = (newQuality) => {
     setQuality(newQuality);
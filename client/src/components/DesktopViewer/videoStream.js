@@ -0,0 +1,179 @@
+/**
+ * Reproducción del motor de vídeo del servidor (SCREEN_ENGINE=ffmpeg).
+ *
+ * Los segmentos de MP4 fragmentado (init + un fragmento por frame) se añaden
+ * a un SourceBuffer de MSE sobre un <video> oculto y cada frame decodificado
+ * se copia al canvas, así el ratón y el teclado siguen funcionando igual que
+ * con el motor JPEG.
+ */
+
+// Si el vídeo se queda más atrás que esto respecto al directo, se salta al final (s)
+const MAX_LATENCY = 0.3;
+// Margen que se deja al saltar al directo (s)
+const LIVE_EDGE = 0.05;
+// Lo reproducido hace más de esto se elimina del SourceBuffer (s)
+const KEEP_BUFFER = 10;
+
+const hex = (value) => value.toString(16).padStart(2, '0').toUpperCase();
+
+/**
+ * Códec RFC 6381 a partir de la caja avcC del segmento de inicialización
+ */
+export const codecFromInit = (bytes) => {
+  for (let i = 4; i + 8 <= bytes.length; i++) {
+    // 'avcC'
+    if (bytes[i] === 0x61 && bytes[i + 1] === 0x76 && bytes[i + 2] === 0x63 && bytes[i + 3] === 0x43) {
+      return `avc1.${hex(bytes[i + 5])}${hex(bytes[i + 6])}${hex(bytes[i + 7])}`;
+    }
+  }
+  return 'avc1.42E01F';
+};
+
+export const isVideoSupported = (codec = 'avc1.42E01F') => typeof window !== 'undefined'
+  && 'MediaSource' in window
+  && window.MediaSource.isTypeSupported(`video/mp4; codecs="${codec}"`);
+
+export default class VideoStreamPlayer {
+  constructor(canvas, { onFrame, onResize, onError } = {}) {
+    this.canvas = canvas;
+    this.onFrame = onFrame;
+    this.onResize = onResize;
+    this.onError = onError;
+
+    this.video = document.createElement('video');
+    this.video.muted = true;
+    this.video.playsInline = true;
+    this.video.autoplay = true;
+
+    this.mediaSource = null;
+    this.sourceBuffer = null;
+    this.objectUrl = null;
+    this.queue = [];
+    this.closed = false;
+
+    this.drawLoop();
+  }
+
+  /**
+   * Segmento de inicialización: nuevo stream (primer frame o ffmpeg reiniciado)
+   */
+  init(data, codec = codecFromInit(data)) {
+    this.reset();
+
+    if (!isVideoSupported(codec)) {
+      if (this.onError) this.onError(new Error(`Códec de vídeo no soportado: ${codec}`));
+      return;
+    }
+
+    const mediaSource = new MediaSource();
+    this.mediaSource = mediaSource;
+    this.queue = [data];
+
+    mediaSource.addEventListener('sourceopen', () => {
+      if (this.mediaSource !== mediaSource) return;
+      // 'sequence': los fragmentos se colocan uno tras otro aunque falten frames descartados
+      const sourceBuffer = mediaSource.addSourceBuffer(`video/mp4; codecs="${codec}"`);
+      sourceBuffer.mode = 'sequence';
+      sourceBuffer.addEventListener('updateend', () => this.onUpdateEnd());
+      this.sourceBuffer = sourceBuffer;
+      this.appendNext();
+    }, { once: true });
+
+    this.objectUrl = URL.createObjectURL(mediaSource);
+    this.video.src = this.objectUrl;
+  }
+
+  /**
+   * Fragmento (moof + mdat) de un frame
+   */
+  append(data) {
+    if (!this.mediaSource) return;
+    this.queue.push(data);
+    this.appendNext();
+  }
+
+  appendNext() {
+    const sourceBuffer = this.sourceBuffer;
+    if (!sourceBuffer || sourceBuffer.updating || this.queue.length === 0) return;
+
+    try {
+      sourceBuffer.appendBuffer(this.queue.shift());
+    } catch (error) {
+      // QuotaExceededError u otro fallo: se descarta y se espera al siguiente init
+      this.queue = [];
+      if (this.onError) this.onError(error);
+    }
+  }
+
+  onUpdateEnd() {
+    const { video, sourceBuffer } = this;
+    const { buffered } = video;
+
+    if (buffered.length > 0) {
+      const end = buffered.end(buffered.length - 1);
+
+      // Ir siempre al directo: la latencia importa más que la fluidez
+      if (end - video.currentTime > MAX_LATENCY) {
+        video.currentTime = Math.max(buffered.start(buffered.length - 1), end - LIVE_EDGE);
+      }
+      if (video.paused) {
+        video.play().catch(() => {});
+      }
+
+      const start = buffered.start(0);
+      if (!sourceBuffer.updating && this.queue.length === 0 && video.currentTime - start > KEEP_BUFFER * 2) {
+        sourceBuffer.remove(start, video.currentTime - KEEP_BUFFER);
+        return;
+      }
+    }
+
+    this.appendNext();
+  }
+
+  /**
+   * Copia cada frame decodificado al canvas
+   */
+  drawLoop() {
+    const { video } = this;
+    const schedule = () => {
+      if (this.closed) return;
+      if (video.requestVideoFrameCallback) {
+        video.requestVideoFrameCallback(draw);
+      } else {
+        requestAnimationFrame(draw);
+      }
+    };
+    const draw = () => {
+      if (this.closed) return;
+      const canvas = this.canvas;
+      if (canvas && video.readyState >= 2 && video.videoWidth > 0) {
+        if (canvas.width !== video.videoWidth || canvas.height !== video.videoHeight) {
+          canvas.width = video.videoWidth;
+          canvas.height = video.videoHeight;
+          if (this.onResize) this.onResize(video.videoWidth, video.videoHeight);
+        }
+        canvas.getContext('2d').drawImage(video, 0, 0);
+        if (this.onFrame) this.onFrame();
+      }
+      schedule();
+    };
+    schedule();
+  }
+
+  reset() {
+    this.queue = [];
+    this.sourceBuffer = null;
+    this.mediaSource = null;
+    this.video.removeAttribute('src');
+    this.video.load();
+    if (this.objectUrl) {
+      URL.revokeObjectURL(this.objectUrl);
+      this.objectUrl = null;
+    }
+  }
+
+  close() {
+    this.closed = true;
+    this.reset();
+  }
+}
@@ -1,12 +1,17 @@
 import React, { useState, useRef, useCallback, useEffect } from 'react';
 import './FileTransfer.css';
 
+const CHUNK_SIZE = 512 * 1024; // 512KB por chunk
+const MAX_CHUNK_RETRIES = 5;
+const ACK_TIMEOUT = 30000;
+
 const FileTransfer = ({ socket, isPublic }) => {
   const [isMinimized, setIsMinimized] = useState(false);
   const [files, setFiles] = useState([]);
   const [uploads, setUploads] = useState([]);
   const [isDragOver, setIsDragOver] = useState(false);
   const fileInputRef = useRef(null);
+  const pendingFiles = useRef(new Map());
 
   // Solicitar lista de archivos al conectar
   useEffect(() => {
@@ -26,6 +31,8 @@ const FileTransfer = ({ socket, isPublic }) => {
       });
 
       socket.on('file_upload_error', (data) => {
+        // Con offset el cliente reintenta; sin él la subida falló definitivamente
+        if (data.offset !== undefined) return;
         setUploads(prev => prev.map(u => 
           u.transferId === data.transferId 
             ? { ...u, error: data.error, status: 'error' }
@@ -33,7 +40,14 @@ const FileTransfer = ({ socket, isPublic }) => {
         ));
       });
 
+      // Reanudar subidas interrumpidas al reconectar
+      const resumeUploads = () => {
+        pendingFiles.current.forEach((file, transferId) => sendFile(transferId));
+      };
+      socket.on('connect', resumeUploads);
+
       return () => {
+        socket.off('connect', resumeUploads);
         socket.off('file_list');
         socket.off('file_upload_success');
         socket.off('file_upload_error');
@@ -79,35 +93,66 @@ const FileTransfer = ({ socket, isPublic }) => {
       status: 'uploading'
     }]);
 
-    // Notificar inicio de upload
-    socket.emit('file_upload_start', {
+    pendingFiles.current.set(transferId, file);
+    sendFile(transferId);
+  };
+
+  // Enviar un evento y esperar la respuesta del servidor (ack)
+  const emitWithAck = (event, payload) => new Promise((resolve) => {
+    socket.timeout(ACK_TIMEOUT).emit(event, payload, (err, response) => {
+      resolve(err ? { error: 'Sin respuesta del servidor', offset: payload.offset } : response);
+    });
+  });
+
+  // Subida por chunks desde el offset que indique el servidor (reanudable)
+  const sendFile = async (transferId) => {
+    const file = pendingFiles.current.get(transferId);
+    if (!file || !socket.connected) return;
+
+    const ready = await emitWithAck('file_upload_start', {
       filename: file.name,
       fileSize: file.size,
       transferId
     });
+    if (ready.error) {
+      pendingFiles.current.delete(transferId);
+      return;
+    }
+
+    let offset = ready.offset || 0;
+    let retries = 0;
 
-    // Simular progreso (en implementación real usaríamos chunks)
-    let progress = 0;
-    const interval = setInterval(() => {
-      progress += 10;
+    do {
+      // Sin conexión: se reanuda al reconectar
+      if (!socket.connected) return;
+
+      const end = Math.min(offset + CHUNK_SIZE, file.size);
+      const chunk = await file.slice(offset, end).arrayBuffer();
+      const result = await emitWithAck('file_chunk', {
+        transferId,
+        chunk,
+        offset,
+        isLast: end === file.size
+      });
+
+      if (result.error) {
+        if (result.offset === undefined || ++retries > MAX_CHUNK_RETRIES) {
+          pendingFiles.current.delete(transferId);
+          return;
+        }
+        offset = result.offset;
+        continue;
+      }
+
+      retries = 0;
+      offset = result.offset;
+      const progress = file.size ? Math.round((offset / file.size) * 100) : 100;
       setUploads(prev => prev.map(u => 
-        u.transferId === transferId ? { ...u, progress: Math.min(progress, 90) } : u
+        u.transferId === transferId ? { ...u, progress, status: 'uploading' } : u
       ));
-      
-      if (progress >= 90) {
-        clearInterval(interval);
-        // Completar upload
-        socket.emit('file_upload_complete', {
-          transferId,
-          filename: file.name,
-          fileSize: file.size
-        });
-        
-        setUploads(prev => prev.map(u => 
-          u.transferId === transferId ? { ...u, progress: 100 } : u
-        ));
-      }
-    }, 200);
+    } while (offset < file.size);
+
+    pendingFiles.current.delete(transferId);
   };
 
   const handleDownload = (filename) => {
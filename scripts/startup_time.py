@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ Remote Desktop Web - Startup Time
+Mide la latencia de arranque de los scripts Python del proyecto usando
+`python -X importtime`
+
+Uso:
+    python scripts/startup_time.py              # Medir todos los entry points
+    python scripts/startup_time.py --runs 20    # Más repeticiones
+    python scripts/startup_time.py --json       # Salida JSON para comparar entre ejecuciones
+    python scripts/startup_time.py --max-ms 150 # Falla si algún entry point supera el límite
+"""
+
+import sys
+import time
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Entry points a medir: (nombre, script, argumentos)
+ENTRY_POINTS = [
+    ('start_project --help', 'start_project.py', ['--help']),
+    ('start_project --check-only', 'start_project.py', ['--check-only']),
+    ('update --help', 'update.py', ['--help']),
+]
+
+TOP_MODULES = 5
+
+
+class Colors:
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+
+def parse_importtime(stderr):
+    """Devuelve (microsegundos totales de import, {módulo de primer nivel: acumulado})"""
+    total_us = 0
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        total_us += self_us
+        if not name.startswith('  '):
+            module = name.strip()
+            top_level[module] = top_level.get(module, 0) + cumulative_us
+    return total_us, top_level
+
+
+def measure(script, args, runs):
+    """Ejecuta un entry point `runs` veces y devuelve sus estadísticas"""
+    walls = []
+    imports = []
+    modules = {}
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', str(ROOT_DIR / script), *args],
+            cwd=ROOT_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        walls.append((time.perf_counter() - start) * 1000)
+        total_us, top_level = parse_importtime(result.stderr)
+        imports.append(total_us / 1000)
+        for module, cumulative in top_level.items():
+            modules.setdefault(module, []).append(cumulative / 1000)
+
+    heaviest = sorted(
+        ((module, statistics.median(values)) for module, values in modules.items()),
+        key=lambda item: item[1],
+        reverse=True
+    )[:TOP_MODULES]
+
+    return {
+        'runs': runs,
+        'wall_ms_median': round(statistics.median(walls), 2),
+        'wall_ms_min': round(min(walls), 2),
+        'import_ms_median': round(statistics.median(imports), 2),
+        'top_modules': [{'module': m, 'ms': round(ms, 2)} for m, ms in heaviest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mide el tiempo de arranque de start_project.py y update.py'
+    )
+    parser.add_argument('--runs', type=int, default=10, help='Repeticiones por entry point (por defecto: 10)')
+    parser.add_argument('--json', action='store_true', help='Mostrar el informe en JSON')
+    parser.add_argument('--max-ms', type=float, help='Falla (código 1) si la mediana de algún entry point supera este valor')
+    args = parser.parse_args()
+
+    report = {
+        'python': sys.version.split()[0],
+        'entry_points': {}
+    }
+    for name, script, script_args in ENTRY_POINTS:
+        report['entry_points'][name] = measure(script, script_args, max(1, args.runs))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{Colors.CYAN}{Colors.BOLD}⏱️  Tiempo de arranque (Python {report['python']}, {args.runs} ejecuciones){Colors.ENDC}\n")
+        for name, stats in report['entry_points'].items():
+            print(f"{Colors.BOLD}{name}{Colors.ENDC}")
+            print(f"   total:   {stats['wall_ms_median']:8.1f} ms (mín {stats['wall_ms_min']:.1f} ms)")
+            print(f"   imports: {stats['import_ms_median']:8.1f} ms")
+            for module in stats['top_modules']:
+                print(f"   {Colors.YELLOW}{module['module']:<28}{Colors.ENDC} {module['ms']:8.1f} ms")
+            print()
+
+    if args.max_ms is not None:
+        slow = [
+            name for name, stats in report['entry_points'].items()
+            if stats['wall_ms_median'] > args.max_ms
+        ]
+        if slow:
+            print(f"{Colors.RED}❌ Superan {args.max_ms:.0f} ms: {', '.join(slow)}{Colors.ENDC}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
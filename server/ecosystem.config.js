@@ -1,12 +1,16 @@
 module.exports = {
   apps: [{
     name: 'remote-desktop-server',
-    script: './src/index.js',
+    // src/cluster.js reparte las conexiones entre workers con sesiones fijas;
+    // pm2 solo gestiona el proceso primario (su modo cluster no es sticky)
+    script: './src/cluster.js',
     instances: 1,
     exec_mode: 'fork',
     env: {
       NODE_ENV: 'production',
-      PORT: 8443
+      PORT: 8443,
+      CLUSTER_WORKERS: 'max',
+      CLUSTER_CAPTURE_WORKER: '1'
     },
     error_file: './logs/err.log',
     out_file: './logs/out.log',
@@ -0,0 +1,128 @@
+import cluster from 'cluster';
+import net from 'net';
+import os from 'os';
+import dotenv from 'dotenv';
+
+import { StateServer } from './services/stateStore.js';
+import logger from './utils/logger.js';
+import { askNetworkMode, logStartup } from './utils/networkMode.js';
+import { CAPTURE_WORKER_ID } from './config/cluster.js';
+
+dotenv.config();
+
+/**
+ * Punto de entrada en modo cluster.
+ *
+ * El proceso primario escucha en el puerto y reparte cada conexión TCP a un
+ * worker según la IP del cliente (sesiones fijas: el polling y el upgrade a
+ * websocket de socket.io llegan siempre al mismo worker). También aloja el
+ * almacén de estado compartido (sesiones, chat, presencia).
+ *
+ * CLUSTER_WORKERS=1 (por defecto) arranca el servidor normal en un proceso.
+ */
+
+const PORT = process.env.PORT || 8443;
+const RESTART_DELAY = 1000;
+
+const resolveWorkerCount = () => {
+  const value = process.env.CLUSTER_WORKERS;
+  if (value === 'max') return os.cpus().length;
+  return Math.max(parseInt(value) || 1, 1);
+};
+
+// Hash FNV-1a de la IP: el mismo cliente va siempre al mismo worker
+const hashAddress = (address = '') => {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < address.length; i++) {
+    hash ^= address.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return hash >>> 0;
+};
+
+const startPrimary = async (workerCount) => {
+  const networkConfig = await askNetworkMode();
+  const stateServer = new StateServer();
+  const slots = new Array(workerCount).fill(null); // posición -> worker listo
+  const pending = [];                              // conexiones antes de tener workers
+  let shuttingDown = false;
+
+  // Serialización avanzada: los Buffers de los frames viajan sin JSON
+  cluster.setupPrimary({ serialization: 'advanced' });
+
+  const dispatch = (connection) => {
+    const ready = slots.filter(Boolean);
+    if (ready.length === 0) {
+      pending.push(connection);
+      return;
+    }
+
+    // Se busca primero la posición fija; si ese worker se está reiniciando, otro
+    const start = hashAddress(connection.remoteAddress) % slots.length;
+    for (let i = 0; i < slots.length; i++) {
+      const worker = slots[(start + i) % slots.length];
+      if (worker) {
+        worker.send({ type: 'sticky:connection' }, connection);
+        return;
+      }
+    }
+  };
+
+  const fork = (index) => {
+    const workerId = String(index + 1);
+    const worker = cluster.fork({
+      CLUSTER_WORKER_ID: workerId,
+      CLUSTER_SIZE: String(workerCount),
+      NETWORK_MODE: networkConfig.mode
+    });
+
+    stateServer.attach(worker);
+
+    worker.on('message', (msg) => {
+      if (msg?.type !== 'worker:ready') return;
+      slots[index] = worker;
+      while (pending.length > 0) dispatch(pending.shift());
+    });
+
+    worker.on('exit', (code, signal) => {
+      slots[index] = null;
+      stateServer.detach(worker);
+      stateServer.publish('cluster:workers', { action: 'exit', workerId });
+
+      if (shuttingDown) return;
+      logger.warn(`⚠️ Worker ${workerId} terminado (${signal || code}), reiniciando...`);
+      setTimeout(() => fork(index), RESTART_DELAY);
+    });
+  };
+
+  for (let i = 0; i < workerCount; i++) {
+    fork(i);
+  }
+
+  const server = net.createServer({ pauseOnConnect: true }, dispatch);
+  server.listen(PORT, networkConfig.host, () => {
+    logStartup(networkConfig, PORT);
+    logger.info(`🧵 Cluster: ${workerCount} workers (captura de pantalla en el worker ${CAPTURE_WORKER_ID})`);
+  });
+
+  const shutdown = (signal) => {
+    logger.info(`${signal} recibido, cerrando cluster...`);
+    shuttingDown = true;
+    server.close();
+    for (const worker of Object.values(cluster.workers)) {
+      worker.kill('SIGTERM');
+    }
+    setTimeout(() => process.exit(0), 5000).unref();
+  };
+
+  process.on('SIGTERM', () => shutdown('SIGTERM'));
+  process.on('SIGINT', () => shutdown('SIGINT'));
+};
+
+const workerCount = resolveWorkerCount();
+
+if (cluster.isPrimary && workerCount > 1) {
+  startPrimary(workerCount);
+} else {
+  await import('./index.js');
+}
@@ -0,0 +1,15 @@
+import dotenv from 'dotenv';
+
+dotenv.config();
+
+// Identificador del worker asignado por src/cluster.js (null en modo de un solo proceso)
+export const WORKER_ID = process.env.CLUSTER_WORKER_ID || null;
+export const IS_CLUSTERED = WORKER_ID !== null && typeof process.send === 'function';
+export const CLUSTER_SIZE = parseInt(process.env.CLUSTER_SIZE) || 1;
+
+// Solo un worker captura la pantalla; el resto recibe los frames por IPC
+export const CAPTURE_WORKER_ID = process.env.CLUSTER_CAPTURE_WORKER || '1';
+export const IS_CAPTURE_WORKER = !IS_CLUSTERED || WORKER_ID === CAPTURE_WORKER_ID;
+
+// Tiempo máximo de espera de una respuesta del almacén de estado compartido
+export const STATE_TIMEOUT_MS = parseInt(process.env.CLUSTER_STATE_TIMEOUT_MS) || 5000;
@@ -7,16 +7,15 @@ import rateLimit from 'express-rate-limit';
 import dotenv from 'dotenv';
 import { fileURLToPath } from 'url';
 import { dirname, join } from 'path';
-import readline from 'readline';
-import { createInterface } from 'readline';
 
 
 import authRoutes from './routes/auth.js';
 import healthRoutes from './routes/health.js';
 import fileTransferRoutes from './routes/fileTransfer.js';
+import metricsRoutes from './routes/metrics.js';
 
 import { authenticateSocket } from './middleware/auth.js';
-import { limiter } from './middleware/rateLimiter.js';
+import { limiter, createSocketEventLimiter } from './middleware/rateLimiter.js';
 import { 
   registerPublicConnection, 
   unregisterPublicConnection, 
@@ -25,14 +24,21 @@ import {
   PUBLIC_ACCESS_ENABLED 
 } from './middleware/publicAccess.js';
 
-import ScreenCaptureService from './services/screenCapture.js';
+import screenBroadcaster from './services/screenBroadcaster.js';
 import InputControlService from './services/inputControl.js';
+import inputPipeline from './services/inputPipeline.js';
 import SystemControlService from './services/systemControl.js';
 import fileTransferService from './services/fileTransfer.js';
 import clipboardService from './services/clipboard.js';
 import audioCaptureService from './services/audioCapture.js';
 import chatService from './services/chat.js';
+import stateStore from './services/stateStore.js';
+import { ClusterAdapter } from './services/clusterAdapter.js';
 import logger from './utils/logger.js';
+import { askNetworkMode, logStartup } from './utils/networkMode.js';
+import { emitAudioChunk, wantsBinary } from './utils/streamProtocol.js';
+import MessageBatcher from './utils/messageBatcher.js';
+import { IS_CLUSTERED, WORKER_ID } from './config/cluster.js';
 
 // Configurar dotenv
 dotenv.config();
@@ -40,36 +46,6 @@ dotenv.config();
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
 
-// Función para preguntar modo de red
-const askNetworkMode = () => {
-  return new Promise((resolve) => {
-    const rl = createInterface({
-      input: process.stdin,
-      output: process.stdout
-    });
-
-    console.log('\n🌐 Seleccione el modo de acceso de red:');
-    console.log('  1. Solo red local (localhost) - Más seguro, solo accesible desde esta computadora');
-    console.log('  2. Cualquier red (público) - Accesible desde cualquier dispositivo en la red\n');
-
-    rl.question('Seleccione una opción (1 o 2): ', (answer) => {
-      rl.close();
-      const choice = answer.trim();
-      if (choice === '1') {
-        console.log('✅ Modo seleccionado: Solo red local (127.0.0.1)\n');
-        resolve({ host: '127.0.0.1', mode: 'local' });
-      } else if (choice === '2') {
-        console.log('⚠️  Modo seleccionado: Acceso público (0.0.0.0) - Cualquier dispositivo en la red puede conectarse\n');
-        resolve({ host: '0.0.0.0', mode: 'public' });
-      } else {
-        console.log('⚠️  Opción inválida. Usando modo seguro: Solo red local\n');
-        resolve({ host: '127.0.0.1', mode: 'local' });
-      }
-    });
-  });
-};
-
-
 const app = express();
 const httpServer = createServer(app);
 const io = new Server(httpServer, {
@@ -83,6 +59,11 @@ const io = new Server(httpServer, {
   transports: ['websocket', 'polling']
 });
 
+// En modo cluster los broadcasts llegan a los sockets de todos los workers
+if (IS_CLUSTERED) {
+  io.adapter(ClusterAdapter);
+}
+
 // Middleware de seguridad
 app.use(helmet({
   contentSecurityPolicy: false
@@ -96,14 +77,20 @@ app.use(cors({
 app.use(express.json());
 app.use(express.urlencoded({ extended: true }));
 
+// Salud antes del rate limit: la sonda de start_project.py no debe gastar
+// intentos de login de localhost
+app.use('/api/health', healthRoutes);
+
 // Rate limiting para API
 app.use('/api/', limiter);
 
 // Rutas
 app.use('/api/auth', authRoutes);
-app.use('/api/health', healthRoutes);
 app.use('/api/files', fileTransferRoutes);
 
+// Métricas Prometheus (fuera de /api: sin rate limit ni JWT)
+app.use('/metrics', metricsRoutes);
+
 // Servir archivos estáticos del cliente en producción
 if (process.env.NODE_ENV === 'production') {
   app.use(express.static(join(__dirname, '../../client/build')));
@@ -114,15 +101,65 @@ if (process.env.NODE_ENV === 'production') {
 }
 
 // Servicios
-const screenCapture = new ScreenCaptureService();
 const inputControl = new InputControlService();
 const systemControl = new SystemControlService();
 
-// Control de sesiones activas
-const activeSessions = new Map();
+// Control de sesiones activas (userId -> socket.id, compartido entre workers)
+const SESSIONS_KEY = 'sessions';
 
-// Buffer para transferencias de archivos
-const fileUploadBuffers = new Map();
+// ALLOW_CONCURRENT_SESSIONS=true permite varias sesiones del mismo usuario
+// (pruebas de carga con N clientes autenticados como admin)
+const SINGLE_SESSION = process.env.ALLOW_CONCURRENT_SESSIONS !== 'true';
+
+// Sesión única por usuario: la anterior puede estar en otro worker
+const claimSession = async (socket) => {
+  const previous = await stateStore.hget(SESSIONS_KEY, socket.user.id);
+  await stateStore.hset(SESSIONS_KEY, socket.user.id, socket.id);
+
+  if (SINGLE_SESSION && previous && previous !== socket.id) {
+    io.to(previous).emit('session_terminated', 'Nueva sesión iniciada en otro dispositivo');
+    io.in(previous).disconnectSockets();
+    logger.warn(`Sesión anterior terminada para usuario: ${socket.user.id}`);
+  }
+};
+
+const releaseSession = async (socket) => {
+  const current = await stateStore.hget(SESSIONS_KEY, socket.user.id);
+  if (current === socket.id) {
+    await stateStore.hdel(SESSIONS_KEY, socket.user.id);
+  }
+};
+
+// Eventos de chat limitados por socket para que no compitan con la entrada
+const limitChatEvents = createSocketEventLimiter({
+  events: ['chat_send', 'chat_typing', 'chat_get_history', 'chat_join'],
+  rate: parseInt(process.env.CHAT_EVENTS_PER_SECOND) || 5,
+  burst: 20,
+  onLimited: (socket) => {
+    socket.emit('chat_error', { message: 'Demasiados mensajes, espera un momento' });
+  }
+});
+
+// Mensajes de chat a todos: en ráfagas se agrupan en un solo chat_messages
+const chatBroadcasts = new MessageBatcher((messages) => {
+  if (messages.length === 1) {
+    io.emit('chat_message', messages[0]);
+  } else {
+    io.emit('chat_messages', messages);
+  }
+}, { windowMs: parseInt(process.env.CHAT_BATCH_MS) || 50 });
+
+// Cambios del portapapeles del host: solo a conexiones privadas (sala
+// "clipboard"); lo que no cabe en un mensaje va en clipboard_chunk
+const CLIPBOARD_ROOM = 'clipboard';
+
+clipboardService.on('change', (content) => {
+  const { header, chunks } = clipboardService.toMessages(content);
+  io.to(CLIPBOARD_ROOM).emit('clipboard_updated', header);
+  chunks.forEach((data, index) => {
+    io.to(CLIPBOARD_ROOM).emit('clipboard_chunk', { hash: header.hash, index, data });
+  });
+});
 
 // WebSocket con autenticación
 io.use(authenticateSocket);
@@ -154,80 +191,71 @@ io.on('connection', (socket) => {
     socket.emit('connection_info', { 
       type: 'public', 
       message: 'Conexión pública establecida - Acceso limitado',
-      expiresIn: '1h'
+      expiresIn: '1h',
+      binary: wantsBinary(socket)
     });
   } else {
     socket.emit('connection_info', { 
       type: 'private', 
-      message: 'Conexión privada establecida - Acceso completo' 
+      message: 'Conexión privada establecida - Acceso completo',
+      binary: wantsBinary(socket)
     });
+    socket.join(CLIPBOARD_ROOM);
   }
 
   // Verificar sesión única por usuario
-  if (activeSessions.has(socket.user.id)) {
-    const oldSocket = activeSessions.get(socket.user.id);
-    oldSocket.emit('session_terminated', 'Nueva sesión iniciada en otro dispositivo');
-    oldSocket.disconnect();
-    logger.warn(`Sesión anterior terminada para usuario: ${socket.user.id}`);
-  }
-  activeSessions.set(socket.user.id, socket);
+  claimSession(socket).catch((err) => logger.error('Error registrando sesión:', err));
 
-  // Iniciar transmisión de pantalla
-  let screenInterval;
+  limitChatEvents(socket);
+
+  // Protocolo binario negociado en el handshake (auth.binary); si no, base64
+  const binaryTransport = wantsBinary(socket);
+
+  // Iniciar transmisión de pantalla (bucle de captura compartido por perfil)
   let audioStreamId = null;
-  
-  const startScreenStream = () => {
-    screenInterval = setInterval(async () => {
-      try {
-        const frame = await screenCapture.capture();
-        if (socket.connected) {
-          socket.emit('screen_frame', frame);
-        }
-      } catch (error) {
-        logger.error('Error captura pantalla:', error);
-        socket.emit('error', { type: 'screen', message: 'Error al capturar pantalla' });
-      }
-    }, 100); // 10 FPS
-  };
 
-  startScreenStream();
+  screenBroadcaster.subscribe(socket);
 
-  // Control de mouse
-  socket.on('mouse_move', async (data) => {
-    try {
-      await inputControl.moveMouse(data.x, data.y);
-    } catch (err) {
-      logger.error('Error mouse move:', err);
-      socket.emit('error', { type: 'input', message: err.message });
-    }
+  // Entrada (ratón/teclado/scroll): cola ordenada por sesión que fusiona
+  // movimientos y scrolls consecutivos mientras se aplica el evento anterior
+  const input = inputPipeline.create(socket.id, inputControl, {
+    onApplied: () => screenBroadcaster.boost(socket),
+    onError: (err) => socket.emit('error', { type: 'input', message: err.message })
   });
 
-  socket.on('mouse_click', async (data) => {
-    try {
-      await inputControl.click(data.button, data.type);
-    } catch (err) {
-      logger.error('Error mouse click:', err);
-      socket.emit('error', { type: 'input', message: err.message });
-    }
+  socket.on('mouse_move', (data) => {
+    input.push({ event: 'mouse_move', x: data?.x, y: data?.y });
+  });
+
+  socket.on('mouse_click', (data) => {
+    input.push({ event: 'mouse_click', button: data?.button, type: data?.type });
   });
 
   // Control de teclado
-  socket.on('key_press', async (data) => {
-    try {
-      await inputControl.keyPress(data.key, data.modifiers);
-    } catch (err) {
-      logger.error('Error key press:', err);
-      socket.emit('error', { type: 'input', message: err.message });
-    }
+  socket.on('key_press', (data) => {
+    input.push({ event: 'key_press', key: data?.key, modifiers: data?.modifiers || [] });
   });
 
   // Scroll
-  socket.on('scroll', async (data) => {
-    try {
-      await inputControl.scroll(data.deltaX, data.deltaY);
-    } catch (err) {
-      logger.error('Error scroll:', err);
-      socket.emit('error', { type: 'input', message: err.message });
+  socket.on('scroll', (data) => {
+    input.push({ event: 'scroll', deltaX: data?.deltaX || 0, deltaY: data?.deltaY || 0 });
+  });
+
+  // Lote de eventos de entrada (el cliente agrupa por frame de animación)
+  socket.on('input_batch', (data, callback) => {
+    const events = Array.isArray(data) ? data : data?.events;
+    const accepted = input.pushBatch(events);
+    if (typeof callback === 'function') {
+      callback({ accepted, queueDepth: input.getStats().queueDepth });
+    }
+  });
+
+  socket.on('input_stats', (callback) => {
+    const stats = input.getStats();
+    if (typeof callback === 'function') {
+      callback(stats);
+    } else {
+      socket.emit('input_stats', stats);
     }
   });
 
@@ -266,12 +294,12 @@ io.on('connection', (socket) => {
 
   // Configuración de calidad
   socket.on('set_quality', (quality) => {
-    screenCapture.setQuality(quality);
+    screenBroadcaster.updateProfile(socket, { quality });
     logger.info(`Calidad cambiada a: ${quality}`);
   });
 
   socket.on('set_scale', (scale) => {
-    screenCapture.setScale(scale);
+    screenBroadcaster.updateProfile(socket, { scale });
     logger.info(`Escala cambiada a: ${scale}`);
   });
 
@@ -282,8 +310,9 @@ io.on('connection', (socket) => {
 
   // Desconexión
   socket.on('disconnect', (reason) => {
-    clearInterval(screenInterval);
-    activeSessions.delete(socket.user.id);
+    screenBroadcaster.unsubscribe(socket);
+    inputPipeline.remove(socket.id);
+    releaseSession(socket).catch((err) => logger.error('Error liberando sesión:', err));
     
     // Detener stream de audio si existe
     if (audioStreamId) {
@@ -291,19 +320,22 @@ io.on('connection', (socket) => {
     }
     
     // Desregistrar del chat
-    const user = chatService.unregisterUser(socket.user.id);
-    if (user) {
-      socket.broadcast.emit('chat_user_left', { id: socket.user.id, username: user.username });
-      socket.broadcast.emit('chat_users', chatService.getConnectedUsersList());
-    }
+    chatService.unregisterUser(socket.user.id, socket.id)
+      .then(async (user) => {
+        if (user) {
+          socket.broadcast.emit('chat_user_left', { id: socket.user.id, username: user.username });
+          socket.broadcast.emit('chat_users', await chatService.getConnectedUsersList());
+        }
+      })
+      .catch((err) => logger.error('Error saliendo del chat:', err));
     
     // Desregistrar conexión pública si aplica
     if (isPublicConnection(socket)) {
       unregisterPublicConnection(socket.user.id);
     }
     
-    // Limpiar buffers de upload
-    fileUploadBuffers.delete(socket.user.id);
+    // Cerrar uploads en curso (los parciales se conservan para reanudar)
+    fileTransferService.releaseUploads(socket.user.id);
     
     logger.info(`Cliente desconectado: ${socket.user.id} - Razón: ${reason}`);
   });
@@ -316,62 +348,58 @@ io.on('connection', (socket) => {
   });
 
   // Transferencia de archivos vía Socket.io
-  socket.on('file_upload_start', (data) => {
-    const { filename, fileSize, transferId } = data;
+  // Los chunks se escriben directamente a disco; una subida interrumpida se
+  // reanuda repitiendo file_upload_start con el mismo transferId.
+  socket.on('file_upload_start', async (data, ack) => {
+    const { filename, fileSize, transferId } = data || {};
     logger.info(`📤 Iniciando upload: ${filename} (${fileTransferService.formatBytes(fileSize)})`);
     
     try {
-      fileTransferService.validateFile(filename, fileSize);
-      
-      // Inicializar buffer para este upload
-      fileUploadBuffers.set(transferId, {
-        chunks: [],
-        filename: fileTransferService.sanitizeFilename(filename),
-        fileSize: fileSize,
-        receivedBytes: 0,
-        socketId: socket.id
-      });
-      
-      socket.emit('file_upload_ready', { transferId, status: 'ready' });
+      const { offset } = await fileTransferService.startUpload(transferId, filename, fileSize, socket.user.id);
+      const response = { transferId, status: 'ready', offset };
+      socket.emit('file_upload_ready', response);
+      if (typeof ack === 'function') ack(response);
     } catch (error) {
       socket.emit('file_upload_error', { transferId, error: error.message });
+      if (typeof ack === 'function') ack({ transferId, error: error.message });
     }
   });
 
-  socket.on('file_chunk', async (data) => {
-    const { transferId, chunk, isLast } = data;
+  // Consultar cuántos bytes tiene ya el servidor de una transferencia
+  socket.on('file_upload_offset', async (data, ack) => {
+    const transferId = data?.transferId;
+    try {
+      const offset = await fileTransferService.getUploadOffset(transferId, socket.user.id);
+      const response = offset === null
+        ? { transferId, error: 'Transferencia no encontrada' }
+        : { transferId, offset };
+      socket.emit('file_upload_offset', response);
+      if (typeof ack === 'function') ack(response);
+    } catch (error) {
+      socket.emit('file_upload_error', { transferId, error: error.message });
+      if (typeof ack === 'function') ack({ transferId, error: error.message });
+    }
+  });
+
+  socket.on('file_chunk', async (data, ack) => {
+    const { transferId, chunk, offset, checksum, isLast } = data || {};
     
     try {
-      const upload = fileUploadBuffers.get(transferId);
-      if (!upload) {
-        throw new Error('Transferencia no encontrada');
-      }
-      
-      // Convertir chunk de base64 a buffer
-      const buffer = Buffer.from(chunk, 'base64');
-      upload.chunks.push(buffer);
-      upload.receivedBytes += buffer.length;
+      // Chunk binario (adjunto socket.io) o base64 (clientes antiguos)
+      const buffer = Buffer.isBuffer(chunk) ? chunk : Buffer.from(chunk || '', 'base64');
+      const received = await fileTransferService.writeChunk(transferId, buffer, {
+        offset,
+        checksum,
+        owner: socket.user.id
+      });
       
       // Emitir progreso
-      const progress = Math.round((upload.receivedBytes / upload.fileSize) * 100);
-      socket.emit('file_upload_progress', { transferId, progress });
+      const progress = fileTransferService.getTransferProgress(transferId);
+      socket.emit('file_upload_progress', { transferId, progress: progress.percentage, offset: received });
       
-      // Si es el último chunk, guardar archivo
+      // Si es el último chunk, mover el archivo a su nombre definitivo
       if (isLast) {
-        const finalBuffer = Buffer.concat(upload.chunks);
-        const stream = require('stream');
-        const readable = new stream.Readable();
-        readable.push(finalBuffer);
-        readable.push(null);
-        
-        const result = await fileTransferService.saveFile(
-          readable,
-          upload.filename,
-          upload.fileSize,
-          transferId
-        );
-        
-        fileUploadBuffers.delete(transferId);
+        const result = await fileTransferService.finishUpload(transferId);
         
         socket.emit('file_upload_success', {
           transferId,
@@ -379,12 +407,29 @@ io.on('connection', (socket) => {
           message: 'Archivo subido correctamente'
         });
         
-        logger.info(`✅ Upload completado: ${upload.filename}`);
+        logger.info(`✅ Upload completado: ${result.filename}`);
       }
+
+      if (typeof ack === 'function') ack({ transferId, offset: received });
     } catch (error) {
-      fileUploadBuffers.delete(transferId);
       logger.error(`❌ Error en file_chunk: ${error.message}`);
-      socket.emit('file_upload_error', { transferId, error: error.message });
+      // Con offset el cliente puede reintentar desde ahí; sin él la subida se descarta
+      if (error.offset === undefined) {
+        await fileTransferService.abortUpload(transferId, socket.user.id).catch(() => {});
+      }
+      const response = { transferId, error: error.message, offset: error.offset };
+      socket.emit('file_upload_error', response);
+      if (typeof ack === 'function') ack(response);
+    }
+  });
+
+  socket.on('file_upload_abort', async (data) => {
+    try {
+      if (data?.transferId) {
+        await fileTransferService.abortUpload(data.transferId, socket.user.id);
+      }
+    } catch (error) {
+      socket.emit('file_upload_error', { transferId: data.transferId, error: error.message });
     }
   });
 
@@ -400,17 +445,26 @@ io.on('connection', (socket) => {
     });
   });
 
-  socket.on('request_file_list', async () => {
+  socket.on('request_file_list', async (options = {}) => {
     try {
-      const files = await fileTransferService.getFileList();
+      const result = await fileTransferService.listFiles({
+        cursor: options.cursor || null,
+        limit: Math.min(Math.max(parseInt(options.limit) || 100, 1), 1000),
+        sort: options.sort,
+        order: options.order,
+        filter: options.filter
+      });
       socket.emit('file_list', { 
         success: true, 
-        files: files.map(file => ({
+        total: result.total,
+        nextCursor: result.nextCursor,
+        files: result.files.map(file => ({
           name: file.name,
           size: file.size,
           sizeFormatted: fileTransferService.formatBytes(file.size),
           modified: file.modified
-        }))
+        })),
+        cursor: options.cursor || null
       });
     } catch (error) {
       socket.emit('file_list_error', { error: error.message });
@@ -418,6 +472,27 @@ io.on('connection', (socket) => {
   });
 
   // Streaming de audio
+
+  // (Re)inicia la captura con la calidad indicada; los lotes se envían en el formato del socket
+  const startAudioStream = (quality) => {
+    if (audioStreamId) {
+      audioCaptureService.stopCapture(audioStreamId);
+    }
+
+    audioCaptureService.setQuality(quality);
+    audioStreamId = `audio_${socket.user.id}_${Date.now()}`;
+
+    return audioCaptureService.startCapture(
+      audioStreamId,
+      (chunk, info) => {
+        emitAudioChunk(socket, chunk, info, binaryTransport);
+      },
+      (error) => {
+        logger.error(`Error en stream de audio: ${error.message}`);
+        socket.emit('audio_error', { message: error.message });
+      }
+    );
+  };
   
   socket.on('audio_start', async (data) => {
     if (isPublicConnection(socket)) {
@@ -433,33 +508,11 @@ io.on('connection', (socket) => {
         return;
       }
       
-      // Detener stream anterior si existe
-      if (audioStreamId) {
-        audioCaptureService.stopCapture(audioStreamId);
-      }
-      
-      // Configurar calidad
       const quality = data?.quality || 'medium';
-      audioCaptureService.setQuality(quality);
-      
-      // Generar ID único para este stream
-      audioStreamId = `audio_${socket.user.id}_${Date.now()}`;
-      
-      // Iniciar captura
-      const success = audioCaptureService.startCapture(
-        audioStreamId,
-        (audioData) => {
-          // Enviar datos de audio al cliente
-          socket.emit('audio_data', { audio: audioData, timestamp: Date.now() });
-        },
-        (error) => {
-          logger.error(`Error en stream de audio: ${error.message}`);
-          socket.emit('audio_error', { message: error.message });
-        }
-      );
+      const success = startAudioStream(quality);
       
       if (success) {
-        socket.emit('audio_started', { streamId: audioStreamId, quality });
+        socket.emit('audio_started', { streamId: audioStreamId, quality, codec: audioCaptureService.codec });
         logger.info(`🎵 Audio streaming iniciado para ${socket.user.id} (calidad: ${quality})`);
       } else {
         socket.emit('audio_error', { message: 'No se pudo iniciar la captura de audio' });
@@ -482,8 +535,18 @@ io.on('connection', (socket) => {
   
   socket.on('audio_set_quality', (data) => {
     const quality = data?.quality || 'medium';
-    audioCaptureService.setQuality(quality);
     logger.info(`🎵 Calidad de audio cambiada a: ${quality}`);
+
+    // Reiniciar el stream activo con el nuevo códec/calidad
+    if (audioStreamId) {
+      if (startAudioStream(quality)) {
+        socket.emit('audio_started', { streamId: audioStreamId, quality, codec: audioCaptureService.codec });
+      } else {
+        socket.emit('audio_error', { message: 'No se pudo iniciar la captura de audio' });
+      }
+    } else {
+      audioCaptureService.setQuality(quality);
+    }
   });
 
   // Sincronización de portapapeles
@@ -502,16 +565,10 @@ io.on('connection', (socket) => {
     try {
       const { content, type } = data;
       clipboardService.validateContent(content, type || 'text/plain');
-      await clipboardService.setClipboard(content, type);
+      // El resto de clientes recibe clipboard_updated desde el vigilante
+      await clipboardService.setClipboard(content, type || 'text/plain', socket.id);
       socket.emit('clipboard_set_success', { timestamp: Date.now() });
       logger.info(`📋 Portapapeles actualizado por ${socket.user.id}`);
-      
-      // Notificar a otros clientes conectados (excepto al remitente)
-      socket.broadcast.emit('clipboard_updated', {
-        type: type || 'text/plain',
-        timestamp: Date.now(),
-        source: socket.user.id
-      });
     } catch (error) {
       socket.emit('clipboard_error', { message: error.message });
       logger.error('Error estableciendo portapapeles:', error);
@@ -519,90 +576,118 @@ io.on('connection', (socket) => {
   });
 
   // Chat integrado
-  socket.on('chat_join', (data) => {
-    const username = data?.username || `Usuario_${socket.user.id.slice(0, 6)}`;
-    const users = chatService.registerUser(socket.user.id, socket.id, username);
+  socket.on('chat_join', async (data) => {
+    try {
+      const username = data?.username || `Usuario_${socket.user.id.slice(0, 6)}`;
+      const users = await chatService.registerUser(socket.user.id, socket.id, username);
     
-    // Notificar al usuario que se unió
-    socket.emit('chat_joined', { id: socket.user.id, username });
-    socket.emit('chat_users', users);
+      // Notificar al usuario que se unió
+      socket.emit('chat_joined', { id: socket.user.id, username });
+      socket.emit('chat_users', users);
     
-    // Notificar a otros usuarios
-    socket.broadcast.emit('chat_user_joined', { id: socket.user.id, username });
-    socket.broadcast.emit('chat_users', users);
+      // Notificar a otros usuarios
+      socket.broadcast.emit('chat_user_joined', { id: socket.user.id, username });
+      socket.broadcast.emit('chat_users', users);
     
-    logger.info(`💬 Usuario ${username} se unió al chat`);
+      logger.info(`💬 Usuario ${username} se unió al chat`);
+    } catch (error) {
+      logger.error('Error en chat:', error);
+      socket.emit('chat_error', { message: 'Error procesando el chat' });
+    }
   });
 
-  socket.on('chat_leave', () => {
-    const user = chatService.unregisterUser(socket.user.id);
-    if (user) {
-      socket.broadcast.emit('chat_user_left', { id: socket.user.id, username: user.username });
-      socket.broadcast.emit('chat_users', chatService.getConnectedUsersList());
-      logger.info(`💬 Usuario ${user.username} salió del chat`);
+  socket.on('chat_leave', async () => {
+    try {
+      const user = await chatService.unregisterUser(socket.user.id, socket.id);
+      if (user) {
+        socket.broadcast.emit('chat_user_left', { id: socket.user.id, username: user.username });
+        socket.broadcast.emit('chat_users', await chatService.getConnectedUsersList());
+        logger.info(`💬 Usuario ${user.username} salió del chat`);
+      }
+    } catch (error) {
+      logger.error('Error en chat:', error);
+      socket.emit('chat_error', { message: 'Error procesando el chat' });
     }
   });
 
-  socket.on('chat_send', (data) => {
-    const { content, to, type } = data;
-    
-    // Validar mensaje
-    if (!content || typeof content !== 'string' || !content.trim()) {
-      socket.emit('chat_error', { message: 'El mensaje no puede estar vacío' });
-      return;
-    }
+  socket.on('chat_send', async (data) => {
+    try {
+      const { content, to, type } = data || {};
     
-    // Validar longitud máxima
-    if (content.length > 1000) {
-      socket.emit('chat_error', { message: 'El mensaje es demasiado largo (máx 1000 caracteres)' });
-      return;
-    }
+      // Validar mensaje
+      if (!content || typeof content !== 'string' || !content.trim()) {
+        socket.emit('chat_error', { message: 'El mensaje no puede estar vacío' });
+        return;
+      }
     
-    // Validar tipo
-    const validTypes = ['text', 'private', 'broadcast'];
-    const messageType = type || 'broadcast';
-    if (!validTypes.includes(messageType)) {
-      socket.emit('chat_error', { message: 'Tipo de mensaje inválido' });
-      return;
-    }
+      // Validar longitud máxima
+      if (content.length > 1000) {
+        socket.emit('chat_error', { message: 'El mensaje es demasiado largo (máx 1000 caracteres)' });
+        return;
+      }
     
-    if (messageType === 'private' && to) {
-      // Mensaje privado
-      const message = chatService.sendPrivateMessage(content, socket.user.id, to);
-      
-      if (message.error) {
-        socket.emit('chat_error', { message: message.error });
+      // Validar tipo
+      const validTypes = ['text', 'private', 'broadcast'];
+      const messageType = type || 'broadcast';
+      if (!validTypes.includes(messageType)) {
+        socket.emit('chat_error', { message: 'Tipo de mensaje inválido' });
         return;
       }
+    
+      if (messageType === 'private' && to) {
+        // Mensaje privado
+        const result = await chatService.sendPrivateMessage(content, socket.user.id, to);
       
-      // Enviar al remitente
-      socket.emit('chat_message', message);
+        if (result.error) {
+          socket.emit('chat_error', { message: result.error });
+          return;
+        }
       
-      // Enviar al destinatario
-      const targetSocket = activeSessions.get(to);
-      if (targetSocket) {
-        targetSocket.emit('chat_message', message);
-      }
+        // Enviar al remitente
+        socket.emit('chat_message', result.message);
       
-    } else {
-      // Mensaje broadcast
-      const message = chatService.broadcastMessage(content, socket.user.id);
+        // Enviar al destinatario (el adaptador lo entrega aunque esté en otro worker)
+        io.to(result.toSocketId).emit('chat_message', result.message);
+      
+      } else {
+        // Mensaje broadcast
+        const message = await chatService.broadcastMessage(content, socket.user.id);
+        if (!message) {
+          socket.emit('chat_error', { message: 'Debes unirte al chat para enviar mensajes' });
+          return;
+        }
       
-      // Enviar a todos los usuarios conectados
-      io.emit('chat_message', message);
+        // Enviar a todos los usuarios conectados
+        chatBroadcasts.push(message);
+      }
+    } catch (error) {
+      logger.error('Error en chat:', error);
+      socket.emit('chat_error', { message: 'Error procesando el chat' });
     }
   });
 
-  socket.on('chat_get_history', () => {
-    const history = chatService.getHistory(50);
-    socket.emit('chat_history', history);
+  // Historial paginado: { before: cursor, limit, with: userId | 'broadcast' }
+  socket.on('chat_get_history', async (data) => {
+    try {
+      const before = data?.before ?? null;
+      const history = await chatService.getHistory({
+        userId: socket.user.id,
+        withUserId: data?.with || null,
+        before,
+        limit: data?.limit
+      });
+      socket.emit('chat_history', { ...history, before });
+    } catch (error) {
+      logger.error('Error en chat:', error);
+      socket.emit('chat_error', { message: 'Error procesando el chat' });
+    }
   });
 
   socket.on('chat_typing', (data) => {
     // Broadcast a todos excepto al remitente
     socket.broadcast.emit('chat_user_typing', {
       userId: socket.user.id,
-      isTyping: data.isTyping
+      isTyping: Boolean(data?.isTyping)
     });
   });
 });
@@ -617,33 +702,24 @@ const PORT = process.env.PORT || 8443;
 
 // Iniciar servidor con selección de modo de red
 const startServer = async () => {
+  // Un único vigilante del portapapeles por host (worker de captura)
+  clipboardService.start().catch((err) => logger.error('Error iniciando portapapeles:', err));
+
+  if (IS_CLUSTERED) {
+    // El primario acepta las conexiones y las reparte por IP (sesiones fijas)
+    process.on('message', (msg, connection) => {
+      if (msg?.type !== 'sticky:connection' || !connection) return;
+      httpServer.emit('connection', connection);
+      connection.resume();
+    });
+    process.send({ type: 'worker:ready' });
+    logger.info(`🧵 Worker ${WORKER_ID} listo (pid ${process.pid})`);
+    return;
+  }
+
   const networkConfig = await askNetworkMode();
   
-  httpServer.listen(PORT, networkConfig.host, () => {
-    logger.info(`🚀 Servidor remoto ejecutándose en puerto ${PORT}`);
-    logger.info(`📱 Acceso local: http://localhost:${PORT}`);
-    
-    if (networkConfig.mode === 'public') {
-      const networkInterfaces = Object.values(require('os').networkInterfaces())
-        .flat()
-        .filter(iface => iface.family === 'IPv4' && !iface.internal)
-        .map(iface => iface.address);
-      
-      if (networkInterfaces.length > 0) {
-        logger.info(`🌐 Acceso de red: http://${networkInterfaces[0]}:${PORT}`);
-        logger.info(`   (disponible en cualquier dispositivo de la red)`);
-      }
-    } else {
-      logger.info(`🔒 Acceso restringido: Solo localhost (127.0.0.1)`);
-    }
-    
-    if (PUBLIC_ACCESS_ENABLED) {
-      logger.info(`🌐 Acceso público internet: Habilitado (máx: ${process.env.MAX_PUBLIC_CONNECTIONS || 5} conexiones)`);
-    } else {
-      logger.info(`🌐 Acceso público internet: Deshabilitado`);
-    }
-    logger.info(`🔒 Modo: ${process.env.NODE_ENV || 'development'}`);
-  });
+  httpServer.listen(PORT, networkConfig.host, () => logStartup(networkConfig, PORT));
 };
 
 startServer();
@@ -11,4 +11,31 @@ export const limiter = rateLimit({
       retryAfter: Math.ceil(req.rateLimit.resetTime / 1000)
     });
   }
-});
\ No newline at end of file
+});
+/**
+ * Limita la frecuencia de ciertos eventos de socket (token bucket por socket).
+ * Evita que una sesión que inunda el chat retrase la entrada de las demás.
+ */
+export const createSocketEventLimiter = ({ events, rate = 5, burst = 20, onLimited = null }) => {
+  const limited = new Set(events);
+
+  return (socket) => {
+    let tokens = burst;
+    let last = Date.now();
+
+    socket.use(([event], next) => {
+      if (!limited.has(event)) return next();
+
+      const now = Date.now();
+      tokens = Math.min(burst, tokens + ((now - last) / 1000) * rate);
+      last = now;
+
+      if (tokens < 1) {
+        if (onLimited) onLimited(socket, event);
+        return;
+      }
+      tokens -= 1;
+      next();
+    });
+  };
+};
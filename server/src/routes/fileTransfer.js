@@ -1,9 +1,10 @@
 import { Router } from 'express';
-import { createReadStream } from 'fs';
 import { requireAuth } from '../middleware/auth.js';
 
 import fileTransferService from '../services/fileTransfer.js';
 import logger from '../utils/logger.js';
+import { sendFileWithRanges } from '../utils/rangeRequest.js';
+import { downloadBytesTotal } from '../utils/metrics.js';
 
 const router = Router();
 
@@ -11,13 +12,30 @@ const router = Router();
 router.use(requireAuth);
 
 
-// Listar archivos disponibles
+// Listar archivos disponibles (paginado, con ETag)
 router.get('/files', async (req, res) => {
   try {
-    const files = await fileTransferService.getFileList();
+    const query = {
+      cursor: req.query.cursor || null,
+      limit: Math.min(Math.max(parseInt(req.query.limit) || 100, 1), 1000),
+      sort: req.query.sort || 'modified',
+      order: req.query.order || 'desc',
+      filter: req.query.filter || ''
+    };
+    const result = await fileTransferService.listFiles(query);
+    const etag = fileTransferService.getListingETag(query, result.version);
+
+    res.setHeader('ETag', etag);
+    res.setHeader('Cache-Control', 'private, no-cache');
+    if (req.headers['if-none-match'] === etag) {
+      return res.status(304).end();
+    }
+
     res.json({
       success: true,
-      files: files.map(file => ({
+      total: result.total,
+      nextCursor: result.nextCursor,
+      files: result.files.map(file => ({
         name: file.name,
         size: file.size,
         sizeFormatted: fileTransferService.formatBytes(file.size),
@@ -31,22 +49,35 @@ router.get('/files', async (req, res) => {
   }
 });
 
-// Descargar archivo
+// Descargar archivo (Range / multirango, 304 condicional, HEAD)
 router.get('/download/:filename', async (req, res) => {
+  const { filename } = req.params;
+  let fileData;
+
   try {
-    const { filename } = req.params;
-    const fileData = await fileTransferService.getFileStream(filename);
-    
-    res.setHeader('Content-Length', fileData.size);
-    res.setHeader('Content-Disposition', `attachment; filename="${filename}"`);
-    res.setHeader('Last-Modified', fileData.mtime.toUTCString());
-    
-    fileData.stream.pipe(res);
-    
-    logger.info(`📥 Archivo descargado: ${filename} por usuario ${req.user.id}`);
+    fileData = await fileTransferService.getFileInfo(filename);
   } catch (error) {
-    logger.error(`Error descargando archivo ${req.params.filename}:`, error);
-    res.status(404).json({ success: false, error: error.message });
+    logger.error(`Error descargando archivo ${filename}:`, error);
+    return res.status(404).json({ success: false, error: error.message });
+  }
+
+  try {
+    res.setHeader('Content-Disposition', `attachment; filename="${encodeURIComponent(filename)}"`);
+    const { status, bytes } = await sendFileWithRanges(req, res, fileData.filepath, fileData.stat);
+
+    if (status === 200 || status === 206) {
+      downloadBytesTotal.inc({ status: String(status) }, bytes);
+      logger.info(`📥 Archivo descargado: ${filename} (${status}, ${fileTransferService.formatBytes(bytes)}) por usuario ${req.user.id}`);
+    }
+  } catch (error) {
+    // Cliente desconectado a mitad de descarga: se reanudará con Range
+    if (error.code === 'ERR_STREAM_PREMATURE_CLOSE') return;
+    logger.error(`Error descargando archivo ${filename}:`, error);
+    if (!res.headersSent) {
+      res.status(500).json({ success: false, error: error.message });
+    } else {
+      res.destroy(error);
+    }
   }
 });
 
@@ -68,6 +99,25 @@ router.delete('/files/:filename', async (req, res) => {
   }
 });
 
+// Offset de una subida en curso (para reanudarla)
+router.get('/uploads/:transferId', async (req, res) => {
+  try {
+    const { transferId } = req.params;
+    const offset = await fileTransferService.getUploadOffset(transferId, req.user.id);
+
+    if (offset === null) {
+      return res.status(404).json({
+        success: false,
+        error: 'Transferencia no encontrada'
+      });
+    }
+
+    res.json({ success: true, transferId, offset });
+  } catch (error) {
+    res.status(403).json({ success: false, error: error.message });
+  }
+});
+
 // Obtener progreso de transferencia
 router.get('/progress/:transferId', (req, res) => {
   const { transferId } = req.params;
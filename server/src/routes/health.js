@@ -10,7 +10,8 @@ router.get('/', (req, res) => {
     uptime: process.uptime(),
     memory: process.memoryUsage(),
     platform: os.platform(),
-    version: process.version
+    version: process.version,
+    worker: process.env.CLUSTER_WORKER_ID || null
   });
 });
 
@@ -0,0 +1,237 @@
+import { Router } from 'express';
+import { randomUUID } from 'crypto';
+
+import screenBroadcaster from '../services/screenBroadcaster.js';
+import inputPipeline from '../services/inputPipeline.js';
+import audioCaptureService from '../services/audioCapture.js';
+import fileTransferService from '../services/fileTransfer.js';
+import stateStore from '../services/stateStore.js';
+import registry, { Registry, CONTENT_TYPE } from '../utils/metrics.js';
+import logger from '../utils/logger.js';
+import { IS_CLUSTERED, WORKER_ID, CLUSTER_SIZE } from '../config/cluster.js';
+
+const router = Router();
+
+// Con METRICS_TOKEN se exige "Authorization: Bearer <token>"; sin él solo localhost
+const METRICS_TOKEN = process.env.METRICS_TOKEN || null;
+const LOOPBACK = ['127.0.0.1', '::1', '::ffff:127.0.0.1'];
+
+// Espera máxima por las métricas del resto de workers
+const CLUSTER_SCRAPE_TIMEOUT = parseInt(process.env.METRICS_CLUSTER_TIMEOUT_MS) || 500;
+
+// ---------------------------------------------------------------------------
+// Valores que ya mantienen los servicios: se leen al hacer scrape
+// ---------------------------------------------------------------------------
+
+registry.counter({
+  name: 'remote_desktop_screen_socket_frames_total',
+  help: 'Frames emitidos por socket',
+  labelNames: ['socket', 'profile'],
+  collect() {
+    this.reset();
+    for (const viewer of screenBroadcaster.getStats().viewers) {
+      this.inc({ socket: viewer.socketId, profile: viewer.profile }, viewer.sent);
+    }
+  }
+});
+
+registry.counter({
+  name: 'remote_desktop_screen_socket_bytes_total',
+  help: 'Bytes de imagen emitidos por socket',
+  labelNames: ['socket', 'profile'],
+  collect() {
+    this.reset();
+    for (const viewer of screenBroadcaster.getStats().viewers) {
+      this.inc({ socket: viewer.socketId, profile: viewer.profile }, viewer.bytes);
+    }
+  }
+});
+
+registry.counter({
+  name: 'remote_desktop_screen_socket_dropped_total',
+  help: 'Frames descartados o fusionados por socket',
+  labelNames: ['socket', 'profile'],
+  collect() {
+    this.reset();
+    for (const viewer of screenBroadcaster.getStats().viewers) {
+      this.inc({ socket: viewer.socketId, profile: viewer.profile }, viewer.dropped);
+    }
+  }
+});
+
+registry.gauge({
+  name: 'remote_desktop_screen_socket_backlog_bytes',
+  help: 'Bytes pendientes de escribir en el websocket',
+  labelNames: ['socket'],
+  collect() {
+    this.reset();
+    for (const viewer of screenBroadcaster.getStats().viewers) {
+      this.set({ socket: viewer.socketId }, viewer.backlog.bytes);
+    }
+  }
+});
+
+registry.gauge({
+  name: 'remote_desktop_screen_loop_fps',
+  help: 'Frame rate objetivo de cada bucle de captura (perfil = pantalla:calidad:escala)',
+  labelNames: ['profile'],
+  collect() {
+    this.reset();
+    for (const loop of screenBroadcaster.getStats().loops) {
+      if (loop.fps !== undefined) this.set({ profile: loop.profile }, loop.fps);
+    }
+  }
+});
+
+registry.gauge({
+  name: 'remote_desktop_screen_loop_subscribers',
+  help: 'Suscriptores de cada bucle de captura',
+  labelNames: ['profile'],
+  collect() {
+    this.reset();
+    for (const loop of screenBroadcaster.getStats().loops) {
+      this.set({ profile: loop.profile }, loop.subscribers);
+    }
+  }
+});
+
+registry.gauge({
+  name: 'remote_desktop_input_queue_depth',
+  help: 'Eventos de entrada pendientes por socket',
+  labelNames: ['socket'],
+  collect() {
+    this.reset();
+    for (const session of inputPipeline.getStats().sessions) {
+      this.set({ socket: session.socketId }, session.queueDepth);
+    }
+  }
+});
+
+registry.counter({
+  name: 'remote_desktop_input_events_total',
+  help: 'Eventos de entrada por socket y resultado',
+  labelNames: ['socket', 'result'],
+  collect() {
+    this.reset();
+    for (const session of inputPipeline.getStats().sessions) {
+      for (const result of ['applied', 'coalesced', 'dropped', 'errors']) {
+        this.inc({ socket: session.socketId, result }, session[result]);
+      }
+    }
+  }
+});
+
+registry.counter({
+  name: 'remote_desktop_audio_stream_bytes_total',
+  help: 'Bytes de audio por stream activo',
+  labelNames: ['stream', 'codec'],
+  collect() {
+    this.reset();
+    for (const stream of audioCaptureService.listActiveStreams()) {
+      this.inc({ stream: stream.streamId, codec: stream.codec }, stream.bytesTransferred);
+    }
+  }
+});
+
+registry.gauge({
+  name: 'remote_desktop_uploads_active',
+  help: 'Subidas de archivos en curso',
+  collect() {
+    this.set(fileTransferService.uploads.size);
+  }
+});
+
+// ---------------------------------------------------------------------------
+// Modo cluster: cada worker responde con sus familias y se agregan con la
+// etiqueta "worker" (la captura, por ejemplo, solo ocurre en un worker)
+// ---------------------------------------------------------------------------
+
+const METRICS_CHANNEL = 'metrics:request';
+const replyChannel = (workerId) => `metrics:reply:${workerId}`;
+const pendingScrapes = new Map(); // id -> { replies, resolve }
+
+if (IS_CLUSTERED) {
+  stateStore.subscribe(METRICS_CHANNEL, async ({ id, from }) => {
+    try {
+      const families = await registry.collect();
+      stateStore.publish(replyChannel(from), { id, worker: WORKER_ID, families });
+    } catch (error) {
+      logger.error('Error recogiendo métricas:', error);
+    }
+  });
+
+  stateStore.subscribe(replyChannel(WORKER_ID), (reply) => {
+    const scrape = pendingScrapes.get(reply.id);
+    if (!scrape) return;
+    scrape.replies.push(reply);
+    if (scrape.replies.length >= CLUSTER_SIZE - 1) scrape.resolve();
+  });
+}
+
+const withWorker = (families, worker) => families.map(family => ({
+  ...family,
+  samples: family.samples.map(sample => ({ ...sample, labels: { worker, ...sample.labels } }))
+}));
+
+const mergeFamilies = (groups) => {
+  const merged = new Map();
+  for (const families of groups) {
+    for (const family of families) {
+      const existing = merged.get(family.name);
+      if (existing) {
+        existing.samples.push(...family.samples);
+      } else {
+        merged.set(family.name, { ...family, samples: [...family.samples] });
+      }
+    }
+  }
+  return [...merged.values()];
+};
+
+const collectCluster = async () => {
+  const id = randomUUID();
+  const scrape = { replies: [] };
+  const done = new Promise((resolve) => {
+    scrape.resolve = resolve;
+    setTimeout(resolve, CLUSTER_SCRAPE_TIMEOUT);
+  });
+
+  pendingScrapes.set(id, scrape);
+  stateStore.publish(METRICS_CHANNEL, { id, from: WORKER_ID });
+
+  try {
+    const local = await registry.collect();
+    await done;
+    return mergeFamilies([
+      withWorker(local, WORKER_ID),
+      ...scrape.replies.map(reply => withWorker(reply.families, reply.worker))
+    ]);
+  } finally {
+    pendingScrapes.delete(id);
+  }
+};
+
+// ---------------------------------------------------------------------------
+
+router.use((req, res, next) => {
+  if (METRICS_TOKEN) {
+    if (req.headers.authorization === `Bearer ${METRICS_TOKEN}`) return next();
+    return res.status(401).json({ error: 'Token de métricas inválido' });
+  }
+  if (LOOPBACK.includes(req.socket.remoteAddress)) return next();
+  return res.status(403).json({ error: 'Métricas solo disponibles desde localhost (configura METRICS_TOKEN)' });
+});
+
+router.get('/', async (req, res) => {
+  try {
+    const families = IS_CLUSTERED ? await collectCluster() : await registry.collect();
+    res.setHeader('Content-Type', CONTENT_TYPE);
+    res.setHeader('Cache-Control', 'no-store');
+    res.send(Registry.render(families));
+  } catch (error) {
+    logger.error('Error generando métricas:', error);
+    res.status(500).json({ error: error.message });
+  }
+});
+
+export default router;
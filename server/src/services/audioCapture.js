@@ -1,67 +1,123 @@
 import { spawn } from 'child_process';
 import { platform } from 'os';
 import logger from '../utils/logger.js';
+import { AudioBatcher } from '../utils/audioFraming.js';
+import { audioBytesTotal } from '../utils/metrics.js';
 
 /**
  * Servicio de captura de audio para streaming
  * Soporta Windows (dshow), macOS (avfoundation), Linux (pulse/alsa)
+ * y fuentes de prueba de ffmpeg (AUDIO_SOURCE=sine|anullsrc)
  */
+// Perfiles de calidad seleccionables con audio_set_quality
+// PCM: compatible con cualquier cliente. opus/aac: requieren WebCodecs en el cliente.
+export const AUDIO_PRESETS = {
+  low: { codec: 'pcm_s16le', sampleRate: 22050, channels: 1 },
+  medium: { codec: 'pcm_s16le', sampleRate: 44100, channels: 1 },
+  high: { codec: 'pcm_s16le', sampleRate: 44100, channels: 2 },
+  'opus-low': { codec: 'opus', sampleRate: 48000, channels: 1, bitrate: '24k' },
+  opus: { codec: 'opus', sampleRate: 48000, channels: 2, bitrate: '64k' },
+  aac: { codec: 'aac', sampleRate: 44100, channels: 2, bitrate: '96k' }
+};
+
 class AudioCaptureService {
   constructor() {
     this.activeStreams = new Map();
+    this.quality = 'high';
     this.sampleRate = 44100;
     this.channels = 2;
+    this.codec = 'pcm_s16le';
+    this.bitrate = null;
     this.format = 's16le'; // PCM 16-bit little-endian
+
+    // Duración de cada lote enviado al cliente
+    this.batchMs = parseInt(process.env.AUDIO_BATCH_MS) || 100;
+    // Fuente de prueba sin hardware de audio: sine | anullsrc
+    this.testSource = process.env.AUDIO_SOURCE || null;
   }
 
   /**
-   * Obtiene el comando FFmpeg según la plataforma
+   * Argumentos de entrada de FFmpeg según la plataforma
    */
-  getFFmpegCommand() {
+  getInputArgs() {
+    if (this.testSource === 'sine') {
+      return ['-re', '-f', 'lavfi', '-i', `sine=frequency=440:sample_rate=${this.sampleRate}`];
+    }
+    if (this.testSource === 'anullsrc') {
+      return ['-re', '-f', 'lavfi', '-i', `anullsrc=channel_layout=stereo:sample_rate=${this.sampleRate}`];
+    }
+
     const os = platform();
     
     switch (os) {
       case 'win32':
         // Windows - usar DirectShow
-        return [
-          '-f', 'dshow',
-          '-i', 'audio=virtual-audio-capturer', // Stereo Mix o similar
-          '-ar', this.sampleRate.toString(),
-          '-ac', this.channels.toString(),
-          '-f', this.format,
-          '-acodec', 'pcm_s16le',
-          'pipe:1'
-        ];
+        return ['-f', 'dshow', '-i', 'audio=virtual-audio-capturer']; // Stereo Mix o similar
         
       case 'darwin':
         // macOS - usar AVFoundation
-        return [
-          '-f', 'avfoundation',
-          '-i', ':0', // Captura de audio del sistema
-          '-ar', this.sampleRate.toString(),
-          '-ac', this.channels.toString(),
-          '-f', this.format,
-          '-acodec', 'pcm_s16le',
-          'pipe:1'
-        ];
+        return ['-f', 'avfoundation', '-i', ':0']; // Captura de audio del sistema
         
       case 'linux':
         // Linux - usar PulseAudio o ALSA
+        return ['-f', 'pulse', '-i', 'default'];
+        
+      default:
+        throw new Error(`Plataforma no soportada: ${os}`);
+    }
+  }
+
+  /**
+   * Argumentos de codificación/salida de FFmpeg según el códec
+   */
+  getOutputArgs() {
+    const common = [
+      '-ar', this.sampleRate.toString(),
+      '-ac', this.channels.toString()
+    ];
+
+    switch (this.codec) {
+      case 'opus':
+        // Ogg con una página por paquete de 20ms para no añadir latencia
+        return [
+          ...common,
+          '-c:a', 'libopus',
+          '-b:a', this.bitrate,
+          '-application', 'lowdelay',
+          '-frame_duration', '20',
+          '-page_duration', '20000',
+          '-flush_packets', '1',
+          '-f', 'ogg',
+          'pipe:1'
+        ];
+
+      case 'aac':
+        return [
+          ...common,
+          '-c:a', 'aac',
+          '-b:a', this.bitrate,
+          '-flush_packets', '1',
+          '-f', 'adts',
+          'pipe:1'
+        ];
+
+      default:
         return [
-          '-f', 'pulse',
-          '-i', 'default',
-          '-ar', this.sampleRate.toString(),
-          '-ac', this.channels.toString(),
+          ...common,
           '-f', this.format,
           '-acodec', 'pcm_s16le',
           'pipe:1'
         ];
-        
-      default:
-        throw new Error(`Plataforma no soportada: ${os}`);
     }
   }
 
+  /**
+   * Obtiene el comando FFmpeg completo
+   */
+  getFFmpegCommand() {
+    return ['-hide_banner', '-loglevel', 'error', ...this.getInputArgs(), ...this.getOutputArgs()];
+  }
+
   /**
    * Inicia la captura de audio
    */
@@ -83,16 +139,27 @@ class AudioCaptureService {
       const streamData = {
         process: ffmpeg,
         startTime: Date.now(),
-        bytesTransferred: 0
+        bytesTransferred: 0,
+        batches: 0,
+        codec: this.codec
       };
 
-      // Manejar datos de audio
+      // Agrupar la salida en lotes de duración fija (el formato de envío lo decide el socket)
+      const batcher = new AudioBatcher({
+        codec: this.codec,
+        sampleRate: this.sampleRate,
+        channels: this.channels,
+        batchMs: this.batchMs,
+        onBatch: (data, info) => {
+          streamData.batches++;
+          onData(data, info);
+        }
+      });
+
       ffmpeg.stdout.on('data', (chunk) => {
         streamData.bytesTransferred += chunk.length;
-        
-        // Convertir a base64 para enviar por WebSocket
-        const base64Audio = chunk.toString('base64');
-        onData(base64Audio);
+        audioBytesTotal.inc({ codec: streamData.codec }, chunk.length);
+        batcher.push(chunk);
       });
 
       // Manejar errores de FFmpeg
@@ -216,6 +283,8 @@ class AudioCaptureService {
       streamId,
       duration: Date.now() - stream.startTime,
       bytesTransferred: stream.bytesTransferred,
+      batches: stream.batches,
+      codec: stream.codec,
       isActive: !stream.process.killed
     };
   }
@@ -229,34 +298,26 @@ class AudioCaptureService {
       streams.push({
         streamId: id,
         duration: Date.now() - stream.startTime,
-        bytesTransferred: stream.bytesTransferred
+        bytesTransferred: stream.bytesTransferred,
+        codec: stream.codec
       });
     }
     return streams;
   }
 
   /**
-   * Configura la calidad del audio
+   * Configura la calidad del audio (afecta a las capturas que se inicien después)
    */
   setQuality(quality) {
-    // quality: 'low' | 'medium' | 'high'
-    switch (quality) {
-      case 'low':
-        this.sampleRate = 22050;
-        this.channels = 1;
-        break;
-      case 'medium':
-        this.sampleRate = 44100;
-        this.channels = 1;
-        break;
-      case 'high':
-      default:
-        this.sampleRate = 44100;
-        this.channels = 2;
-        break;
-    }
+    // quality: 'low' | 'medium' | 'high' | 'opus-low' | 'opus' | 'aac'
+    const preset = AUDIO_PRESETS[quality] || AUDIO_PRESETS.high;
+    this.quality = AUDIO_PRESETS[quality] ? quality : 'high';
+    this.codec = preset.codec;
+    this.sampleRate = preset.sampleRate;
+    this.channels = preset.channels;
+    this.bitrate = preset.bitrate || null;
     
-    logger.info(`🎵 Calidad de audio configurada: ${quality} (${this.sampleRate}Hz, ${this.channels}ch)`);
+    logger.info(`🎵 Calidad de audio configurada: ${this.quality} (${this.codec}, ${this.sampleRate}Hz, ${this.channels}ch)`);
   }
 }
 
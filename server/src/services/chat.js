@@ -1,82 +1,200 @@
+import { fileURLToPath } from 'url';
+import { dirname, join } from 'path';
+import { randomUUID } from 'crypto';
+
 import logger from '../utils/logger.js';
+import stateStore from './stateStore.js';
+import ChatLog, { conversationKey } from './chatLog.js';
+import { IS_CAPTURE_WORKER, WORKER_ID, STATE_TIMEOUT_MS } from '../config/cluster.js';
+
+const __dirname = dirname(fileURLToPath(import.meta.url));
+
+// Claves en el almacén de estado compartido
+const USERS_KEY = 'chat:users'; // hash userId -> { socketId, username, joinedAt }
+const SEQ_KEY = 'chat:seq';     // último seq asignado (cursor de paginación)
+
+// El historial lo escribe un único worker (el de captura); el resto le
+// envía los mensajes y las consultas por el almacén de estado
+const APPEND_CHANNEL = 'chat:append';
+const QUERY_CHANNEL = 'chat:query';
+const replyChannel = (workerId) => `chat:reply:${workerId}`;
+
+const CHAT_DIR = process.env.CHAT_DIR || join(__dirname, '../../data/chat');
+const RETENTION_MS = (parseInt(process.env.CHAT_RETENTION_DAYS) || 30) * 24 * 60 * 60 * 1000;
+const PRUNE_INTERVAL = 60 * 60 * 1000;
 
 /**
  * Servicio de chat para comunicación entre usuarios conectados
- * Soporta mensajes privados, broadcast y historial limitado
+ * Soporta mensajes privados, broadcast e historial persistente paginado.
+ * Los usuarios viven en el almacén de estado para que todos los workers del
+ * cluster vean lo mismo; el historial, en el log de chatLog.js.
  */
 class ChatService {
-  constructor() {
-    this.messages = []; // Historial de mensajes
-    this.maxHistory = 100; // Máximo mensajes guardados
-    this.connectedUsers = new Map(); // userId -> { socketId, username, joinedAt }
+  constructor(store = stateStore) {
+    this.store = store;
+    this.log = null;
+    this.pendingQueries = new Map(); // id -> { resolve, reject, timer }
+
+    if (IS_CAPTURE_WORKER) {
+      this.ready = this.openLog().catch((error) => {
+        logger.error('Error abriendo historial de chat (se desactiva):', error);
+        this.log = null;
+      });
+    } else {
+      this.ready = Promise.resolve();
+      this.store.subscribe(replyChannel(WORKER_ID), (reply) => this.receiveReply(reply));
+    }
+  }
+
+  async openLog() {
+    const log = new ChatLog({
+      dir: CHAT_DIR,
+      segmentMaxBytes: (parseInt(process.env.CHAT_SEGMENT_MAX_KB) || 4096) * 1024,
+      cacheSize: parseInt(process.env.CHAT_CACHE_SIZE) || 500
+    });
+    await log.open();
+    this.log = log;
+
+    // Tras un reinicio el contador sigue donde lo dejó el log
+    const stored = parseInt(await this.store.get(SEQ_KEY)) || 0;
+    if (log.lastSeq > stored) {
+      await this.store.set(SEQ_KEY, log.lastSeq);
+    }
+
+    this.store.subscribe(APPEND_CHANNEL, (message) => this.log?.append(message));
+    this.store.subscribe(QUERY_CHANNEL, async ({ id, from, method, params }) => {
+      try {
+        const result = await this.runQuery(method, params);
+        this.store.publish(replyChannel(from), { id, result });
+      } catch (error) {
+        this.store.publish(replyChannel(from), { id, error: error.message });
+      }
+    });
+
+    setInterval(() => {
+      this.cleanupOldMessages().catch((err) => logger.error('Error limpiando historial de chat:', err));
+    }, PRUNE_INTERVAL).unref();
+    process.once('exit', () => log.flushSync());
+  }
+
+  async getUser(userId) {
+    const data = await this.store.hget(USERS_KEY, userId);
+    return data ? JSON.parse(data) : null;
+  }
+
+  /**
+   * Consultas al historial: local en el worker que lo guarda, por el
+   * almacén de estado en el resto
+   */
+  async runQuery(method, params) {
+    await this.ready;
+    if (!this.log) throw new Error('Historial de chat no disponible');
+
+    switch (method) {
+      case 'query': return this.log.query(params);
+      case 'search': return this.log.search(params.text, params);
+      case 'prune': return this.log.prune(params.maxAge);
+      case 'stats': return this.log.getStats();
+      default: throw new Error(`Consulta desconocida: ${method}`);
+    }
+  }
+
+  request(method, params = {}) {
+    if (IS_CAPTURE_WORKER) return this.runQuery(method, params);
+
+    const id = randomUUID();
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pendingQueries.delete(id);
+        reject(new Error('Historial de chat no disponible'));
+      }, STATE_TIMEOUT_MS);
+
+      this.pendingQueries.set(id, { resolve, reject, timer });
+      this.store.publish(QUERY_CHANNEL, { id, from: WORKER_ID, method, params });
+    });
+  }
+
+  receiveReply({ id, result, error }) {
+    const pending = this.pendingQueries.get(id);
+    if (!pending) return;
+    this.pendingQueries.delete(id);
+    clearTimeout(pending.timer);
+    if (error) pending.reject(new Error(error));
+    else pending.resolve(result);
   }
 
   /**
    * Registra un usuario en el chat
    */
-  registerUser(userId, socketId, username) {
-    this.connectedUsers.set(userId, {
+  async registerUser(userId, socketId, username) {
+    await this.store.hset(USERS_KEY, userId, JSON.stringify({
       socketId,
       username: username || `Usuario_${userId.slice(0, 6)}`,
       joinedAt: new Date()
-    });
-    
+    }));
+
     logger.info(`👤 Usuario registrado en chat: ${username || userId}`);
-    
+
     // Notificar a otros usuarios
     this.broadcastSystemMessage(`${username || 'Un usuario'} se ha unido al chat`, userId);
-    
+
     return this.getConnectedUsersList();
   }
 
   /**
-   * Elimina un usuario del chat
+   * Elimina un usuario del chat.
+   * Con socketId solo se elimina si sigue siendo la conexión registrada
+   * (otra sesión del mismo usuario puede haberla reemplazado).
    */
-  unregisterUser(userId) {
-    const user = this.connectedUsers.get(userId);
-    if (user) {
-      this.connectedUsers.delete(userId);
-      logger.info(`👤 Usuario desconectado del chat: ${user.username || userId}`);
-      
-      // Notificar a otros usuarios
-      this.broadcastSystemMessage(`${user.username || 'Un usuario'} ha salido del chat`, userId);
-    }
+  async unregisterUser(userId, socketId = null) {
+    const user = await this.getUser(userId);
+    if (!user || (socketId && user.socketId !== socketId)) return null;
+
+    await this.store.hdel(USERS_KEY, userId);
+    logger.info(`👤 Usuario desconectado del chat: ${user.username || userId}`);
+
+    // Notificar a otros usuarios
+    this.broadcastSystemMessage(`${user.username || 'Un usuario'} ha salido del chat`, userId);
+
     return user;
   }
 
   /**
    * Envía un mensaje broadcast a todos los usuarios
    */
-  broadcastMessage(content, fromUserId, type = 'text') {
-    const user = this.connectedUsers.get(fromUserId);
+  async broadcastMessage(content, fromUserId, type = 'text') {
+    const user = await this.getUser(fromUserId);
     if (!user) return null;
 
     const message = this.createMessage(content, fromUserId, user.username, 'broadcast', type);
-    this.addToHistory(message);
-    
+    await this.addToHistory(message);
+
     logger.debug(`💬 Mensaje broadcast de ${user.username}: ${content.substring(0, 50)}...`);
-    
+
     return message;
   }
 
   /**
-   * Envía un mensaje privado
+   * Envía un mensaje privado.
+   * Devuelve también el socket del destinatario (puede estar en otro worker).
    */
-  sendPrivateMessage(content, fromUserId, toUserId, type = 'text') {
-    const fromUser = this.connectedUsers.get(fromUserId);
-    const toUser = this.connectedUsers.get(toUserId);
-    
-    if (!fromUser) return null;
+  async sendPrivateMessage(content, fromUserId, toUserId, type = 'text') {
+    const fromUser = await this.getUser(fromUserId);
+    const toUser = await this.getUser(toUserId);
+
+    if (!fromUser) {
+      return { error: 'Debes unirte al chat para enviar mensajes' };
+    }
     if (!toUser) {
       return { error: 'Usuario destino no encontrado o desconectado' };
     }
 
     const message = this.createMessage(content, fromUserId, fromUser.username, 'private', type, toUserId, toUser.username);
-    this.addToHistory(message);
-    
+    await this.addToHistory(message);
+
     logger.debug(`💬 Mensaje privado de ${fromUser.username} a ${toUser.username}: ${content.substring(0, 50)}...`);
-    
-    return message;
+
+    return { message, toSocketId: toUser.socketId };
   }
 
   /**
@@ -90,10 +208,10 @@ class ChatService {
       'system',
       'text'
     );
-    
+
     // Los mensajes del sistema no se guardan en historial
     logger.info(`📢 Mensaje del sistema: ${content}`);
-    
+
     return message;
   }
 
@@ -120,67 +238,74 @@ class ChatService {
   }
 
   /**
-   * Añade mensaje al historial
+   * Añade mensaje al historial (le asigna el seq que sirve de cursor)
    */
-  addToHistory(message) {
-    this.messages.push(message);
-    
-    // Mantener solo los últimos mensajes
-    if (this.messages.length > this.maxHistory) {
-      this.messages.shift();
+  async addToHistory(message) {
+    message.seq = await this.store.incr(SEQ_KEY);
+
+    if (!IS_CAPTURE_WORKER) {
+      this.store.publish(APPEND_CHANNEL, message);
+      return;
     }
+
+    await this.ready;
+    this.log?.append(message);
   }
 
   /**
-   * Obtiene historial de mensajes
+   * Página de historial visible para `userId`, anterior al cursor `before`.
+   * Con `withUserId` solo la conversación privada entre ambos; con
+   * 'broadcast', solo los mensajes a todos.
    */
-  getHistory(limit = 50, beforeTimestamp = null) {
-    let history = this.messages;
-    
-    if (beforeTimestamp) {
-      history = history.filter(m => m.timestamp < beforeTimestamp);
+  async getHistory({ userId = null, withUserId = null, before = null, limit = 50 } = {}) {
+    let conversation = null;
+    if (withUserId === 'broadcast') {
+      conversation = 'broadcast';
+    } else if (withUserId) {
+      conversation = conversationKey({ type: 'private', from: { id: userId }, to: { id: withUserId } });
     }
-    
-    return history.slice(-limit);
+
+    return this.request('query', { userId, conversation, before, limit });
   }
 
   /**
    * Obtiene lista de usuarios conectados
    */
-  getConnectedUsersList() {
-    const users = [];
-    for (const [id, data] of this.connectedUsers) {
-      users.push({
+  async getConnectedUsersList() {
+    const connected = await this.store.hgetall(USERS_KEY);
+    return Object.entries(connected).map(([id, json]) => {
+      const data = JSON.parse(json);
+      return {
         id,
         username: data.username,
         joinedAt: data.joinedAt
-      });
-    }
-    return users;
+      };
+    });
   }
 
   /**
    * Verifica si un usuario está conectado
    */
-  isUserConnected(userId) {
-    return this.connectedUsers.has(userId);
+  async isUserConnected(userId) {
+    return (await this.getUser(userId)) !== null;
   }
 
   /**
    * Obtiene información de un usuario
    */
-  getUserInfo(userId) {
-    return this.connectedUsers.get(userId) || null;
+  async getUserInfo(userId) {
+    return this.getUser(userId);
   }
 
   /**
    * Actualiza el nombre de usuario
    */
-  updateUsername(userId, newUsername) {
-    const user = this.connectedUsers.get(userId);
+  async updateUsername(userId, newUsername) {
+    const user = await this.getUser(userId);
     if (user) {
       const oldName = user.username;
       user.username = newUsername;
+      await this.store.hset(USERS_KEY, userId, JSON.stringify(user));
       logger.info(`👤 Usuario ${userId} cambió nombre: ${oldName} -> ${newUsername}`);
       return true;
     }
@@ -190,39 +315,34 @@ class ChatService {
   /**
    * Obtiene estadísticas del chat
    */
-  getStats() {
+  async getStats() {
+    const history = await this.request('stats');
     return {
-      connectedUsers: this.connectedUsers.size,
-      totalMessages: this.messages.length,
-      maxHistory: this.maxHistory
+      connectedUsers: await this.store.hlen(USERS_KEY),
+      totalMessages: history.messages,
+      segments: history.segments,
+      cachedMessages: history.cached
     };
   }
 
   /**
-   * Limpia mensajes antiguos del historial
+   * Limpia mensajes antiguos del historial (por segmentos completos)
    */
-  cleanupOldMessages(maxAge = 24 * 60 * 60 * 1000) { // 24 horas por defecto
-    const cutoff = Date.now() - maxAge;
-    const originalLength = this.messages.length;
-    
-    this.messages = this.messages.filter(m => m.timestamp > cutoff);
-    
-    const removed = originalLength - this.messages.length;
+  async cleanupOldMessages(maxAge = RETENTION_MS) {
+    const removed = await this.request('prune', { maxAge });
+
     if (removed > 0) {
       logger.info(`🧹 Limpiados ${removed} mensajes antiguos del chat`);
     }
-    
+
     return removed;
   }
 
   /**
    * Busca mensajes en el historial
    */
-  searchMessages(query, limit = 20) {
-    const lowerQuery = query.toLowerCase();
-    return this.messages
-      .filter(m => m.content.toLowerCase().includes(lowerQuery))
-      .slice(-limit);
+  async searchMessages(query, limit = 20, userId = null) {
+    return this.request('search', { text: query, limit, userId });
   }
 }
 
@@ -0,0 +1,385 @@
+import fs from 'fs';
+import { join } from 'path';
+
+import logger from '../utils/logger.js';
+
+// Tamaño a partir del cual se cierra un segmento y se abre otro
+const DEFAULT_SEGMENT_MAX_BYTES = 4 * 1024 * 1024;
+
+// Mensajes recientes que se sirven desde memoria
+const DEFAULT_CACHE_SIZE = 500;
+
+// Escritura agrupada: cada cuánto se vuelca lo pendiente a disco
+const FLUSH_INTERVAL = 50;
+
+// Segmentos cerrados ya parseados que se conservan (paginación hacia atrás)
+const PARSED_SEGMENTS_CACHE = 2;
+
+const MAX_PAGE_SIZE = 200;
+
+const SEGMENT_PATTERN = /^chat-(\d{6})\.jsonl$/;
+
+const segmentFile = (id) => `chat-${String(id).padStart(6, '0')}.jsonl`;
+const indexFile = (id) => `chat-${String(id).padStart(6, '0')}.idx.json`;
+
+/**
+ * Conversación a la que pertenece un mensaje: 'broadcast' o 'dm:<a>:<b>'
+ */
+export const conversationKey = (message) => {
+  if (message.type === 'private' && message.to) {
+    return `dm:${[message.from.id, message.to.id].sort().join(':')}`;
+  }
+  return message.type;
+};
+
+/**
+ * Historial de chat persistente.
+ *
+ * Log append-only en segmentos JSONL (chat-000001.jsonl, ...). Al cerrar un
+ * segmento se guarda a su lado un índice con su rango de seq y fechas y los
+ * usuarios y conversaciones que contiene; así una consulta solo abre los
+ * segmentos que pueden tener mensajes para ella. Los últimos mensajes se
+ * mantienen en un buffer circular en memoria: la memoria no crece con el
+ * historial, solo con el número de segmentos.
+ */
+export default class ChatLog {
+  constructor({ dir, segmentMaxBytes = DEFAULT_SEGMENT_MAX_BYTES, cacheSize = DEFAULT_CACHE_SIZE }) {
+    this.dir = dir;
+    this.segmentMaxBytes = segmentMaxBytes;
+    this.cacheSize = cacheSize;
+
+    this.segments = [];    // resúmenes, del más antiguo al más reciente
+    this.recent = [];      // últimos mensajes (como mucho cacheSize)
+    this.pending = [];     // líneas pendientes de escribir
+    this.parsed = new Map(); // id de segmento -> mensajes (LRU pequeño)
+    this.lastSeq = 0;
+    this.timer = null;
+    this.flushing = null;
+  }
+
+  /**
+   * Carga los índices de los segmentos y el final del historial
+   */
+  async open() {
+    await fs.promises.mkdir(this.dir, { recursive: true });
+
+    const ids = (await fs.promises.readdir(this.dir))
+      .map(name => name.match(SEGMENT_PATTERN))
+      .filter(Boolean)
+      .map(match => parseInt(match[1], 10))
+      .sort((a, b) => a - b);
+
+    for (const [i, id] of ids.entries()) {
+      const sealed = i < ids.length - 1;
+      const summary = (sealed && await this.readIndex(id)) || await this.scanSegment(id);
+      this.segments.push(summary);
+      if (sealed && !summary.fromIndex) await this.writeIndex(summary);
+    }
+
+    // Sin segmentos, o el último ya estaba lleno al cerrar: se empieza uno nuevo
+    const last = this.segments[this.segments.length - 1];
+    if (!last) {
+      this.segments.push(this.createSummary(1));
+    } else if (last.bytes >= this.segmentMaxBytes) {
+      await this.writeIndex(last);
+      this.segments.push(this.createSummary(last.id + 1));
+    }
+
+    this.lastSeq = this.segments.reduce((max, segment) => Math.max(max, segment.maxSeq), 0);
+
+    // Rellenar la caché con el final del historial
+    for (let i = this.segments.length - 1; i >= 0 && this.recent.length < this.cacheSize; i--) {
+      const messages = await this.readSegment(this.segments[i]);
+      this.recent = [...messages, ...this.recent];
+    }
+    this.recent.sort((a, b) => a.seq - b.seq);
+    this.recent = this.recent.slice(-this.cacheSize);
+    this.parsed.clear();
+
+    const total = this.segments.reduce((sum, segment) => sum + segment.count, 0);
+    logger.info(`💬 Historial de chat: ${total} mensajes en ${this.segments.length} segmentos`);
+  }
+
+  createSummary(id) {
+    return {
+      id,
+      bytes: 0,
+      count: 0,
+      minSeq: Infinity,
+      maxSeq: 0,
+      firstTimestamp: null,
+      lastTimestamp: null,
+      users: new Set(),
+      conversations: new Set()
+    };
+  }
+
+  indexMessage(summary, message) {
+    summary.count++;
+    summary.minSeq = Math.min(summary.minSeq, message.seq);
+    summary.maxSeq = Math.max(summary.maxSeq, message.seq);
+    summary.firstTimestamp ??= message.timestamp;
+    summary.lastTimestamp = message.timestamp;
+    summary.users.add(message.from.id);
+    if (message.to) summary.users.add(message.to.id);
+    summary.conversations.add(conversationKey(message));
+  }
+
+  async readIndex(id) {
+    try {
+      const data = JSON.parse(await fs.promises.readFile(join(this.dir, indexFile(id)), 'utf8'));
+      return {
+        ...data,
+        users: new Set(data.users),
+        conversations: new Set(data.conversations),
+        fromIndex: true
+      };
+    } catch {
+      return null;
+    }
+  }
+
+  async writeIndex(summary) {
+    const { fromIndex, ...data } = summary;
+    await fs.promises.writeFile(join(this.dir, indexFile(summary.id)), JSON.stringify({
+      ...data,
+      users: [...summary.users],
+      conversations: [...summary.conversations]
+    }));
+  }
+
+  /**
+   * Reconstruye el resumen de un segmento leyéndolo entero
+   */
+  async scanSegment(id) {
+    const summary = this.createSummary(id);
+    summary.bytes = (await fs.promises.stat(join(this.dir, segmentFile(id)))).size;
+    for (const message of await this.readSegment(summary)) {
+      this.indexMessage(summary, message);
+    }
+    return summary;
+  }
+
+  async readSegment(summary) {
+    if (this.parsed.has(summary.id)) return this.parsed.get(summary.id);
+
+    let text;
+    try {
+      text = await fs.promises.readFile(join(this.dir, segmentFile(summary.id)), 'utf8');
+    } catch (error) {
+      if (error.code === 'ENOENT') return [];
+      throw error;
+    }
+
+    const messages = [];
+    for (const line of text.split('\n')) {
+      if (!line) continue;
+      try {
+        messages.push(JSON.parse(line));
+      } catch {
+        // Línea truncada por un cierre brusco: se ignora
+      }
+    }
+
+    // Solo se cachean segmentos cerrados (el activo sigue creciendo)
+    if (summary !== this.active) {
+      this.parsed.set(summary.id, messages);
+      if (this.parsed.size > PARSED_SEGMENTS_CACHE) {
+        this.parsed.delete(this.parsed.keys().next().value);
+      }
+    }
+    return messages;
+  }
+
+  get active() {
+    return this.segments[this.segments.length - 1];
+  }
+
+  /**
+   * Añade un mensaje (con `seq` ya asignado); la escritura a disco se agrupa
+   */
+  append(message) {
+    this.lastSeq = Math.max(this.lastSeq, message.seq);
+    this.recent.push(message);
+    if (this.recent.length > this.cacheSize) {
+      this.recent.splice(0, this.recent.length - this.cacheSize);
+    }
+
+    this.pending.push(message);
+    if (this.pending.length >= this.cacheSize / 2) {
+      this.flush();
+    } else if (!this.timer) {
+      this.timer = setTimeout(() => this.flush(), FLUSH_INTERVAL);
+    }
+    return message;
+  }
+
+  flush() {
+    clearTimeout(this.timer);
+    this.timer = null;
+
+    if (!this.flushing) {
+      this.flushing = this.writePending()
+        .catch((error) => logger.error('Error escribiendo historial de chat:', error))
+        .finally(() => {
+          this.flushing = null;
+        });
+    }
+    return this.flushing;
+  }
+
+  async writePending() {
+    while (this.pending.length > 0) {
+      // Un lote no pasa del hueco que le queda al segmento activo
+      const segment = this.active;
+      const room = this.segmentMaxBytes - segment.bytes;
+      const lines = [];
+      let bytes = 0;
+      while (lines.length < this.pending.length && (lines.length === 0 || bytes < room)) {
+        const line = `${JSON.stringify(this.pending[lines.length])}\n`;
+        lines.push(line);
+        bytes += Buffer.byteLength(line);
+      }
+      const messages = this.pending.splice(0, lines.length);
+
+      await fs.promises.appendFile(join(this.dir, segmentFile(segment.id)), lines.join(''));
+
+      segment.bytes += bytes;
+      for (const message of messages) {
+        this.indexMessage(segment, message);
+      }
+
+      if (segment.bytes >= this.segmentMaxBytes) {
+        await this.writeIndex(segment);
+        this.segments.push(this.createSummary(segment.id + 1));
+      }
+    }
+  }
+
+  /**
+   * Página de historial anterior al cursor `before` (seq), en orden
+   * cronológico. Sin `conversation` devuelve lo que puede ver `userId`
+   * (broadcast y sus privados). `nextCursor` es null al llegar al principio.
+   */
+  async query({ userId = null, conversation = null, before = null, limit = 50 } = {}) {
+    limit = Math.min(Math.max(parseInt(limit) || 50, 1), MAX_PAGE_SIZE);
+    const cursor = Number.isFinite(Number(before)) && before !== null ? Number(before) : Infinity;
+
+    const visible = conversation
+      ? (message) => conversationKey(message) === conversation
+      : (message) => message.type !== 'private' || userId === null
+        || message.from.id === userId || message.to?.id === userId;
+    const relevant = conversation
+      ? (segment) => segment.conversations.has(conversation)
+      : (segment) => userId === null || segment.conversations.has('broadcast') || segment.users.has(userId);
+
+    const found = [];
+    const collect = (messages, below) => {
+      for (let i = messages.length - 1; i >= 0; i--) {
+        const message = messages[i];
+        if (message.seq < below && visible(message)) found.push(message);
+      }
+    };
+
+    // 1. Memoria
+    collect(this.recent, cursor);
+    const cacheFloor = this.recent.length > 0 ? this.recent[0].seq : Infinity;
+    let exhausted = true;
+
+    // 2. Disco, del segmento más reciente al más antiguo, solo si la caché no basta
+    if (found.length <= limit) {
+      const below = Math.min(cursor, cacheFloor);
+      for (let i = this.segments.length - 1; i >= 0; i--) {
+        const segment = this.segments[i];
+        if (segment.count === 0 || segment.minSeq >= below || !relevant(segment)) continue;
+
+        // Con la página completa, un segmento cuyo máximo es menor que todo
+        // lo encontrado ya no aporta: queda más historial
+        if (found.length > limit) {
+          found.sort((a, b) => b.seq - a.seq);
+          if (segment.maxSeq < found[limit - 1].seq) {
+            exhausted = false;
+            break;
+          }
+        }
+        collect(await this.readSegment(segment), below);
+      }
+    } else {
+      exhausted = false;
+    }
+
+    found.sort((a, b) => b.seq - a.seq);
+    const page = found.slice(0, limit).reverse();
+    const hasMore = found.length > limit || !exhausted;
+
+    return {
+      messages: page,
+      nextCursor: hasMore && page.length > 0 ? page[0].seq : null
+    };
+  }
+
+  /**
+   * Búsqueda de texto, de lo más reciente a lo más antiguo
+   */
+  async search(text, { userId = null, limit = 20 } = {}) {
+    const query = text.toLowerCase();
+    const results = [];
+    const matches = (message) => message.content.toLowerCase().includes(query)
+      && (message.type !== 'private' || userId === null || message.from.id === userId || message.to?.id === userId);
+
+    const cacheFloor = this.recent.length > 0 ? this.recent[0].seq : Infinity;
+    for (let i = this.recent.length - 1; i >= 0 && results.length < limit; i--) {
+      if (matches(this.recent[i])) results.push(this.recent[i]);
+    }
+    for (let i = this.segments.length - 1; i >= 0 && results.length < limit; i--) {
+      if (this.segments[i].minSeq >= cacheFloor) continue;
+      const messages = await this.readSegment(this.segments[i]);
+      for (let j = messages.length - 1; j >= 0 && results.length < limit; j--) {
+        if (messages[j].seq < cacheFloor && matches(messages[j])) results.push(messages[j]);
+      }
+    }
+    return results.reverse();
+  }
+
+  /**
+   * Borra los segmentos cerrados cuyo último mensaje es anterior a maxAge
+   */
+  async prune(maxAge) {
+    const cutoff = Date.now() - maxAge;
+    let removed = 0;
+
+    while (this.segments.length > 1 && this.segments[0].lastTimestamp !== null && this.segments[0].lastTimestamp < cutoff) {
+      const segment = this.segments.shift();
+      this.parsed.delete(segment.id);
+      await fs.promises.unlink(join(this.dir, segmentFile(segment.id))).catch(() => {});
+      await fs.promises.unlink(join(this.dir, indexFile(segment.id))).catch(() => {});
+      removed += segment.count;
+    }
+    return removed;
+  }
+
+  getStats() {
+    return {
+      messages: this.segments.reduce((sum, segment) => sum + segment.count, 0) + this.pending.length,
+      segments: this.segments.length,
+      cached: this.recent.length,
+      lastSeq: this.lastSeq
+    };
+  }
+
+  /**
+   * Vuelca lo pendiente de forma síncrona (al terminar el proceso)
+   */
+  flushSync() {
+    if (this.pending.length === 0) return;
+    try {
+      fs.appendFileSync(
+        join(this.dir, segmentFile(this.active.id)),
+        this.pending.map(message => `${JSON.stringify(message)}\n`).join('')
+      );
+      this.pending = [];
+    } catch {
+      // El proceso está terminando: no hay dónde informar
+    }
+  }
+}
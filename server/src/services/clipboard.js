@@ -1,13 +1,184 @@
-import { exec } from 'child_process';
-import { promisify } from 'util';
+import { EventEmitter } from 'events';
+import { createHash } from 'crypto';
+
+import { detectBackend } from './clipboardBackends.js';
+import stateStore from './stateStore.js';
 import logger from '../utils/logger.js';
+import { IS_CAPTURE_WORKER } from '../config/cluster.js';
+
+// Sondeo cuando el backend no puede avisar de cambios (xclip sin clipnotify, macOS)
+const POLL_INTERVAL = parseInt(process.env.CLIPBOARD_POLL_MS) || 1000;
+
+// Espera antes de relanzar un vigilante que ha terminado
+const WATCH_RESTART_DELAY = 5000;
+
+// Tamaño de cada clipboard_chunk (caracteres)
+const CHUNK_SIZE = 64 * 1024;
+
+// Contenido actual compartido entre workers (solo el worker de captura vigila)
+const CURRENT_KEY = 'clipboard:current';
+const CHANGES_CHANNEL = 'clipboard:changed';
 
-const execAsync = promisify(exec);
+const hashText = (text) => createHash('sha1').update(text).digest('hex');
 
-class ClipboardService {
+/**
+ * Portapapeles del sistema.
+ *
+ * Un único vigilante por host (wl-paste --watch, clipnotify, un PowerShell
+ * persistente o sondeo con hash) mantiene el contenido en memoria; los
+ * clipboard_get se sirven desde ahí sin lanzar procesos. Emite 'change' solo
+ * cuando cambia el hash del contenido.
+ */
+class ClipboardService extends EventEmitter {
   constructor() {
+    super();
     this.maxSize = 1024 * 1024; // 1MB máximo
     this.allowedTypes = ['text/plain', 'text/html', 'image/png', 'image/jpeg'];
+
+    this.backend = null;
+    this.backendPromise = null;
+    this.current = null;        // { type, data, hash, size, timestamp, source }
+    this.stopWatch = null;
+    this.pollTimer = null;
+    this.running = false;
+    this.refreshing = null;
+    this.refreshAgain = false;
+
+    // Los workers sin vigilante reciben los cambios del que lo tiene
+    stateStore.subscribe(CHANGES_CHANNEL, (content) => this.receive(content));
+  }
+
+  /**
+   * Fuerza un backend concreto (p. ej. FakeClipboardBackend en pruebas)
+   */
+  setBackend(backend) {
+    this.stop();
+    this.backend = backend;
+    this.backendPromise = Promise.resolve(backend);
+    this.current = null;
+  }
+
+  /**
+   * Detecta el backend una sola vez por proceso
+   */
+  getBackend() {
+    if (!this.backendPromise) {
+      this.backendPromise = detectBackend().then((backend) => {
+        this.backend = backend;
+        logger.info(`📋 Portapapeles: backend ${backend.name}`);
+        return backend;
+      });
+    }
+    return this.backendPromise;
+  }
+
+  /**
+   * Arranca el vigilante (solo en el worker de captura)
+   */
+  async start() {
+    if (!IS_CAPTURE_WORKER || this.running) return;
+    this.running = true;
+
+    const backend = await this.getBackend();
+    if (backend.name === 'none' || !this.running) {
+      this.running = false;
+      return;
+    }
+
+    await this.refresh();
+    this.watch(backend);
+  }
+
+  watch(backend) {
+    if (!this.running) return;
+
+    if (!backend.watch) {
+      this.pollTimer = setInterval(() => this.refresh(), POLL_INTERVAL);
+      this.pollTimer.unref();
+      return;
+    }
+
+    this.stopWatch = backend.watch(
+      (text) => (text === undefined ? this.refresh() : this.applyChange(text)),
+      () => {
+        this.stopWatch = null;
+        if (!this.running) return;
+        logger.warn(`⚠️ Vigilante del portapapeles (${backend.name}) terminado, reiniciando...`);
+        setTimeout(() => this.watch(backend), WATCH_RESTART_DELAY).unref();
+      }
+    );
+  }
+
+  stop() {
+    this.running = false;
+    clearInterval(this.pollTimer);
+    this.pollTimer = null;
+    if (this.stopWatch) {
+      this.stopWatch();
+      this.stopWatch = null;
+    }
+  }
+
+  /**
+   * Lee el portapapeles; las peticiones que llegan durante una lectura se
+   * agrupan en una sola lectura posterior
+   */
+  async refresh() {
+    if (this.refreshing) {
+      this.refreshAgain = true;
+      return this.refreshing;
+    }
+
+    this.refreshing = (async () => {
+      try {
+        do {
+          this.refreshAgain = false;
+          const backend = await this.getBackend();
+          this.applyChange(await backend.read());
+        } while (this.refreshAgain);
+      } catch (error) {
+        logger.error('Error leyendo portapapeles:', error);
+      } finally {
+        this.refreshing = null;
+      }
+    })();
+    return this.refreshing;
+  }
+
+  /**
+   * Actualiza el contenido en memoria; devuelve false si no ha cambiado
+   */
+  applyChange(data, type = 'text/plain', source = null) {
+    const hash = hashText(data);
+    if (this.current && this.current.hash === hash) return false;
+
+    this.current = { type, data, hash, size: data.length, timestamp: Date.now(), source };
+    this.publish();
+    return true;
+  }
+
+  /**
+   * Reparte un cambio: el worker que vigila lo emite a los sockets y lo
+   * guarda; el resto se lo envía a él
+   */
+  publish() {
+    if (IS_CAPTURE_WORKER) {
+      this.emit('change', this.current);
+      stateStore.set(CURRENT_KEY, JSON.stringify(this.current))
+        .catch((err) => logger.error('Error guardando portapapeles:', err));
+    }
+    stateStore.publish(CHANGES_CHANNEL, this.current);
+  }
+
+  receive(content) {
+    if (!content || (this.current && this.current.hash === content.hash)) return;
+    this.current = content;
+    if (IS_CAPTURE_WORKER) {
+      this.emit('change', content);
+      stateStore.set(CURRENT_KEY, JSON.stringify(content))
+        .catch((err) => logger.error('Error guardando portapapeles:', err));
+      stateStore.publish(CHANGES_CHANNEL, content);
+    }
   }
 
   /**
@@ -15,47 +186,19 @@ class ClipboardService {
    */
   async getClipboard() {
     try {
-      // Windows
-      if (process.platform === 'win32') {
-        const { stdout } = await execAsync('powershell -command "Get-Clipboard"');
-        return {
-          type: 'text/plain',
-          data: stdout.trim(),
-          timestamp: Date.now()
-        };
-      }
-      
-      // macOS
-      if (process.platform === 'darwin') {
-        const { stdout } = await execAsync('pbpaste');
-        return {
-          type: 'text/plain',
-          data: stdout,
-          timestamp: Date.now()
-        };
+      if (!this.current && !IS_CAPTURE_WORKER) {
+        const stored = await stateStore.get(CURRENT_KEY);
+        if (stored) this.current = JSON.parse(stored);
       }
-      
-      // Linux (requiere xclip)
-      if (process.platform === 'linux') {
-        try {
-          const { stdout } = await execAsync('xclip -selection clipboard -o');
-          return {
-            type: 'text/plain',
-            data: stdout,
-            timestamp: Date.now()
-          };
-        } catch (e) {
-          // Intentar con wl-copy para Wayland
-          const { stdout } = await execAsync('wl-paste');
-          return {
-            type: 'text/plain',
-            data: stdout,
-            timestamp: Date.now()
-          };
-        }
+
+      // Sin vigilante en este host (o antes de la primera lectura) se lee una vez
+      if (!this.current || (IS_CAPTURE_WORKER && !this.running)) {
+        const backend = await this.getBackend();
+        this.applyChange(await backend.read());
       }
-      
-      throw new Error('Plataforma no soportada');
+
+      const { type, data, hash, timestamp } = this.current;
+      return { type, data, hash, timestamp };
     } catch (error) {
       logger.error('Error obteniendo portapapeles:', error);
       throw new Error('No se pudo acceder al portapapeles');
@@ -65,48 +208,52 @@ class ClipboardService {
   /**
    * Establece contenido en el portapapeles del sistema
    */
-  async setClipboard(content, type = 'text/plain') {
+  async setClipboard(content, type = 'text/plain', source = null) {
     try {
       if (content.length > this.maxSize) {
         throw new Error('Contenido demasiado grande (máx 1MB)');
       }
 
-      // Windows
-      if (process.platform === 'win32') {
-        // Escapar caracteres especiales para PowerShell
-        const escaped = content
-          .replace(/`/g, '``')
-          .replace(/\$/g, '`$')
-          .replace(/"/g, '`"');
-        await execAsync(`powershell -command "Set-Clipboard -Value \\"${escaped}\\""`);
-        return true;
-      }
-      
-      // macOS
-      if (process.platform === 'darwin') {
-        await execAsync(`echo "${content.replace(/"/g, '\\"')}" | pbcopy`);
-        return true;
-      }
-      
-      // Linux
-      if (process.platform === 'linux') {
-        try {
-          await execAsync(`echo "${content.replace(/"/g, '\\"')}" | xclip -selection clipboard`);
-          return true;
-        } catch (e) {
-          // Intentar con wl-copy para Wayland
-          await execAsync(`echo "${content.replace(/"/g, '\\"')}" | wl-copy`);
-          return true;
-        }
-      }
-      
-      throw new Error('Plataforma no soportada');
+      const backend = await this.getBackend();
+      await backend.write(content);
+
+      // El vigilante verá el mismo hash y no volverá a notificarlo
+      this.applyChange(content, type, source);
+      return true;
     } catch (error) {
       logger.error('Error estableciendo portapapeles:', error);
       throw new Error('No se pudo establecer el portapapeles');
     }
   }
 
+  /**
+   * Mensajes para notificar un cambio: cabecera de clipboard_updated (con el
+   * contenido si cabe en un chunk) y, si no, los clipboard_chunk. Lo que
+   * supera maxSize solo se anuncia.
+   */
+  toMessages(content) {
+    const header = {
+      type: content.type,
+      hash: content.hash,
+      size: content.size,
+      timestamp: content.timestamp,
+      source: content.source
+    };
+
+    if (content.size > this.maxSize) {
+      return { header: { ...header, tooLarge: true, chunks: 0 }, chunks: [] };
+    }
+    if (content.size <= CHUNK_SIZE) {
+      return { header: { ...header, data: content.data, chunks: 0 }, chunks: [] };
+    }
+
+    const chunks = [];
+    for (let offset = 0; offset < content.size; offset += CHUNK_SIZE) {
+      chunks.push(content.data.slice(offset, offset + CHUNK_SIZE));
+    }
+    return { header: { ...header, chunks: chunks.length }, chunks };
+  }
+
   /**
    * Verifica si el contenido es válido
    */
@@ -139,4 +286,8 @@ class ClipboardService {
 }
 
 const clipboardService = new ClipboardService();
+
+// Los procesos vigilantes no deben sobrevivir al servidor
+process.once('exit', () => clipboardService.stop());
+
 export default clipboardService;
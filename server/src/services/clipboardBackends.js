@@ -0,0 +1,224 @@
+import { spawn, execFile } from 'child_process';
+import readline from 'readline';
+
+/**
+ * Backends de portapapeles del sistema.
+ *
+ * Cada backend expone:
+ *   read()          -> Promise<string>
+ *   write(text)     -> Promise<void>
+ *   watch(onChange, onExit) -> función que lo detiene; null si hay que sondear con read().
+ *                      onChange(text) recibe el contenido si el backend lo conoce,
+ *                      u onChange() si solo sabe que ha cambiado. onExit() avisa
+ *                      si el proceso vigilante termina por su cuenta.
+ *
+ * Los comandos se lanzan sin shell y el contenido viaja por stdin, así que no
+ * hace falta escapar nada.
+ */
+
+// Lectura máxima de un comando (el servicio limita después a maxSize)
+const MAX_READ_BYTES = 16 * 1024 * 1024;
+
+/**
+ * Ejecuta un comando y devuelve su stdout
+ */
+const run = (command, args) => new Promise((resolve, reject) => {
+  const child = spawn(command, args, { stdio: ['ignore', 'pipe', 'ignore'], windowsHide: true });
+  const chunks = [];
+  let size = 0;
+
+  child.stdout.on('data', (chunk) => {
+    size += chunk.length;
+    if (size > MAX_READ_BYTES) {
+      child.kill();
+      return;
+    }
+    chunks.push(chunk);
+  });
+  child.on('error', reject);
+  child.on('close', (code) => {
+    if (code !== 0 && size <= MAX_READ_BYTES) {
+      reject(new Error(`${command} terminó con código ${code}`));
+      return;
+    }
+    resolve(Buffer.concat(chunks).toString('utf8'));
+  });
+});
+
+/**
+ * Escribe `input` en el stdin de un comando. Se espera a 'exit' y no a 'close':
+ * xclip y wl-copy dejan un proceso hijo sirviendo la selección
+ */
+const pipeTo = (command, args, input) => new Promise((resolve, reject) => {
+  const child = spawn(command, args, { stdio: ['pipe', 'ignore', 'ignore'], windowsHide: true });
+  child.on('error', reject);
+  child.on('exit', (code) => {
+    if (code === 0) resolve();
+    else reject(new Error(`${command} terminó con código ${code}`));
+  });
+  child.stdin.on('error', () => {});
+  child.stdin.end(input);
+});
+
+const commandExists = (command) => new Promise((resolve) => {
+  execFile(process.platform === 'win32' ? 'where' : 'which', [command], { windowsHide: true }, (error) => {
+    resolve(!error);
+  });
+});
+
+/**
+ * Proceso de larga duración que avisa por cada línea de stdout
+ */
+const watchLines = (command, args, onLine, onExit) => {
+  const child = spawn(command, args, { stdio: ['ignore', 'pipe', 'ignore'], windowsHide: true });
+  readline.createInterface({ input: child.stdout }).on('line', onLine);
+  child.once('exit', onExit);
+  child.once('error', onExit);
+
+  return () => {
+    child.removeAllListeners('exit');
+    child.removeAllListeners('error');
+    child.on('error', () => {});
+    child.kill();
+  };
+};
+
+// Wayland: wl-paste --watch ejecuta un comando en cada cambio
+export const waylandBackend = {
+  name: 'wayland',
+  read: () => run('wl-paste', ['--no-newline']).catch(() => ''), // portapapeles vacío = código 1
+  write: (text) => pipeTo('wl-copy', [], text),
+  watch: (onChange, onExit) => watchLines('wl-paste', ['--watch', 'echo', 'changed'], () => onChange(), onExit)
+};
+
+// X11: clipnotify (si está instalado) bloquea hasta el siguiente cambio; sin él se sondea
+export const createX11Backend = ({ clipnotify = false } = {}) => ({
+  name: clipnotify ? 'x11+clipnotify' : 'x11',
+  read: () => run('xclip', ['-selection', 'clipboard', '-o']).catch(() => ''),
+  write: (text) => pipeTo('xclip', ['-selection', 'clipboard'], text),
+  watch: clipnotify
+    ? (onChange, onExit) => {
+        let child = null;
+        let stopped = false;
+        const next = () => {
+          child = spawn('clipnotify', [], { stdio: 'ignore' });
+          child.on('error', () => {});
+          child.on('close', (code) => {
+            if (stopped) return;
+            // Un fallo (p. ej. sin DISPLAY) lo gestiona el servicio; no se relanza en bucle
+            if (code !== 0) return onExit();
+            onChange();
+            next();
+          });
+        };
+        next();
+        return () => {
+          stopped = true;
+          child.kill();
+        };
+      }
+    : null
+});
+
+// macOS: pbpaste es barato, se sondea
+export const macosBackend = {
+  name: 'macos',
+  read: () => run('pbpaste', []),
+  write: (text) => pipeTo('pbcopy', [], text),
+  watch: null
+};
+
+// Windows: un único PowerShell comprueba el portapapeles y emite el contenido
+// nuevo en base64 (una línea por cambio)
+const WINDOWS_WATCH_SCRIPT = '$last = $null; while ($true) { '
+  + '$text = [string](Get-Clipboard -Raw); '
+  + 'if ($text -ne $last) { $last = $text; '
+  + '[Console]::Out.WriteLine([Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes($text))); '
+  + '[Console]::Out.Flush() }; '
+  + 'Start-Sleep -Milliseconds 500 }';
+
+export const windowsBackend = {
+  name: 'windows',
+  read: () => run('powershell', ['-NoProfile', '-Command', 'Get-Clipboard -Raw'])
+    .then(text => text.replace(/\r?\n$/, '')),
+  write: (text) => pipeTo('powershell', [
+    '-NoProfile', '-Command',
+    '[Console]::InputEncoding = [Text.Encoding]::UTF8; Set-Clipboard -Value ([Console]::In.ReadToEnd())'
+  ], text),
+  watch: (onChange, onExit) => watchLines('powershell', ['-NoProfile', '-Command', WINDOWS_WATCH_SCRIPT], (line) => {
+    onChange(Buffer.from(line.trim(), 'base64').toString('utf8'));
+  }, onExit)
+};
+
+// Sin portapapeles accesible (servidor sin escritorio, plataforma no soportada)
+export const unavailableBackend = {
+  name: 'none',
+  read: () => Promise.reject(new Error('Plataforma no soportada')),
+  write: () => Promise.reject(new Error('Plataforma no soportada')),
+  watch: null
+};
+
+/**
+ * Portapapeles en memoria para pruebas y benchmarks (CLIPBOARD_BACKEND=fake).
+ * `simulateCopy` imita una copia hecha por una aplicación del escritorio.
+ */
+export class FakeClipboardBackend {
+  constructor(initial = '') {
+    this.name = 'fake';
+    this.content = initial;
+    this.reads = 0;
+    this.writes = 0;
+    this.listener = null;
+  }
+
+  async read() {
+    this.reads++;
+    return this.content;
+  }
+
+  async write(text) {
+    this.writes++;
+    this.content = text;
+  }
+
+  watch(onChange) {
+    this.listener = onChange;
+    return () => {
+      this.listener = null;
+    };
+  }
+
+  simulateCopy(text) {
+    this.content = text;
+    if (this.listener) this.listener(text);
+  }
+}
+
+/**
+ * Elige el backend una sola vez (CLIPBOARD_BACKEND fuerza uno concreto)
+ */
+export const detectBackend = async (preferred = process.env.CLIPBOARD_BACKEND) => {
+  switch (preferred) {
+    case 'fake': return new FakeClipboardBackend();
+    case 'wayland': return waylandBackend;
+    case 'x11': return createX11Backend({ clipnotify: await commandExists('clipnotify') });
+    case 'macos': return macosBackend;
+    case 'windows': return windowsBackend;
+    case 'none': return unavailableBackend;
+    default: break;
+  }
+
+  if (process.platform === 'win32') return windowsBackend;
+  if (process.platform === 'darwin') return macosBackend;
+
+  if (process.platform === 'linux') {
+    if (process.env.WAYLAND_DISPLAY && await commandExists('wl-paste')) {
+      return waylandBackend;
+    }
+    if (await commandExists('xclip')) {
+      return createX11Backend({ clipnotify: await commandExists('clipnotify') });
+    }
+  }
+
+  return unavailableBackend;
+};
@@ -0,0 +1,61 @@
+import { Adapter } from 'socket.io-adapter';
+import stateStore from './stateStore.js';
+
+/**
+ * Adaptador de socket.io para el modo cluster.
+ * Los broadcasts (io.emit, socket.broadcast.emit, io.to(id).emit) y
+ * disconnectSockets() se aplican en local y se publican en el almacén de
+ * estado para que el resto de workers los apliquen a sus sockets.
+ */
+export class ClusterAdapter extends Adapter {
+  constructor(nsp) {
+    super(nsp);
+    this.channel = `io:${nsp.name}`;
+    this.onMessage = (message) => this.handleMessage(message);
+    stateStore.subscribe(this.channel, this.onMessage);
+  }
+
+  broadcast(packet, opts) {
+    if (!opts.flags?.local) {
+      // Se publica antes de la emisión local: el encoder reutiliza el paquete
+      stateStore.publish(this.channel, {
+        type: 'broadcast',
+        packet,
+        rooms: [...opts.rooms],
+        except: [...(opts.except || [])],
+        flags: opts.flags || {}
+      });
+    }
+    super.broadcast(packet, opts);
+  }
+
+  disconnectSockets(opts, close) {
+    if (!opts.flags?.local) {
+      stateStore.publish(this.channel, {
+        type: 'disconnect',
+        rooms: [...opts.rooms],
+        except: [...(opts.except || [])],
+        close
+      });
+    }
+    super.disconnectSockets(opts, close);
+  }
+
+  handleMessage(message) {
+    const opts = {
+      rooms: new Set(message.rooms),
+      except: new Set(message.except),
+      flags: { ...message.flags, local: true }
+    };
+
+    if (message.type === 'broadcast') {
+      super.broadcast(message.packet, opts);
+    } else if (message.type === 'disconnect') {
+      super.disconnectSockets(opts, message.close);
+    }
+  }
+
+  close() {
+    stateStore.unsubscribe(this.channel, this.onMessage);
+  }
+}
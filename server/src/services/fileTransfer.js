@@ -1,7 +1,11 @@
-import { promises as fs, createReadStream, createWriteStream } from 'fs';
-import { join, basename, extname } from 'path';
-import { pipeline } from 'stream/promises';
+import { promises as fs, createReadStream, watch } from 'fs';
+import { join, basename, extname, resolve, sep } from 'path';
+import { createHash } from 'crypto';
 import logger from '../utils/logger.js';
+import { uploadBytesTotal, uploadChunkSeconds } from '../utils/metrics.js';
+
+// Claves de ordenación admitidas en los listados
+const SORT_KEYS = ['name', 'size', 'modified', 'created'];
 
 
 class FileTransferService {
@@ -10,11 +14,30 @@ class FileTransferService {
     this.maxFileSize = parseInt(process.env.MAX_FILE_SIZE) || 100 * 1024 * 1024; // 100MB default
     this.allowedExtensions = process.env.ALLOWED_EXTENSIONS?.split(',') || ['.txt', '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip', '.rar', '.doc', '.docx', '.xls', '.xlsx'];
     this.activeTransfers = new Map();
+
+    // Subidas en curso: se escriben en .partial/<transferId>.part y se renombran al terminar
+    this.partialDir = join(this.uploadDir, '.partial');
+    this.partialTTL = parseInt(process.env.UPLOAD_PARTIAL_TTL) || 24 * 3600000; // 24h
+    this.uploads = new Map();
+    this.opening = new Map(); // transferId -> apertura en curso (evita abrir el .part dos veces)
+
+    // Índice en memoria del directorio de uploads (nombre -> metadatos)
+    this.index = new Map();
+    this.indexVersion = 0;
+    this.indexEpoch = Date.now().toString(36); // distingue versiones entre reinicios
+    this.indexReady = null;
+    this.sortedCache = new Map(); // "clave:orden" -> { version, files }
+    this.watcher = null;
+    this.pendingRefresh = new Set();
+    this.refreshTimer = null;
   }
 
   async initialize() {
     try {
       await fs.mkdir(this.uploadDir, { recursive: true });
+      await fs.mkdir(this.partialDir, { recursive: true });
+      await this.buildIndex();
+      this.watchUploadDir();
       logger.info(`📁 Directorio de uploads inicializado: ${this.uploadDir}`);
     } catch (error) {
       logger.error('Error inicializando directorio de uploads:', error);
@@ -44,127 +67,547 @@ class FileTransferService {
       .substring(0, 255);
   }
 
-  async saveFile(stream, filename, fileSize, transferId) {
+  /**
+   * Rutas del archivo parcial y sus metadatos para una transferencia
+   */
+  getPartialPaths(transferId) {
+    const safeId = String(transferId).replace(/[^a-zA-Z0-9_-]/g, '_').substring(0, 128);
+    return {
+      partPath: join(this.partialDir, `${safeId}.part`),
+      metaPath: join(this.partialDir, `${safeId}.json`)
+    };
+  }
+
+  /**
+   * Inicia o reanuda una subida. Valida nombre y tamaño antes de escribir nada.
+   * Devuelve el offset desde el que el cliente debe continuar.
+   */
+  async startUpload(transferId, filename, fileSize, owner = null) {
+    if (!transferId) {
+      throw new Error('transferId requerido');
+    }
+
+    if (!Number.isSafeInteger(fileSize) || fileSize < 0) {
+      throw new Error('Tamaño de archivo inválido');
+    }
+
     const sanitizedName = this.sanitizeFilename(filename);
-    const filepath = join(this.uploadDir, `${Date.now()}_${sanitizedName}`);
-    
     this.validateFile(sanitizedName, fileSize);
 
-    const writeStream = createWriteStream(filepath);
-    let receivedBytes = 0;
+    // Dos upload_start simultáneos de la misma transferencia: el segundo
+    // espera a que termine el primero y reutiliza su descriptor
+    const opening = this.opening.get(transferId);
+    if (opening) {
+      await opening.catch(() => {});
+    }
+
+    let upload = this.uploads.get(transferId);
+    if (!upload) {
+      const task = this.openUpload(transferId, sanitizedName, fileSize, owner);
+      this.opening.set(transferId, task);
+      try {
+        upload = await task;
+      } finally {
+        if (this.opening.get(transferId) === task) this.opening.delete(transferId);
+      }
+    } else if (upload.owner !== owner) {
+      throw new Error('Acceso no permitido');
+    } else if (upload.filename !== sanitizedName || upload.fileSize !== fileSize) {
+      throw new Error('La transferencia existente no coincide con el archivo');
+    }
 
     this.activeTransfers.set(transferId, {
       filename: sanitizedName,
-      filepath,
-      receivedBytes: 0,
+      filepath: upload.partPath,
+      receivedBytes: upload.offset,
       totalBytes: fileSize,
-      startTime: Date.now()
+      startTime: Date.now(),
+      resumedAt: upload.offset
     });
 
+    if (upload.offset > 0) {
+      logger.info(`⏯️ Reanudando upload ${sanitizedName} desde ${this.formatBytes(upload.offset)}`);
+    }
+
+    return { transferId, offset: upload.offset };
+  }
+
+  /**
+   * Abre (o reanuda desde disco) el archivo parcial de una transferencia
+   */
+  async openUpload(transferId, sanitizedName, fileSize, owner) {
+    const { partPath, metaPath } = this.getPartialPaths(transferId);
+    let meta = null;
     try {
-      await pipeline(
-        stream,
-        async function* (source) {
-          for await (const chunk of source) {
-            receivedBytes += chunk.length;
-            
-            // Actualizar progreso cada 100KB
-            if (receivedBytes % (100 * 1024) < chunk.length) {
-              const transfer = this.activeTransfers.get(transferId);
-              if (transfer) {
-                transfer.receivedBytes = receivedBytes;
-              }
-            }
-            
-            yield chunk;
-          }
-        }.bind(this),
-        writeStream
-      );
+      meta = JSON.parse(await fs.readFile(metaPath, 'utf8'));
+    } catch (error) {
+      // Subida nueva
+    }
+
+    if (meta && (meta.filename !== sanitizedName || meta.fileSize !== fileSize)) {
+      throw new Error('La transferencia existente no coincide con el archivo');
+    }
+    if (meta && meta.owner !== owner) {
+      throw new Error('Acceso no permitido');
+    }
+
+    let offset = 0;
+    try {
+      offset = (await fs.stat(partPath)).size;
+    } catch (error) {
+      // Sin datos previos
+    }
+
+    if (!meta) {
+      meta = { transferId, filename: sanitizedName, fileSize, owner, startTime: Date.now() };
+      await fs.writeFile(metaPath, JSON.stringify(meta));
+    }
+
+    const upload = {
+      ...meta,
+      partPath,
+      metaPath,
+      handle: await fs.open(partPath, 'a'),
+      offset,
+      queue: Promise.resolve()
+    };
+    this.uploads.set(transferId, upload);
+    return upload;
+  }
+
+  /**
+   * Bytes ya escritos de una transferencia (para reanudar)
+   */
+  async getUploadOffset(transferId, owner = null) {
+    const upload = this.uploads.get(transferId);
+    if (upload) {
+      if (upload.owner !== owner) throw new Error('Acceso no permitido');
+      return upload.offset;
+    }
+
+    const { partPath, metaPath } = this.getPartialPaths(transferId);
+    try {
+      const meta = JSON.parse(await fs.readFile(metaPath, 'utf8'));
+      if (meta.owner !== owner) throw new Error('Acceso no permitido');
+      return (await fs.stat(partPath)).size;
+    } catch (error) {
+      if (error.message === 'Acceso no permitido') throw error;
+      return null;
+    }
+  }
+
+  /**
+   * Escribe un chunk en el archivo temporal. Los chunks se serializan por
+   * transferencia; si se indica offset debe coincidir con lo ya escrito y,
+   * si se indica checksum (sha256 hex), debe coincidir con el contenido.
+   */
+  writeChunk(transferId, chunk, { offset = null, checksum = null, owner } = {}) {
+    const upload = this.uploads.get(transferId);
+    if (!upload) {
+      return Promise.reject(new Error('Transferencia no encontrada'));
+    }
+    if (owner !== undefined && upload.owner !== owner) {
+      return Promise.reject(new Error('Acceso no permitido'));
+    }
+
+    const task = upload.queue.then(async () => {
+      if (offset !== null && offset !== undefined && offset !== upload.offset) {
+        const error = new Error(`Offset inesperado: ${offset} (esperado ${upload.offset})`);
+        error.offset = upload.offset;
+        throw error;
+      }
+
+      if (checksum) {
+        const digest = createHash('sha256').update(chunk).digest('hex');
+        if (digest !== String(checksum).toLowerCase()) {
+          const error = new Error('Checksum del chunk no coincide');
+          error.offset = upload.offset;
+          throw error;
+        }
+      }
+
+      if (upload.offset + chunk.length > upload.fileSize) {
+        throw new Error(`El archivo supera el tamaño declarado (${this.formatBytes(upload.fileSize)})`);
+      }
+
+      const endWrite = uploadChunkSeconds.startTimer();
+      await upload.handle.write(chunk, 0, chunk.length, upload.offset);
+      endWrite();
+      upload.offset += chunk.length;
+      uploadBytesTotal.inc(chunk.length);
 
       const transfer = this.activeTransfers.get(transferId);
-      transfer.receivedBytes = receivedBytes;
+      if (transfer) {
+        transfer.receivedBytes = upload.offset;
+      }
+
+      return upload.offset;
+    });
+
+    // Un error no debe bloquear los chunks siguientes (reintentos)
+    upload.queue = task.catch(() => {});
+    return task;
+  }
+
+  /**
+   * Cierra el archivo temporal y lo mueve atómicamente a su nombre final
+   */
+  async finishUpload(transferId) {
+    const upload = this.uploads.get(transferId);
+    if (!upload) {
+      throw new Error('Transferencia no encontrada');
+    }
+
+    await upload.queue;
+
+    if (upload.offset !== upload.fileSize) {
+      const error = new Error(`Upload incompleto: ${upload.offset}/${upload.fileSize} bytes`);
+      error.offset = upload.offset;
+      throw error;
+    }
+
+    const storedName = `${Date.now()}_${upload.filename}`;
+    const filepath = join(this.uploadDir, storedName);
+
+    await upload.handle.sync();
+    await upload.handle.close();
+    this.uploads.delete(transferId);
+    await fs.rename(upload.partPath, filepath);
+    await fs.unlink(upload.metaPath).catch(() => {});
+    await this.refreshEntry(storedName);
+
+    const transfer = this.activeTransfers.get(transferId);
+    if (transfer) {
+      transfer.filepath = filepath;
+      transfer.receivedBytes = upload.offset;
       transfer.completed = true;
       transfer.endTime = Date.now();
+    }
 
-      logger.info(`✅ Archivo recibido: ${sanitizedName} (${this.formatBytes(receivedBytes)})`);
+    logger.info(`✅ Archivo recibido: ${upload.filename} (${this.formatBytes(upload.offset)})`);
 
-      return {
-        success: true,
-        filename: sanitizedName,
-        filepath,
-        size: receivedBytes,
-        transferId
-      };
+    return {
+      success: true,
+      filename: upload.filename,
+      storedName,
+      filepath,
+      size: upload.offset,
+      transferId
+    };
+  }
 
-    } catch (error) {
-      // Limpiar archivo parcial
-      try {
-        await fs.unlink(filepath);
-      } catch (unlinkError) {
-        // Ignorar error si el archivo no existe
+  /**
+   * Cancela una subida y borra el archivo parcial
+   */
+  async abortUpload(transferId, owner) {
+    const upload = this.uploads.get(transferId);
+    const { partPath, metaPath } = upload || this.getPartialPaths(transferId);
+
+    if (owner !== undefined) {
+      let uploadOwner = upload ? upload.owner : undefined;
+      if (!upload) {
+        try {
+          uploadOwner = JSON.parse(await fs.readFile(metaPath, 'utf8')).owner;
+        } catch (error) {
+          return;
+        }
       }
-      
-      this.activeTransfers.delete(transferId);
-      logger.error(`❌ Error recibiendo archivo ${sanitizedName}:`, error);
+      if (uploadOwner !== owner) {
+        throw new Error('Acceso no permitido');
+      }
+    }
+
+    if (upload) {
+      this.uploads.delete(transferId);
+      await upload.queue;
+      await upload.handle.close().catch(() => {});
+    }
+
+    await fs.unlink(partPath).catch(() => {});
+    await fs.unlink(metaPath).catch(() => {});
+    this.activeTransfers.delete(transferId);
+  }
+
+  /**
+   * Cierra los descriptores de las subidas de un usuario (p.ej. al desconectarse).
+   * Los archivos parciales se conservan para poder reanudar.
+   */
+  async releaseUploads(owner) {
+    for (const [transferId, upload] of this.uploads.entries()) {
+      if (upload.owner !== owner) continue;
+      this.uploads.delete(transferId);
+      await upload.queue;
+      await upload.handle.close().catch(() => {});
+    }
+  }
+
+  /**
+   * Guarda un stream completo en disco (escritura directa al temporal + rename)
+   */
+  async saveFile(stream, filename, fileSize, transferId, owner = null) {
+    await this.startUpload(transferId, filename, fileSize, owner);
+
+    try {
+      for await (const chunk of stream) {
+        await this.writeChunk(transferId, chunk);
+      }
+      return await this.finishUpload(transferId);
+    } catch (error) {
+      await this.abortUpload(transferId);
+      logger.error(`❌ Error recibiendo archivo ${filename}:`, error);
       throw error;
     }
   }
 
+  /**
+   * Recorre el directorio una vez y construye el índice
+   */
+  buildIndex() {
+    this.indexReady = (async () => {
+      const entries = await fs.readdir(this.uploadDir, { withFileTypes: true });
+      const index = new Map();
+
+      await Promise.all(
+        entries
+          .filter(entry => entry.isFile() && !entry.name.startsWith('.'))
+          .map(async (entry) => {
+            try {
+              const stat = await fs.stat(join(this.uploadDir, entry.name));
+              index.set(entry.name, this.toIndexEntry(entry.name, stat));
+            } catch (error) {
+              // Borrado mientras se recorría
+            }
+          })
+      );
+
+      this.index = index;
+      this.indexVersion++;
+      logger.info(`📇 Índice de uploads construido: ${index.size} archivos`);
+    })();
+
+    return this.indexReady;
+  }
+
+  toIndexEntry(name, stat) {
+    return {
+      name,
+      size: stat.size,
+      created: stat.birthtime,
+      modified: stat.mtime
+    };
+  }
+
+  /**
+   * Mantiene el índice al día ante cambios hechos fuera del servicio
+   */
+  watchUploadDir() {
+    try {
+      this.watcher = watch(this.uploadDir, { persistent: false }, (eventType, filename) => {
+        if (!filename) {
+          // Sin nombre de archivo (algunas plataformas): reconstruir
+          this.buildIndex().catch(error => logger.error('Error reconstruyendo índice de uploads:', error));
+          return;
+        }
+        if (filename.startsWith('.')) return;
+        this.scheduleRefresh(filename.toString());
+      });
+
+      this.watcher.on('error', (error) => {
+        logger.error('Error vigilando directorio de uploads:', error);
+        this.watcher.close();
+        this.watcher = null;
+      });
+    } catch (error) {
+      logger.warn(`No se pudo vigilar ${this.uploadDir}: ${error.message}`);
+    }
+  }
+
+  /**
+   * Agrupa los eventos del watcher y vuelve a leer solo los archivos afectados
+   */
+  scheduleRefresh(filename) {
+    this.pendingRefresh.add(filename);
+    if (this.refreshTimer) return;
+
+    this.refreshTimer = setTimeout(async () => {
+      this.refreshTimer = null;
+      const names = [...this.pendingRefresh];
+      this.pendingRefresh.clear();
+      await Promise.all(names.map(name => this.refreshEntry(name)));
+    }, 100);
+  }
+
+  async refreshEntry(name) {
+    try {
+      const stat = await fs.stat(join(this.uploadDir, name));
+      if (!stat.isFile()) return;
+      const current = this.index.get(name);
+      if (current && current.size === stat.size && current.modified.getTime() === stat.mtime.getTime()) {
+        return;
+      }
+      this.index.set(name, this.toIndexEntry(name, stat));
+    } catch (error) {
+      if (!this.index.has(name)) return;
+      this.index.delete(name);
+    }
+    this.indexVersion++;
+  }
+
+  /**
+   * Lista completa ordenada por fecha de modificación (más recientes primero)
+   */
   async getFileList() {
+    const { files } = await this.listFiles({ limit: Infinity });
+    return files;
+  }
+
+  /**
+   * Lista paginada del índice.
+   * - sort: name | size | modified | created; order: asc | desc
+   * - filter: subcadena del nombre (sin distinguir mayúsculas)
+   * - cursor: valor opaco devuelto como nextCursor por la página anterior
+   */
+  async listFiles({ cursor = null, limit = 100, sort = 'modified', order = 'desc', filter = '' } = {}) {
     try {
-      const files = await fs.readdir(this.uploadDir);
-      const fileStats = await Promise.all(
-        files.map(async (file) => {
-          const filepath = join(this.uploadDir, file);
-          const stat = await fs.stat(filepath);
-          return {
-            name: file,
-            size: stat.size,
-            created: stat.birthtime,
-            modified: stat.mtime
-          };
-        })
-      );
-      
-      return fileStats.sort((a, b) => b.modified - a.modified);
+      await this.indexReady;
     } catch (error) {
       logger.error('Error listando archivos:', error);
-      return [];
+      return { files: [], total: 0, nextCursor: null, version: this.indexVersion };
+    }
+
+    if (!SORT_KEYS.includes(sort)) sort = 'modified';
+    if (order !== 'asc') order = 'desc';
+
+    const compare = this.getComparator(sort, order);
+    let files = this.getSortedFiles(sort, order, compare);
+
+    if (filter) {
+      const needle = String(filter).toLowerCase();
+      files = files.filter(file => file.name.toLowerCase().includes(needle));
     }
+
+    // Paginación por clave: buscar el primer elemento posterior al cursor
+    let start = 0;
+    const after = this.decodeCursor(cursor);
+    if (after) {
+      let low = 0;
+      let high = files.length;
+      while (low < high) {
+        const mid = (low + high) >> 1;
+        if (compare(files[mid], after) <= 0) low = mid + 1;
+        else high = mid;
+      }
+      start = low;
+    }
+
+    const page = files.slice(start, start + limit);
+    const last = page[page.length - 1];
+    const nextCursor = last && start + page.length < files.length
+      ? this.encodeCursor(last, sort)
+      : null;
+
+    return { files: page, total: files.length, nextCursor, version: this.indexVersion };
   }
 
-  async getFileStream(filename) {
-    const filepath = join(this.uploadDir, filename);
-    
-    // Verificar que el archivo esté dentro del directorio de uploads
-    if (!filepath.startsWith(this.uploadDir)) {
+  /**
+   * ETag de un listado: cambia cuando cambia el índice o la consulta
+   */
+  getListingETag(query, version) {
+    const hash = createHash('sha1').update(JSON.stringify(query)).digest('base64url').substring(0, 12);
+    return `W/"${this.indexEpoch}-${version}-${hash}"`;
+  }
+
+  getComparator(sort, order) {
+    const direction = order === 'asc' ? 1 : -1;
+    const value = (file) => (sort === 'name' ? file.name : Number(file[sort]));
+    return (a, b) => {
+      const va = value(a);
+      const vb = value(b);
+      if (va < vb) return -direction;
+      if (va > vb) return direction;
+      // Desempate estable por nombre
+      return a.name < b.name ? -1 : a.name > b.name ? 1 : 0;
+    };
+  }
+
+  /**
+   * Copia ordenada del índice, cacheada hasta que el índice cambie
+   */
+  getSortedFiles(sort, order, compare) {
+    const key = `${sort}:${order}`;
+    const cached = this.sortedCache.get(key);
+    if (cached && cached.version === this.indexVersion) {
+      return cached.files;
+    }
+
+    const files = [...this.index.values()].sort(compare);
+    this.sortedCache.set(key, { version: this.indexVersion, files });
+    return files;
+  }
+
+  encodeCursor(file, sort) {
+    const value = sort === 'name' ? file.name : Number(file[sort]);
+    return Buffer.from(JSON.stringify([value, file.name])).toString('base64url');
+  }
+
+  decodeCursor(cursor) {
+    if (!cursor) return null;
+    try {
+      const [value, name] = JSON.parse(Buffer.from(String(cursor), 'base64url').toString('utf8'));
+      // Objeto con la misma forma que una entrada del índice para el comparador
+      return { name, size: value, modified: value, created: value };
+    } catch (error) {
+      return null;
+    }
+  }
+
+  /**
+   * Ruta absoluta de un archivo, garantizando que esté dentro del directorio de uploads
+   */
+  resolveFilePath(filename) {
+    const root = resolve(this.uploadDir);
+    const filepath = resolve(root, String(filename));
+
+    if (!filepath.startsWith(root + sep) || basename(filepath).startsWith('.')) {
       throw new Error('Acceso no permitido');
     }
 
+    return filepath;
+  }
+
+  /**
+   * Ruta y metadatos de un archivo para servirlo
+   */
+  async getFileInfo(filename) {
+    const filepath = this.resolveFilePath(filename);
+
     try {
-      await fs.access(filepath);
       const stat = await fs.stat(filepath);
-      
-      return {
-        stream: createReadStream(filepath),
-        size: stat.size,
-        mtime: stat.mtime
-      };
+      if (!stat.isFile()) throw new Error('No es un archivo');
+      return { filepath, stat, size: stat.size, mtime: stat.mtime };
     } catch (error) {
       throw new Error('Archivo no encontrado');
     }
   }
 
+  async getFileStream(filename) {
+    const { filepath, size, mtime } = await this.getFileInfo(filename);
+
+    return {
+      stream: createReadStream(filepath),
+      size,
+      mtime
+    };
+  }
+
   async deleteFile(filename) {
-    const filepath = join(this.uploadDir, filename);
-    
-    if (!filepath.startsWith(this.uploadDir)) {
-      throw new Error('Acceso no permitido');
-    }
+    const filepath = this.resolveFilePath(filename);
 
     try {
       await fs.unlink(filepath);
+      if (this.index.delete(filename)) {
+        this.indexVersion++;
+      }
       logger.info(`🗑️ Archivo eliminado: ${filename}`);
       return true;
     } catch (error) {
@@ -202,7 +645,7 @@ class FileTransferService {
     return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
   }
 
-  cleanup() {
+  async cleanup() {
     // Limpiar transferencias completadas antiguas
     const now = Date.now();
     for (const [id, transfer] of this.activeTransfers.entries()) {
@@ -210,6 +653,25 @@ class FileTransferService {
         this.activeTransfers.delete(id);
       }
     }
+
+    // Borrar subidas abandonadas
+    try {
+      const entries = await fs.readdir(this.partialDir);
+      const active = new Set([...this.uploads.values()].map(upload => upload.metaPath));
+      for (const entry of entries) {
+        if (!entry.endsWith('.json')) continue;
+        const transferId = entry.slice(0, -'.json'.length);
+        const { partPath, metaPath } = this.getPartialPaths(transferId);
+        if (active.has(metaPath)) continue;
+        const stat = await fs.stat(partPath).catch(() => fs.stat(metaPath));
+        if (now - stat.mtimeMs > this.partialTTL) {
+          await this.abortUpload(transferId);
+          logger.info(`🧹 Upload abandonado eliminado: ${transferId}`);
+        }
+      }
+    } catch (error) {
+      logger.error('Error limpiando uploads parciales:', error);
+    }
   }
 }
 
@@ -1,12 +1,54 @@
-import { mouse, keyboard, Button, Point, Key } from '@nut-tree-fork/nut-js';
+import logger from '../utils/logger.js';
 
+/**
+ * Backend sin efecto para benchmarks y servidores sin escritorio
+ * (INPUT_BACKEND=noop): misma interfaz que nut.js, sin cargar el módulo nativo.
+ */
+const createNoopBackend = () => {
+  const noop = async () => {};
+  return {
+    mouse: {
+      config: {},
+      setPosition: noop,
+      move: noop,
+      pressButton: noop,
+      releaseButton: noop,
+      click: noop,
+      doubleClick: noop,
+      scrollUp: noop,
+      scrollDown: noop
+    },
+    keyboard: {
+      config: {},
+      pressKey: noop,
+      releaseKey: noop,
+      type: noop
+    },
+    Button: { LEFT: 0, RIGHT: 1, MIDDLE: 2 },
+    Point: class Point {
+      constructor(x, y) {
+        this.x = x;
+        this.y = y;
+      }
+    },
+    // Cualquier Key.X devuelve su nombre
+    Key: new Proxy({}, { get: (target, name) => name })
+  };
+};
 
+const { mouse, keyboard, Button, Point, Key } = process.env.INPUT_BACKEND === 'noop'
+  ? createNoopBackend()
+  : await import('@nut-tree-fork/nut-js');
 
-
-import logger from '../utils/logger.js';
+// Retardo entre acciones de nut.js (por defecto 100 ms ratón / 300 ms teclado).
+// El orden ya lo garantiza el pipeline de entrada, así que se reduce al mínimo.
+const AUTO_DELAY_MS = parseInt(process.env.INPUT_AUTO_DELAY_MS) || 0;
 
 class InputControlService {
   constructor() {
+    mouse.config.autoDelayMs = AUTO_DELAY_MS;
+    keyboard.config.autoDelayMs = AUTO_DELAY_MS;
+
     // Mapeo de teclas de JavaScript a códigos de nut.js
     this.keyMap = {
       // Navegación
@@ -76,7 +118,8 @@ class InputControlService {
         throw new Error('Coordenadas fuera de rango');
       }
       
-      await mouse.move([new Point(Math.round(x), Math.round(y))]);
+      // Posicionamiento directo: mouse.move() anima el trayecto y añade latencia
+      await mouse.setPosition(new Point(Math.round(x), Math.round(y)));
     } catch (error) {
       logger.error('Error moviendo mouse:', error);
       throw new Error('No se pudo mover el cursor');
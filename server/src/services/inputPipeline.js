@@ -0,0 +1,200 @@
+import { performance } from 'perf_hooks';
+import logger from '../utils/logger.js';
+import { inputLatencySeconds } from '../utils/metrics.js';
+
+// Eventos de entrada admitidos (mismos nombres que los eventos de socket)
+const INPUT_EVENTS = ['mouse_move', 'mouse_click', 'key_press', 'scroll'];
+
+// Muestras de latencia guardadas por sesión para percentiles
+const LATENCY_SAMPLES = 512;
+
+/**
+ * Cola de entrada de una sesión.
+ * Los eventos se aplican estrictamente en orden, de uno en uno. Mientras se
+ * aplica un evento, los movimientos consecutivos que llegan se fusionan en
+ * la última posición y los scrolls consecutivos se suman.
+ */
+class InputPipeline {
+  constructor(inputControl, { onApplied = null, onError = null, maxQueue = 1000 } = {}) {
+    this.inputControl = inputControl;
+    this.onApplied = onApplied;
+    this.onError = onError;
+    this.maxQueue = maxQueue;
+
+    this.queue = [];
+    this.draining = false;
+    this.closed = false;
+
+    this.latencies = new Float64Array(LATENCY_SAMPLES);
+    this.latencyIndex = 0;
+    this.latencyCount = 0;
+
+    this.stats = {
+      received: 0,
+      applied: 0,
+      coalesced: 0,
+      dropped: 0,
+      errors: 0,
+      maxDepth: 0
+    };
+  }
+
+  /**
+   * Encola un evento ({ event, ...datos })
+   */
+  push(input) {
+    if (this.closed || !input || !INPUT_EVENTS.includes(input.event)) return false;
+
+    this.stats.received++;
+    const last = this.queue[this.queue.length - 1];
+
+    // Fusionar con el último evento pendiente si es del mismo tipo
+    if (last && last.event === 'mouse_move' && input.event === 'mouse_move') {
+      last.x = input.x;
+      last.y = input.y;
+      this.stats.coalesced++;
+    } else if (last && last.event === 'scroll' && input.event === 'scroll') {
+      last.deltaX = (last.deltaX || 0) + (input.deltaX || 0);
+      last.deltaY = (last.deltaY || 0) + (input.deltaY || 0);
+      this.stats.coalesced++;
+    } else {
+      if (this.queue.length >= this.maxQueue) {
+        this.stats.dropped++;
+        return false;
+      }
+      // receivedAt: el primer evento fusionado marca la latencia real
+      this.queue.push({ ...input, receivedAt: performance.now() });
+      this.stats.maxDepth = Math.max(this.stats.maxDepth, this.queue.length);
+    }
+
+    this.drain();
+    return true;
+  }
+
+  /**
+   * Encola varios eventos (input_batch) conservando su orden
+   */
+  pushBatch(events) {
+    if (!Array.isArray(events)) return 0;
+    let accepted = 0;
+    for (const input of events) {
+      if (this.push(input)) accepted++;
+    }
+    return accepted;
+  }
+
+  async drain() {
+    if (this.draining) return;
+    this.draining = true;
+
+    try {
+      while (this.queue.length > 0 && !this.closed) {
+        const input = this.queue.shift();
+        try {
+          await this.apply(input);
+          this.stats.applied++;
+          const latency = performance.now() - input.receivedAt;
+          this.recordLatency(latency);
+          inputLatencySeconds.observe({ event: input.event }, latency / 1000);
+          if (this.onApplied) this.onApplied(input);
+        } catch (error) {
+          this.stats.errors++;
+          logger.error(`Error aplicando ${input.event}:`, error);
+          if (this.onError) this.onError(error, input);
+        }
+      }
+    } finally {
+      this.draining = false;
+    }
+  }
+
+  apply(input) {
+    switch (input.event) {
+      case 'mouse_move':
+        return this.inputControl.moveMouse(input.x, input.y);
+      case 'mouse_click':
+        return this.inputControl.click(input.button, input.type);
+      case 'key_press':
+        return this.inputControl.keyPress(input.key, input.modifiers);
+      case 'scroll':
+        return this.inputControl.scroll(input.deltaX, input.deltaY);
+      default:
+        return Promise.resolve();
+    }
+  }
+
+  recordLatency(ms) {
+    this.latencies[this.latencyIndex] = ms;
+    this.latencyIndex = (this.latencyIndex + 1) % LATENCY_SAMPLES;
+    this.latencyCount = Math.min(this.latencyCount + 1, LATENCY_SAMPLES);
+  }
+
+  getLatencyStats() {
+    if (this.latencyCount === 0) {
+      return { avg: 0, p50: 0, p99: 0, max: 0 };
+    }
+    const samples = Array.from(this.latencies.subarray(0, this.latencyCount)).sort((a, b) => a - b);
+    const pick = (p) => samples[Math.min(samples.length - 1, Math.floor(p * samples.length))];
+    const round = (value) => Math.round(value * 100) / 100;
+    return {
+      avg: round(samples.reduce((sum, value) => sum + value, 0) / samples.length),
+      p50: round(pick(0.5)),
+      p99: round(pick(0.99)),
+      max: round(samples[samples.length - 1])
+    };
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      queueDepth: this.queue.length,
+      latencyMs: this.getLatencyStats()
+    };
+  }
+
+  close() {
+    this.closed = true;
+    this.queue = [];
+  }
+}
+
+/**
+ * Registro de colas de entrada por socket
+ */
+class InputPipelineService {
+  constructor() {
+    this.pipelines = new Map(); // socket.id -> InputPipeline
+  }
+
+  create(socketId, inputControl, options = {}) {
+    this.remove(socketId);
+    const pipeline = new InputPipeline(inputControl, options);
+    this.pipelines.set(socketId, pipeline);
+    return pipeline;
+  }
+
+  get(socketId) {
+    return this.pipelines.get(socketId) || null;
+  }
+
+  remove(socketId) {
+    const pipeline = this.pipelines.get(socketId);
+    if (pipeline) {
+      pipeline.close();
+      this.pipelines.delete(socketId);
+    }
+  }
+
+  getStats() {
+    const sessions = [...this.pipelines.entries()].map(([socketId, pipeline]) => ({
+      socketId,
+      ...pipeline.getStats()
+    }));
+    return {
+      sessions,
+      queueDepth: sessions.reduce((sum, session) => sum + session.queueDepth, 0)
+    };
+  }
+}
+
+export default new InputPipelineService();
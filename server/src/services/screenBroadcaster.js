@@ -0,0 +1,700 @@
+import ScreenCaptureService from './screenCapture.js';
+import VideoCaptureLoop from './videoCapture.js';
+import stateStore from './stateStore.js';
+import logger from '../utils/logger.js';
+import { emitScreenFrame, wantsBinary } from '../utils/streamProtocol.js';
+import { screenStageSeconds, screenFramesTotal, screenBytesTotal, screenDroppedTotal } from '../utils/metrics.js';
+import { IS_CLUSTERED, IS_CAPTURE_WORKER, WORKER_ID, CAPTURE_WORKER_ID } from '../config/cluster.js';
+
+// Canales del almacén de estado para el reparto de frames entre workers
+const CONTROL_CHANNEL = 'capture:control'; // workers -> worker de captura
+const STATUS_CHANNEL = 'capture:status';   // worker de captura -> workers
+const WORKERS_CHANNEL = 'cluster:workers'; // primario -> workers (salidas)
+const framesChannel = (workerId) => `capture:frames:${workerId}`;
+
+// Bytes de imagen de un frame (completo o suma de tiles)
+const frameBytes = (frame) => (frame.type === 'delta'
+  ? frame.tiles.reduce((sum, tile) => sum + tile.data.length, 0)
+  : frame.data.length);
+
+// Intervalo mínimo entre peticiones de boost enviadas al worker de captura
+const REMOTE_BOOST_INTERVAL = 100;
+
+// Motor de captura: jpeg (capturas + tiles JPEG) o ffmpeg (vídeo H.264 en MP4 fragmentado)
+const VIDEO_ENGINE = process.env.SCREEN_ENGINE === 'ffmpeg';
+
+/**
+ * Suscripción de un socket a un bucle de captura.
+ * Política "último frame gana": si el socket no drena, el frame pendiente
+ * se reemplaza por el nuevo. Los deltas pendientes se fusionan para que
+ * el lienzo del cliente siga siendo correcto aunque se descarten frames.
+ */
+class FrameSubscriber {
+  constructor(socket, options = {}) {
+    this.socket = socket;
+    this.binary = wantsBinary(socket);
+    this.maxBacklog = options.maxBacklog || 1024 * 1024; // bytes pendientes en el websocket
+    this.maxPendingPackets = options.maxPendingPackets || 4;
+    this.retryDelay = options.retryDelay || 50;
+
+    this.pendingFull = null;
+    this.pendingDelta = null;
+    this.needsKeyframe = true;
+    this.retryTimer = null;
+
+    this.stats = { sent: 0, dropped: 0, bytes: 0 };
+
+    this.onDrain = () => this.flush();
+    if (socket.conn) {
+      socket.conn.on('drain', this.onDrain);
+    }
+  }
+
+  /**
+   * Datos encolados en el socket que aún no se han escrito a la red
+   */
+  getBacklog() {
+    const conn = this.socket.conn;
+    if (!conn) return { packets: 0, bytes: 0 };
+    const packets = conn.writeBuffer ? conn.writeBuffer.length : 0;
+    const ws = conn.transport && conn.transport.socket;
+    const bytes = ws && typeof ws.bufferedAmount === 'number' ? ws.bufferedAmount : 0;
+    return { packets, bytes };
+  }
+
+  isCongested() {
+    const { packets, bytes } = this.getBacklog();
+    return packets > this.maxPendingPackets || bytes > this.maxBacklog;
+  }
+
+  hasPending() {
+    return Boolean(this.pendingFull || this.pendingDelta);
+  }
+
+  /**
+   * Encola un frame. Devuelve false si hace falta un keyframe para este socket.
+   */
+  push(frame) {
+    if (frame.type === 'full') {
+      if (this.hasPending()) this.drop();
+      this.pendingFull = frame;
+      this.pendingDelta = null;
+      this.needsKeyframe = false;
+    } else {
+      // Sin frame completo previo un delta no sirve
+      if (this.needsKeyframe) return false;
+
+      if (this.pendingDelta) {
+        this.drop();
+        const tiles = this.pendingDelta.tiles.concat(frame.tiles);
+        const area = tiles.reduce((sum, tile) => sum + tile.width * tile.height, 0);
+
+        // La fusión ya ocupa más que un frame completo: pedir keyframe
+        if (area > frame.width * frame.height) {
+          this.pendingDelta = null;
+          this.needsKeyframe = true;
+          return false;
+        } else {
+          this.pendingDelta = { ...frame, tiles };
+        }
+      } else {
+        this.pendingDelta = frame;
+      }
+    }
+
+    this.flush();
+    return true;
+  }
+
+  drop() {
+    this.stats.dropped++;
+    screenDroppedTotal.inc();
+  }
+
+  emit(frame) {
+    const bytes = frameBytes(frame);
+    emitScreenFrame(this.socket, frame, this.binary);
+    this.stats.sent++;
+    this.stats.bytes += bytes;
+    screenFramesTotal.inc({ type: frame.type });
+    screenBytesTotal.inc({ type: frame.type }, bytes);
+  }
+
+  flush() {
+    if (!this.hasPending() || !this.socket.connected) return;
+
+    if (this.isCongested()) {
+      if (!this.retryTimer) {
+        this.retryTimer = setTimeout(() => {
+          this.retryTimer = null;
+          this.flush();
+        }, this.retryDelay);
+      }
+      return;
+    }
+
+    if (this.pendingFull) {
+      this.emit(this.pendingFull);
+      this.pendingFull = null;
+    }
+    if (this.pendingDelta) {
+      this.emit(this.pendingDelta);
+      this.pendingDelta = null;
+    }
+  }
+
+  sendError(message) {
+    if (this.socket.connected) {
+      this.socket.emit('error', { type: 'screen', message });
+    }
+  }
+
+  close() {
+    clearTimeout(this.retryTimer);
+    this.pendingFull = null;
+    this.pendingDelta = null;
+    if (this.socket.conn) {
+      this.socket.conn.off('drain', this.onDrain);
+    }
+  }
+}
+
+/**
+ * Suscripción de un socket al motor de vídeo. Los fragmentos dependen del
+ * anterior, así que no se reemplazan: se encolan y, si el socket no drena,
+ * se descarta la cola entera y se espera al siguiente keyframe.
+ */
+class VideoSubscriber extends FrameSubscriber {
+  constructor(socket, options = {}) {
+    super(socket, options);
+    this.maxPendingFrames = options.maxPendingFrames || 60;
+
+    this.generation = null; // stream del que se recibió el segmento de inicialización
+    this.lastSeq = 0;
+    this.pendingInit = null;
+    this.pendingFrames = [];
+    this.pendingBytes = 0;
+  }
+
+  hasPending() {
+    return Boolean(this.pendingInit || this.pendingFrames.length > 0);
+  }
+
+  /**
+   * Encola un segmento. Devuelve false si falta el de inicialización.
+   */
+  push(frame) {
+    if (frame.type === 'init') {
+      if (frame.generation === this.generation) return true;
+      // Nuevo stream (primer espectador o ffmpeg reiniciado): empezar de cero
+      this.generation = frame.generation;
+      this.pendingInit = frame;
+      this.pendingFrames = [];
+      this.pendingBytes = 0;
+      this.lastSeq = 0;
+      this.needsKeyframe = true;
+      this.flush();
+      return true;
+    }
+
+    if (frame.generation !== this.generation) return false;
+    // Ya entregado (reenvío del GOP para otro espectador)
+    if (frame.seq <= this.lastSeq) return true;
+    if (this.needsKeyframe && !frame.key) return true;
+
+    this.needsKeyframe = false;
+    this.lastSeq = frame.seq;
+    this.pendingFrames.push(frame);
+    this.pendingBytes += frame.data.length;
+
+    if (this.pendingFrames.length > this.maxPendingFrames || this.pendingBytes > this.maxBacklog) {
+      for (let i = 0; i < this.pendingFrames.length; i++) this.drop();
+      this.pendingFrames = [];
+      this.pendingBytes = 0;
+      this.needsKeyframe = true;
+      return true;
+    }
+
+    this.flush();
+    return true;
+  }
+
+  flush() {
+    if (!this.hasPending() || !this.socket.connected) return;
+
+    if (this.isCongested()) {
+      if (!this.retryTimer) {
+        this.retryTimer = setTimeout(() => {
+          this.retryTimer = null;
+          this.flush();
+        }, this.retryDelay);
+      }
+      return;
+    }
+
+    if (this.pendingInit) {
+      this.emit(this.pendingInit);
+      this.pendingInit = null;
+    }
+    const frames = this.pendingFrames;
+    this.pendingFrames = [];
+    this.pendingBytes = 0;
+    for (const frame of frames) {
+      this.emit(frame);
+    }
+  }
+
+  close() {
+    super.close();
+    this.pendingInit = null;
+    this.pendingFrames = [];
+  }
+}
+
+/**
+ * Bucle de captura compartido por todos los sockets con el mismo perfil.
+ * Frame rate adaptativo: máximo mientras la pantalla cambia, idleInterval
+ * si no cambia y backoff si ningún suscriptor consigue drenar.
+ */
+class CaptureLoop {
+  constructor(capture, options = {}) {
+    this.capture = capture;
+    this.key = capture.getProfileKey();
+
+    const maxFps = options.maxFps || parseInt(process.env.SCREEN_MAX_FPS) || 15;
+    this.minInterval = Math.round(1000 / maxFps);
+    this.idleInterval = options.idleInterval || 250;
+    this.maxInterval = options.maxInterval || 1000;
+
+    this.interval = this.minInterval;
+    this.seq = 0;
+    this.session = capture.createSession();
+    this.subscribers = new Set();
+    this.timer = null;
+    this.running = false;
+    this.capturing = false;
+
+    this.stats = {
+      frames: 0,
+      full: 0,
+      delta: 0,
+      unchanged: 0,
+      congested: 0,
+      errors: 0
+    };
+  }
+
+  start() {
+    if (this.running) return;
+    this.running = true;
+    logger.info(`🖥️ Bucle de captura iniciado (${this.key})`);
+    this.schedule(0);
+  }
+
+  stop() {
+    this.running = false;
+    clearTimeout(this.timer);
+    this.timer = null;
+    logger.info(`🖥️ Bucle de captura detenido (${this.key})`);
+  }
+
+  /**
+   * Vuelve al frame rate máximo (p.ej. tras un evento de entrada)
+   */
+  boost() {
+    if (!this.running || this.interval === this.minInterval) return;
+    this.interval = this.minInterval;
+    if (!this.capturing) {
+      this.schedule(0);
+    }
+  }
+
+  requestKeyframe() {
+    this.session.keyframe = true;
+    this.boost();
+  }
+
+  schedule(delay) {
+    clearTimeout(this.timer);
+    this.timer = setTimeout(() => this.tick(), delay);
+  }
+
+  async tick() {
+    if (!this.running) return;
+
+    // Todos los suscriptores tienen frames sin entregar: no capturar
+    const subscribers = [...this.subscribers];
+    if (subscribers.length > 0 && subscribers.every(sub => sub.hasPending())) {
+      this.stats.congested++;
+      this.interval = Math.min(this.interval * 2, this.maxInterval);
+      this.schedule(this.interval);
+      return;
+    }
+
+    const started = Date.now();
+    this.capturing = true;
+
+    try {
+      const endFrame = screenStageSeconds.startTimer({ stage: 'frame' });
+      const frame = await this.capture.capture(this.session);
+      endFrame();
+
+      if (frame) {
+        frame.seq = ++this.seq;
+        this.stats.frames++;
+        this.stats[frame.type]++;
+        for (const subscriber of this.subscribers) {
+          if (!subscriber.push(frame)) {
+            this.session.keyframe = true;
+          }
+        }
+        // Incremento aditivo hacia el máximo
+        this.interval = Math.max(this.minInterval, this.interval - this.minInterval);
+      } else {
+        this.stats.unchanged++;
+        this.interval = Math.min(Math.max(this.interval * 1.5, this.minInterval), this.idleInterval);
+      }
+    } catch (error) {
+      this.stats.errors++;
+      this.interval = this.maxInterval;
+      logger.error('Error captura pantalla:', error);
+      for (const subscriber of this.subscribers) {
+        subscriber.sendError('Error al capturar pantalla');
+      }
+    } finally {
+      this.capturing = false;
+    }
+
+    if (this.running) {
+      const elapsed = Date.now() - started;
+      this.schedule(Math.max(0, this.interval - elapsed));
+    }
+  }
+
+  getStats() {
+    return {
+      profile: this.key,
+      settings: this.capture.getSettings(),
+      subscribers: this.subscribers.size,
+      fps: Math.round(1000 / this.interval),
+      ...this.stats
+    };
+  }
+}
+
+/**
+ * En el worker de captura: representa a todos los sockets de otro worker
+ * suscritos a un perfil. Los frames se reenvían por el almacén de estado
+ * y el control de flujo lo hacen los FrameSubscriber del worker destino.
+ */
+class RemoteViewer {
+  constructor(workerId, key) {
+    this.workerId = workerId;
+    this.key = key;
+    this.channel = framesChannel(workerId);
+    this.stats = { sent: 0, dropped: 0 };
+  }
+
+  hasPending() {
+    return false;
+  }
+
+  push(frame) {
+    stateStore.publish(this.channel, { key: this.key, frame });
+    this.stats.sent++;
+    return true;
+  }
+
+  sendError(message) {
+    stateStore.publish(this.channel, { key: this.key, error: message });
+  }
+
+  close() {}
+}
+
+/**
+ * En el resto de workers: sustituye a CaptureLoop y recibe los frames del
+ * worker de captura. Expone la misma interfaz que CaptureLoop.
+ */
+class RemoteCaptureLoop {
+  constructor(profile, key) {
+    this.profile = profile;
+    this.key = key;
+    this.subscribers = new Set();
+    this.running = false;
+    this.lastBoost = 0;
+
+    this.stats = {
+      frames: 0,
+      full: 0,
+      delta: 0,
+      init: 0,
+      video: 0,
+      errors: 0
+    };
+  }
+
+  send(action) {
+    stateStore.publish(CONTROL_CHANNEL, {
+      action,
+      workerId: WORKER_ID,
+      key: this.key,
+      profile: this.profile
+    });
+  }
+
+  start() {
+    if (this.running) return;
+    this.running = true;
+    this.send('subscribe');
+    logger.info(`🖥️ Suscrito a la captura del worker ${CAPTURE_WORKER_ID} (${this.key})`);
+  }
+
+  stop() {
+    this.running = false;
+    this.send('unsubscribe');
+  }
+
+  boost() {
+    const now = Date.now();
+    if (!this.running || now - this.lastBoost < REMOTE_BOOST_INTERVAL) return;
+    this.lastBoost = now;
+    this.send('boost');
+  }
+
+  requestKeyframe() {
+    if (this.running) this.send('keyframe');
+  }
+
+  deliver(frame) {
+    this.stats.frames++;
+    this.stats[frame.type]++;
+
+    let needsKeyframe = false;
+    for (const subscriber of this.subscribers) {
+      if (!subscriber.push(frame)) needsKeyframe = true;
+    }
+    if (needsKeyframe) this.requestKeyframe();
+  }
+
+  deliverError(message) {
+    this.stats.errors++;
+    for (const subscriber of this.subscribers) {
+      subscriber.sendError(message);
+    }
+  }
+
+  getStats() {
+    return {
+      profile: this.key,
+      remote: true,
+      subscribers: this.subscribers.size,
+      ...this.stats
+    };
+  }
+}
+
+/**
+ * Reparte los frames de un único bucle de captura por perfil
+ * entre todos los sockets suscritos (conteo de referencias).
+ */
+class ScreenBroadcasterService {
+  constructor() {
+    this.loops = new Map();         // perfil -> CaptureLoop | RemoteCaptureLoop
+    this.subscriptions = new Map(); // socket.id -> { loop, subscriber, profile }
+    this.remoteViewers = new Map(); // "worker:perfil" -> { loop, viewer } (worker de captura)
+    this.defaultProfile = { display: null, quality: 80, scale: 0.8 };
+
+    if (IS_CLUSTERED) {
+      this.setupCluster();
+    }
+  }
+
+  /**
+   * Modo cluster: solo el worker de captura ejecuta CaptureLoop; el resto
+   * se suscribe a él y recibe los frames por el almacén de estado.
+   */
+  setupCluster() {
+    if (IS_CAPTURE_WORKER) {
+      stateStore.subscribe(CONTROL_CHANNEL, (msg) => this.handleControl(msg));
+      stateStore.subscribe(WORKERS_CHANNEL, (msg) => {
+        if (msg.action === 'exit') this.releaseWorker(String(msg.workerId));
+      });
+      // Los workers que ya tenían espectadores vuelven a suscribirse
+      stateStore.publish(STATUS_CHANNEL, { action: 'ready' });
+    } else {
+      stateStore.subscribe(framesChannel(WORKER_ID), ({ key, frame, error }) => {
+        const loop = this.loops.get(key);
+        if (!loop) return;
+        if (error) loop.deliverError(error);
+        else loop.deliver(frame);
+      });
+      stateStore.subscribe(STATUS_CHANNEL, (msg) => {
+        if (msg.action !== 'ready') return;
+        for (const loop of this.loops.values()) {
+          if (loop.running) loop.send('subscribe');
+        }
+      });
+    }
+  }
+
+  /**
+   * Obtiene (o crea) el bucle de un perfil
+   */
+  acquireLoop(profile) {
+    const capture = new ScreenCaptureService(profile);
+    const key = capture.getProfileKey();
+
+    let loop = this.loops.get(key);
+    if (!loop) {
+      if (!IS_CAPTURE_WORKER) {
+        loop = new RemoteCaptureLoop(profile, key);
+      } else {
+        loop = VIDEO_ENGINE ? new VideoCaptureLoop(capture) : new CaptureLoop(capture);
+      }
+      this.loops.set(key, loop);
+    }
+    return loop;
+  }
+
+  /**
+   * Arranca el bucle o, si ya estaba en marcha, pide un frame completo
+   * para el nuevo espectador
+   */
+  activateLoop(loop) {
+    if (loop.running) {
+      loop.requestKeyframe();
+    } else {
+      loop.start();
+    }
+  }
+
+  /**
+   * Detiene el bucle al salir su último suscriptor
+   */
+  releaseLoop(loop) {
+    if (loop.subscribers.size === 0) {
+      loop.stop();
+      this.loops.delete(loop.key);
+    }
+  }
+
+  /**
+   * Suscribe un socket al bucle de su perfil, creándolo si no existe
+   */
+  subscribe(socket, profile = {}) {
+    this.unsubscribe(socket);
+
+    const merged = { ...this.defaultProfile, ...profile };
+    const loop = this.acquireLoop(merged);
+
+    const subscriber = VIDEO_ENGINE ? new VideoSubscriber(socket) : new FrameSubscriber(socket);
+    loop.subscribers.add(subscriber);
+    this.subscriptions.set(socket.id, { loop, subscriber, profile: merged });
+
+    this.activateLoop(loop);
+
+    return loop.key;
+  }
+
+  /**
+   * Quita la suscripción; el bucle se detiene al salir el último socket
+   */
+  unsubscribe(socket) {
+    const subscription = this.subscriptions.get(socket.id);
+    if (!subscription) return;
+
+    const { loop, subscriber } = subscription;
+    subscriber.close();
+    loop.subscribers.delete(subscriber);
+    this.subscriptions.delete(socket.id);
+
+    this.releaseLoop(loop);
+  }
+
+  /**
+   * Mensajes de control de otros workers (solo en el worker de captura)
+   */
+  handleControl({ action, workerId, key, profile }) {
+    const remoteKey = `${workerId}:${key}`;
+    const remote = this.remoteViewers.get(remoteKey);
+
+    switch (action) {
+      case 'subscribe': {
+        if (remote) {
+          remote.loop.requestKeyframe();
+          return;
+        }
+        const loop = this.acquireLoop({ ...this.defaultProfile, ...profile });
+        const viewer = new RemoteViewer(workerId, loop.key);
+        loop.subscribers.add(viewer);
+        this.remoteViewers.set(remoteKey, { loop, viewer });
+        this.activateLoop(loop);
+        break;
+      }
+      case 'unsubscribe':
+        if (remote) this.releaseRemote(remoteKey);
+        break;
+      case 'boost':
+        if (remote) remote.loop.boost();
+        break;
+      case 'keyframe':
+        if (remote) remote.loop.requestKeyframe();
+        break;
+    }
+  }
+
+  releaseRemote(remoteKey) {
+    const { loop, viewer } = this.remoteViewers.get(remoteKey);
+    loop.subscribers.delete(viewer);
+    this.remoteViewers.delete(remoteKey);
+    this.releaseLoop(loop);
+  }
+
+  /**
+   * Un worker terminó: liberar sus suscripciones remotas
+   */
+  releaseWorker(workerId) {
+    for (const [remoteKey, { viewer }] of this.remoteViewers) {
+      if (String(viewer.workerId) === workerId) {
+        this.releaseRemote(remoteKey);
+      }
+    }
+  }
+
+  /**
+   * Cambia calidad/escala de un socket moviéndolo a otro perfil
+   */
+  updateProfile(socket, changes) {
+    const subscription = this.subscriptions.get(socket.id);
+    const profile = { ...(subscription ? subscription.profile : this.defaultProfile), ...changes };
+    return this.subscribe(socket, profile);
+  }
+
+  boost(socket) {
+    const subscription = this.subscriptions.get(socket.id);
+    if (subscription) {
+      subscription.loop.boost();
+    }
+  }
+
+  getStats() {
+    return {
+      loops: [...this.loops.values()].map(loop => loop.getStats()),
+      viewers: [...this.subscriptions.entries()].map(([socketId, { loop, subscriber }]) => ({
+        socketId,
+        profile: loop.key,
+        binary: subscriber.binary,
+        ...subscriber.stats,
+        backlog: subscriber.getBacklog()
+      })),
+      remoteViewers: [...this.remoteViewers.values()].map(({ viewer }) => ({
+        workerId: viewer.workerId,
+        profile: viewer.key,
+        ...viewer.stats
+      }))
+    };
+  }
+}
+
+export default new ScreenBroadcasterService();
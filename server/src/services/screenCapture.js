@@ -1,75 +1,344 @@
 import screenshot from 'screenshot-desktop';
 import sharp from 'sharp';
 import logger from '../utils/logger.js';
+import { screenStageSeconds } from '../utils/metrics.js';
+
+// Cada cuánto se vuelve a consultar la lista de pantallas (ms)
+const DISPLAY_CACHE_MS = 30000;
+
+// Fuente de prueba sin escritorio (benchmarks, CI): SCREEN_SOURCE=synthetic
+const SYNTHETIC_SOURCE = process.env.SCREEN_SOURCE === 'synthetic';
+const SYNTHETIC_SIZE = (process.env.SCREEN_SYNTHETIC_SIZE || '1920x1080').split('x').map(Number);
+const syntheticBackgrounds = new Map(); // "anchoxalto" -> Buffer RGB
+let syntheticFrame = 0;
+
+/**
+ * Fondo en degradado para la fuente sintética (se genera una vez por tamaño)
+ */
+const getSyntheticBackground = (width, height) => {
+  const key = `${width}x${height}`;
+  let background = syntheticBackgrounds.get(key);
+  if (!background) {
+    background = Buffer.alloc(width * height * 3);
+    for (let y = 0; y < height; y++) {
+      for (let x = 0; x < width; x++) {
+        const i = (y * width + x) * 3;
+        background[i] = (x * 255) / width;
+        background[i + 1] = (y * 255) / height;
+        background[i + 2] = 128;
+      }
+    }
+    syntheticBackgrounds.set(key, background);
+  }
+  return background;
+};
 
 class ScreenCaptureService {
-  constructor() {
+  constructor(options = {}) {
     this.quality = 80;
     this.scaleFactor = 0.8;
     this.maxWidth = 1920;
     this.maxHeight = 1080;
+    this.displayId = options.display ?? null; // null = pantalla principal
+
+    if (options.quality !== undefined) this.setQuality(options.quality);
+    if (options.scale !== undefined) this.setScale(options.scale);
+
+    // Detección de cambios por tiles
+    this.tileSize = parseInt(process.env.SCREEN_TILE_SIZE) || 64;
+    this.maxDirtyRatio = 0.5; // Por encima de este % de tiles cambiados se envía frame completo
+    this.keyframeInterval = 30000; // Frame completo periódico (ms)
+
+    // Caché de pantalla
+    this.display = null;
+    this.sourceSize = null;
+    this.displayCheckedAt = 0;
   }
 
-  async capture() {
-    try {
-      // Capturar pantalla completa
+  /**
+   * Crea el estado de diferencias de un stream (frame anterior enviado)
+   */
+  createSession() {
+    return {
+      previous: null,
+      keyframe: true,
+      lastKeyframeAt: 0
+    };
+  }
+
+  /**
+   * Obtiene la pantalla principal y su resolución, con caché
+   */
+  async getDisplay(imgBuffer = null) {
+    const now = Date.now();
+    if (!this.display || now - this.displayCheckedAt > DISPLAY_CACHE_MS) {
       const displays = await screenshot.listDisplays();
-      const primaryDisplay = displays.find(d => d.primary) || displays[0];
-      
-      const imgBuffer = await screenshot({ 
-        screen: primaryDisplay.id,
-        format: 'png' 
-      });
+      this.display = (this.displayId !== null && displays.find(d => String(d.id) === String(this.displayId)))
+        || displays.find(d => d.primary)
+        || displays[0];
+      this.sourceSize = null;
+      this.displayCheckedAt = now;
+    }
 
-      // Obtener dimensiones originales
+    if (!this.sourceSize && imgBuffer) {
       const metadata = await sharp(imgBuffer).metadata();
-      
-      // Calcular nuevas dimensiones manteniendo aspecto
-      let newWidth = metadata.width * this.scaleFactor;
-      let newHeight = metadata.height * this.scaleFactor;
-
-      // Limitar tamaño máximo
-      if (newWidth > this.maxWidth) {
-        newHeight = (newHeight * this.maxWidth) / newWidth;
-        newWidth = this.maxWidth;
+      this.sourceSize = { width: metadata.width, height: metadata.height };
+    }
+
+    return this.display;
+  }
+
+  /**
+   * Invalida la caché de pantalla (p.ej. tras un error de captura)
+   */
+  invalidateDisplay() {
+    this.display = null;
+    this.sourceSize = null;
+  }
+
+  /**
+   * Calcula las dimensiones de salida manteniendo aspecto
+   */
+  getTargetSize() {
+    let newWidth = this.sourceSize.width * this.scaleFactor;
+    let newHeight = this.sourceSize.height * this.scaleFactor;
+
+    // Limitar tamaño máximo
+    if (newWidth > this.maxWidth) {
+      newHeight = (newHeight * this.maxWidth) / newWidth;
+      newWidth = this.maxWidth;
+    }
+    if (newHeight > this.maxHeight) {
+      newWidth = (newWidth * this.maxHeight) / newHeight;
+      newHeight = this.maxHeight;
+    }
+
+    return { width: Math.round(newWidth), height: Math.round(newHeight) };
+  }
+
+  /**
+   * Captura la pantalla y la devuelve redimensionada como píxeles RGB (un solo decode)
+   */
+  async grabRaw() {
+    if (SYNTHETIC_SOURCE) {
+      return this.grabSynthetic();
+    }
+
+    const display = await this.getDisplay();
+    const endGrab = screenStageSeconds.startTimer({ stage: 'grab' });
+    const imgBuffer = await screenshot({
+      screen: display.id,
+      format: 'png'
+    });
+    endGrab();
+
+    if (!this.sourceSize) {
+      await this.getDisplay(imgBuffer);
+    }
+
+    const target = this.getTargetSize();
+    const endResize = screenStageSeconds.startTimer({ stage: 'resize' });
+    const { data, info } = await sharp(imgBuffer)
+      .resize(target.width, target.height, {
+        fit: 'inside',
+        withoutEnlargement: true
+      })
+      .removeAlpha()
+      .raw()
+      .toBuffer({ resolveWithObject: true });
+    endResize();
+
+    return { pixels: data, width: info.width, height: info.height, channels: info.channels };
+  }
+
+  /**
+   * Frame sintético: degradado fijo con un bloque que se desplaza,
+   * de modo que cada frame produce unos pocos tiles modificados
+   */
+  grabSynthetic() {
+    const endGrab = screenStageSeconds.startTimer({ stage: 'grab' });
+    this.sourceSize = { width: SYNTHETIC_SIZE[0], height: SYNTHETIC_SIZE[1] };
+    const { width, height } = this.getTargetSize();
+
+    const pixels = Buffer.from(getSyntheticBackground(width, height));
+    const box = Math.max(16, Math.round(width / 20));
+    const step = syntheticFrame++;
+    const left = (step * 8) % Math.max(1, width - box);
+    const top = Math.floor(height / 2 - box / 2 + Math.sin(step / 10) * (height / 4));
+
+    for (let y = Math.max(0, top); y < Math.min(height, top + box); y++) {
+      pixels.fill(255, (y * width + left) * 3, (y * width + left + box) * 3);
+    }
+    endGrab();
+
+    return { pixels, width, height, channels: 3 };
+  }
+
+  /**
+   * Codifica a JPEG una región de un frame RGB (devuelve un Buffer)
+   */
+  async encodeRegion(raw, region = null) {
+    let image = sharp(raw.pixels, {
+      raw: { width: raw.width, height: raw.height, channels: raw.channels }
+    });
+
+    if (region) {
+      image = image.extract({
+        left: region.x,
+        top: region.y,
+        width: region.width,
+        height: region.height
+      });
+    }
+
+    const endEncode = screenStageSeconds.startTimer({ stage: 'encode' });
+    const data = await image
+      .jpeg({
+        quality: this.quality,
+        progressive: !region,
+        mozjpeg: true
+      })
+      .toBuffer();
+    endEncode();
+
+    return data;
+  }
+
+  /**
+   * Devuelve los rectángulos que cambiaron respecto al frame anterior.
+   * Los tiles contiguos de una misma fila se agrupan en un solo rectángulo.
+   */
+  diffTiles(raw, previous) {
+    const { pixels, width, height, channels } = raw;
+    const prev = previous.pixels;
+    const tile = this.tileSize;
+    const stride = width * channels;
+    const cols = Math.ceil(width / tile);
+    const rects = [];
+    let dirtyCount = 0;
+
+    for (let ty = 0; ty < height; ty += tile) {
+      const th = Math.min(tile, height - ty);
+      const dirty = new Array(cols).fill(false);
+      let bandDirty = false;
+
+      for (let y = ty; y < ty + th; y++) {
+        const rowStart = y * stride;
+        // Fila idéntica: ningún tile de la fila cambió
+        if (pixels.compare(prev, rowStart, rowStart + stride, rowStart, rowStart + stride) === 0) {
+          continue;
+        }
+        for (let col = 0; col < cols; col++) {
+          if (dirty[col]) continue;
+          const start = rowStart + col * tile * channels;
+          const end = Math.min(start + tile * channels, rowStart + stride);
+          if (pixels.compare(prev, start, end, start, end) !== 0) {
+            dirty[col] = true;
+            bandDirty = true;
+          }
+        }
       }
-      if (newHeight > this.maxHeight) {
-        newWidth = (newWidth * this.maxHeight) / newHeight;
-        newHeight = this.maxHeight;
+
+      if (!bandDirty) continue;
+
+      for (let col = 0; col < cols; col++) {
+        if (!dirty[col]) continue;
+        const startCol = col;
+        while (col + 1 < cols && dirty[col + 1]) col++;
+        dirtyCount += col - startCol + 1;
+        const x = startCol * tile;
+        rects.push({
+          x,
+          y: ty,
+          width: Math.min((col + 1) * tile, width) - x,
+          height: th
+        });
+      }
+    }
+
+    const totalTiles = cols * Math.ceil(height / tile);
+    return { rects, dirtyRatio: dirtyCount / totalTiles };
+  }
+
+  /**
+   * Captura un frame para un stream.
+   * Devuelve un frame completo, un frame delta con los tiles cambiados,
+   * o null si la pantalla no cambió.
+   */
+  async capture(session = null) {
+    try {
+      const raw = await this.grabRaw();
+      const now = Date.now();
+
+      const needsKeyframe = !session
+        || session.keyframe
+        || !session.previous
+        || session.previous.width !== raw.width
+        || session.previous.height !== raw.height
+        || now - session.lastKeyframeAt > this.keyframeInterval;
+
+      if (!needsKeyframe) {
+        const endDiff = screenStageSeconds.startTimer({ stage: 'diff' });
+        const { rects, dirtyRatio } = this.diffTiles(raw, session.previous);
+        endDiff();
+
+        if (rects.length === 0) {
+          return null;
+        }
+
+        if (dirtyRatio <= this.maxDirtyRatio) {
+          const tiles = await Promise.all(rects.map(async (rect) => ({
+            ...rect,
+            data: await this.encodeRegion(raw, rect)
+          })));
+          session.previous = raw;
+
+          return {
+            type: 'delta',
+            tiles,
+            timestamp: now,
+            format: 'jpeg',
+            width: raw.width,
+            height: raw.height
+          };
+        }
       }
 
-      // Procesar imagen
-      const processed = await sharp(imgBuffer)
-        .resize(Math.round(newWidth), Math.round(newHeight), {
-          fit: 'inside',
-          withoutEnlargement: true
-        })
-        .jpeg({ 
-          quality: this.quality,
-          progressive: true,
-          mozjpeg: true
-        })
-        .toBuffer();
+      const data = await this.encodeRegion(raw);
+      if (session) {
+        session.previous = raw;
+        session.keyframe = false;
+        session.lastKeyframeAt = now;
+      }
 
       return {
-        data: processed.toString('base64'),
-        timestamp: Date.now(),
+        type: 'full',
+        data,
+        timestamp: now,
         format: 'jpeg',
-        width: Math.round(newWidth),
-        height: Math.round(newHeight)
+        width: raw.width,
+        height: raw.height
       };
     } catch (error) {
+      this.invalidateDisplay();
       logger.error('Error en captura de pantalla:', error);
       throw error;
     }
   }
 
   setQuality(quality) {
-    this.quality = Math.max(10, Math.min(100, quality));
+    this.quality = Math.round(Math.max(10, Math.min(100, Number(quality) || 80)));
   }
 
   setScale(factor) {
-    this.scaleFactor = Math.max(0.3, Math.min(1, factor));
+    this.scaleFactor = Math.round(Math.max(0.3, Math.min(1, Number(factor) || 0.8)) * 100) / 100;
+  }
+
+  /**
+   * Clave del perfil de captura (pantalla + calidad + escala)
+   */
+  getProfileKey() {
+    return `${this.displayId ?? 'primary'}:${this.quality}:${this.scaleFactor}`;
   }
 
   getSettings() {
@@ -77,9 +346,10 @@ class ScreenCaptureService {
       quality: this.quality,
       scaleFactor: this.scaleFactor,
       maxWidth: this.maxWidth,
-      maxHeight: this.maxHeight
+      maxHeight: this.maxHeight,
+      tileSize: this.tileSize
     };
   }
 }
 
-export default ScreenCaptureService;
\ No newline at end of file
+export default ScreenCaptureService;
@@ -0,0 +1,290 @@
+import logger from '../utils/logger.js';
+import { IS_CLUSTERED, STATE_TIMEOUT_MS } from '../config/cluster.js';
+
+/**
+ * Almacén de estado compartido (sesiones, chat, presencia).
+ *
+ * Implementa un subconjunto de comandos de Redis con la misma semántica
+ * (los valores son cadenas, índices negativos en listas, etc.) para que
+ * un adaptador sobre Redis real pueda sustituirlo sin tocar los servicios.
+ *
+ * - MemoryStateAdapter: un solo proceso, todo en memoria.
+ * - ClusterStateAdapter: workers del cluster; los comandos se ejecutan en
+ *   el proceso primario (StateServer) a través del canal IPC.
+ *
+ * publish() entrega el mensaje a los suscriptores de los DEMÁS procesos;
+ * en modo de un solo proceso no hace nada.
+ */
+
+// Comandos admitidos (también los que acepta StateServer por IPC)
+const COMMANDS = [
+  'get', 'set', 'del', 'incr',
+  'hget', 'hset', 'hdel', 'hgetall', 'hlen',
+  'rpush', 'lrange', 'ltrim', 'llen'
+];
+
+/**
+ * Normaliza índices de lista al estilo Redis (negativos desde el final)
+ */
+const listRange = (length, start, stop) => {
+  const from = start < 0 ? Math.max(length + start, 0) : start;
+  const to = stop < 0 ? length + stop : Math.min(stop, length - 1);
+  return [from, to];
+};
+
+export class MemoryStateAdapter {
+  constructor() {
+    this.strings = new Map();
+    this.hashes = new Map();
+    this.lists = new Map();
+  }
+
+  async get(key) {
+    return this.strings.has(key) ? this.strings.get(key) : null;
+  }
+
+  async set(key, value) {
+    this.strings.set(key, String(value));
+    return 'OK';
+  }
+
+  async del(...keys) {
+    let removed = 0;
+    for (const key of keys) {
+      if (this.strings.delete(key)) removed++;
+      if (this.hashes.delete(key)) removed++;
+      if (this.lists.delete(key)) removed++;
+    }
+    return removed;
+  }
+
+  async incr(key) {
+    const value = (parseInt(this.strings.get(key)) || 0) + 1;
+    this.strings.set(key, String(value));
+    return value;
+  }
+
+  async hget(key, field) {
+    const hash = this.hashes.get(key);
+    return hash && hash.has(field) ? hash.get(field) : null;
+  }
+
+  async hset(key, field, value) {
+    let hash = this.hashes.get(key);
+    if (!hash) {
+      hash = new Map();
+      this.hashes.set(key, hash);
+    }
+    const created = hash.has(field) ? 0 : 1;
+    hash.set(field, String(value));
+    return created;
+  }
+
+  async hdel(key, ...fields) {
+    const hash = this.hashes.get(key);
+    if (!hash) return 0;
+    let removed = 0;
+    for (const field of fields) {
+      if (hash.delete(field)) removed++;
+    }
+    if (hash.size === 0) this.hashes.delete(key);
+    return removed;
+  }
+
+  async hgetall(key) {
+    const hash = this.hashes.get(key);
+    return hash ? Object.fromEntries(hash) : {};
+  }
+
+  async hlen(key) {
+    const hash = this.hashes.get(key);
+    return hash ? hash.size : 0;
+  }
+
+  async rpush(key, ...values) {
+    let list = this.lists.get(key);
+    if (!list) {
+      list = [];
+      this.lists.set(key, list);
+    }
+    list.push(...values.map(String));
+    return list.length;
+  }
+
+  async lrange(key, start, stop) {
+    const list = this.lists.get(key) || [];
+    const [from, to] = listRange(list.length, start, stop);
+    return from > to ? [] : list.slice(from, to + 1);
+  }
+
+  async ltrim(key, start, stop) {
+    const list = this.lists.get(key);
+    if (!list) return 'OK';
+    const [from, to] = listRange(list.length, start, stop);
+    if (from > to) {
+      this.lists.delete(key);
+    } else {
+      this.lists.set(key, list.slice(from, to + 1));
+    }
+    return 'OK';
+  }
+
+  async llen(key) {
+    const list = this.lists.get(key);
+    return list ? list.length : 0;
+  }
+
+  async publish() {
+    return 0;
+  }
+
+  subscribe() {}
+
+  unsubscribe() {}
+}
+
+/**
+ * Cliente del almacén para workers: cada comando viaja por IPC al primario
+ */
+export class ClusterStateAdapter {
+  constructor() {
+    this.nextId = 0;
+    this.pending = new Map();  // id -> { resolve, reject, timer }
+    this.handlers = new Map(); // canal -> Set<handler>
+
+    process.on('message', (msg) => {
+      if (!msg || typeof msg !== 'object') return;
+      if (msg.type === 'state:reply') this.onReply(msg);
+      else if (msg.type === 'state:message') this.onMessage(msg);
+    });
+
+    for (const command of COMMANDS) {
+      this[command] = (...args) => this.call(command, args);
+    }
+  }
+
+  call(command, args) {
+    return new Promise((resolve, reject) => {
+      const id = ++this.nextId;
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Sin respuesta del almacén de estado (${command})`));
+      }, STATE_TIMEOUT_MS);
+      this.pending.set(id, { resolve, reject, timer });
+      process.send({ type: 'state:command', id, command, args });
+    });
+  }
+
+  onReply({ id, result, error }) {
+    const request = this.pending.get(id);
+    if (!request) return;
+    clearTimeout(request.timer);
+    this.pending.delete(id);
+    if (error) request.reject(new Error(error));
+    else request.resolve(result);
+  }
+
+  onMessage({ channel, message }) {
+    const handlers = this.handlers.get(channel);
+    if (!handlers) return;
+    for (const handler of handlers) {
+      try {
+        handler(message);
+      } catch (error) {
+        logger.error(`Error procesando mensaje de ${channel}:`, error);
+      }
+    }
+  }
+
+  async publish(channel, message) {
+    process.send({ type: 'state:publish', channel, message });
+    return 1;
+  }
+
+  subscribe(channel, handler) {
+    let handlers = this.handlers.get(channel);
+    if (!handlers) {
+      handlers = new Set();
+      this.handlers.set(channel, handlers);
+      process.send({ type: 'state:subscribe', channel });
+    }
+    handlers.add(handler);
+  }
+
+  unsubscribe(channel, handler) {
+    const handlers = this.handlers.get(channel);
+    if (!handlers) return;
+    handlers.delete(handler);
+    if (handlers.size === 0) {
+      this.handlers.delete(channel);
+      process.send({ type: 'state:unsubscribe', channel });
+    }
+  }
+}
+
+/**
+ * Lado primario: ejecuta los comandos de los workers sobre un almacén en
+ * memoria y reparte los mensajes pub/sub entre workers suscritos.
+ */
+export class StateServer {
+  constructor() {
+    this.store = new MemoryStateAdapter();
+    this.channels = new Map(); // canal -> Set<worker>
+  }
+
+  attach(worker) {
+    worker.on('message', (msg) => {
+      if (!msg || typeof msg !== 'object') return;
+      switch (msg.type) {
+        case 'state:command':
+          this.execute(worker, msg);
+          break;
+        case 'state:publish':
+          this.publish(msg.channel, msg.message, worker);
+          break;
+        case 'state:subscribe':
+          if (!this.channels.has(msg.channel)) this.channels.set(msg.channel, new Set());
+          this.channels.get(msg.channel).add(worker);
+          break;
+        case 'state:unsubscribe':
+          this.channels.get(msg.channel)?.delete(worker);
+          break;
+      }
+    });
+  }
+
+  async execute(worker, { id, command, args }) {
+    try {
+      if (!COMMANDS.includes(command)) {
+        throw new Error(`Comando no soportado: ${command}`);
+      }
+      const result = await this.store[command](...args);
+      if (worker.isConnected()) worker.send({ type: 'state:reply', id, result });
+    } catch (error) {
+      if (worker.isConnected()) worker.send({ type: 'state:reply', id, error: error.message });
+    }
+  }
+
+  /**
+   * Entrega un mensaje a los workers suscritos (excepto al emisor)
+   */
+  publish(channel, message, sender = null) {
+    const subscribers = this.channels.get(channel);
+    if (!subscribers) return 0;
+    let delivered = 0;
+    for (const worker of subscribers) {
+      if (worker === sender || !worker.isConnected()) continue;
+      worker.send({ type: 'state:message', channel, message });
+      delivered++;
+    }
+    return delivered;
+  }
+
+  detach(worker) {
+    for (const subscribers of this.channels.values()) {
+      subscribers.delete(worker);
+    }
+  }
+}
+
+export default IS_CLUSTERED ? new ClusterStateAdapter() : new MemoryStateAdapter();
@@ -0,0 +1,347 @@
+import { spawn } from 'child_process';
+import { platform } from 'os';
+import logger from '../utils/logger.js';
+import { Mp4FragmentParser } from '../utils/videoFraming.js';
+import { screenEncoderRestartsTotal } from '../utils/metrics.js';
+
+/**
+ * Motor de captura de vídeo (SCREEN_ENGINE=ffmpeg).
+ *
+ * Un único proceso ffmpeg por perfil captura el escritorio (x11grab en Linux,
+ * avfoundation en macOS, gdigrab en Windows) y lo codifica en H.264 por
+ * software (libx264 ultrafast/zerolatency) como MP4 fragmentado, un fragmento
+ * por frame. Funciona sin GPU, p. ej. bajo Xvfb (DISPLAY=:99), y con
+ * SCREEN_SOURCE=synthetic usa la fuente testsrc2 de ffmpeg.
+ *
+ * ffmpeg no admite forzar un keyframe en caliente: se mantiene en memoria el
+ * GOP actual (desde el último keyframe) y un espectador nuevo lo recibe junto
+ * al segmento de inicialización, así puede empezar a decodificar al momento.
+ * VIDEO_KEYFRAME_INTERVAL acota lo que hay que reenviar.
+ */
+
+// Fuente de prueba sin escritorio (igual que el motor de capturas JPEG)
+const SYNTHETIC_SOURCE = process.env.SCREEN_SOURCE === 'synthetic';
+const SYNTHETIC_SIZE = process.env.SCREEN_SYNTHETIC_SIZE || '1920x1080';
+
+// Segundos entre keyframes (tamaño máximo del GOP que recibe un espectador nuevo)
+const KEYFRAME_INTERVAL = parseFloat(process.env.VIDEO_KEYFRAME_INTERVAL) || 2;
+
+// Límite de bitrate opcional (p. ej. 4M); sin él manda el CRF derivado de la calidad
+const MAX_BITRATE = process.env.VIDEO_MAX_BITRATE || null;
+
+// Reinicio del codificador si termina por su cuenta (backoff exponencial)
+const RESTART_DELAY = 1000;
+const MAX_RESTART_DELAY = 30000;
+
+// Un GOP que supera este tamaño deja de guardarse hasta el siguiente keyframe
+const MAX_GOP_BYTES = 16 * 1024 * 1024;
+
+// Intervalo mínimo entre reenvíos del GOP
+const REPLAY_INTERVAL = 250;
+
+export class VideoCaptureLoop {
+  constructor(capture, options = {}) {
+    this.capture = capture;
+    this.key = capture.getProfileKey();
+    this.fps = options.maxFps || parseInt(process.env.SCREEN_MAX_FPS) || 15;
+
+    this.subscribers = new Set();
+    this.running = false;
+    this.process = null;
+    this.restartDelay = RESTART_DELAY;
+    this.restartTimer = null;
+    this.lastReplay = 0;
+
+    // Estado del stream actual: cada arranque de ffmpeg es una generación nueva
+    this.generation = 0;
+    this.seq = 0;
+    this.init = null;
+    this.gop = [];
+    this.gopBytes = 0;
+
+    this.stats = {
+      frames: 0,
+      keyframes: 0,
+      bytes: 0,
+      restarts: 0,
+      errors: 0
+    };
+  }
+
+  /**
+   * Argumentos de entrada de FFmpeg según la plataforma
+   */
+  getInputArgs() {
+    const framerate = this.fps.toString();
+
+    if (SYNTHETIC_SOURCE) {
+      return ['-re', '-f', 'lavfi', '-i', `testsrc2=size=${SYNTHETIC_SIZE}:rate=${framerate}`];
+    }
+
+    const os = platform();
+
+    switch (os) {
+      case 'linux': {
+        // X11 (también Xvfb). VIDEO_SIZE limita el área capturada desde la esquina superior izquierda
+        const args = ['-f', 'x11grab', '-draw_mouse', '1', '-framerate', framerate];
+        if (process.env.VIDEO_SIZE) args.push('-video_size', process.env.VIDEO_SIZE);
+        return [...args, '-i', process.env.DISPLAY || ':0'];
+      }
+
+      case 'darwin':
+        // macOS - AVFoundation ("Capture screen 0" sin audio)
+        return [
+          '-f', 'avfoundation', '-capture_cursor', '1', '-framerate', framerate,
+          '-i', `${process.env.VIDEO_DEVICE || 'Capture screen 0'}:none`
+        ];
+
+      case 'win32':
+        // Windows - GDI
+        return ['-f', 'gdigrab', '-framerate', framerate, '-i', 'desktop'];
+
+      default:
+        throw new Error(`Plataforma no soportada: ${os}`);
+    }
+  }
+
+  /**
+   * Argumentos de codificación/salida: H.264 sin B-frames ni lookahead,
+   * un fragmento MP4 por frame
+   */
+  getOutputArgs() {
+    const { quality, scaleFactor, maxWidth } = this.capture.getSettings();
+    // Calidad 100 -> CRF 18, calidad 10 -> CRF 45
+    const crf = Math.round(18 + (100 - quality) * 0.3);
+    const bitrateArgs = MAX_BITRATE ? ['-maxrate', MAX_BITRATE, '-bufsize', MAX_BITRATE] : [];
+
+    return [
+      '-vf', `scale='min(${maxWidth},trunc(iw*${scaleFactor}/2)*2)':-2,format=yuv420p`,
+      '-c:v', 'libx264',
+      '-preset', 'ultrafast',
+      '-tune', 'zerolatency',
+      '-profile:v', 'baseline',
+      '-crf', crf.toString(),
+      ...bitrateArgs,
+      '-g', Math.max(1, Math.round(this.fps * KEYFRAME_INTERVAL)).toString(),
+      '-an',
+      '-flush_packets', '1',
+      '-movflags', 'empty_moov+default_base_moof+frag_every_frame',
+      '-f', 'mp4',
+      'pipe:1'
+    ];
+  }
+
+  /**
+   * Obtiene el comando FFmpeg completo
+   */
+  getFFmpegCommand() {
+    return ['-hide_banner', '-loglevel', 'error', ...this.getInputArgs(), ...this.getOutputArgs()];
+  }
+
+  start() {
+    if (this.running) return;
+    this.running = true;
+    this.spawnEncoder();
+  }
+
+  stop() {
+    this.running = false;
+    clearTimeout(this.restartTimer);
+    this.restartTimer = null;
+
+    const ffmpeg = this.process;
+    this.process = null;
+    if (ffmpeg) {
+      ffmpeg.kill('SIGTERM');
+      // Forzar cierre después de 2 segundos si no responde
+      setTimeout(() => {
+        if (ffmpeg.exitCode === null && ffmpeg.signalCode === null) {
+          ffmpeg.kill('SIGKILL');
+        }
+      }, 2000).unref();
+    }
+
+    this.init = null;
+    this.gop = [];
+    this.gopBytes = 0;
+    logger.info(`🎬 Codificador de pantalla detenido (${this.key})`);
+  }
+
+  spawnEncoder() {
+    let ffmpeg;
+    try {
+      ffmpeg = spawn('ffmpeg', this.getFFmpegCommand(), { stdio: ['ignore', 'pipe', 'pipe'] });
+    } catch (error) {
+      this.handleExit(null, error);
+      return;
+    }
+
+    this.process = ffmpeg;
+    logger.info(`🎬 Codificador de pantalla iniciado (${platform()}, ${this.key}, ${this.fps} fps)`);
+
+    const parser = new Mp4FragmentParser();
+
+    ffmpeg.stdout.on('data', (chunk) => {
+      if (this.process !== ffmpeg) return;
+      try {
+        for (const segment of parser.push(chunk)) {
+          if (segment.type === 'init') this.handleInit(segment);
+          else this.handleFragment(segment);
+        }
+      } catch (error) {
+        // Flujo corrupto: relanzar el codificador desde cero
+        logger.error(`Error en la salida de FFmpeg vídeo: ${error.message}`);
+        ffmpeg.kill('SIGKILL');
+      }
+    });
+
+    // Manejar errores de FFmpeg
+    ffmpeg.stderr.on('data', (data) => {
+      const message = data.toString();
+      if (message.includes('Error') || message.includes('error')) {
+        logger.error(`FFmpeg vídeo error: ${message}`);
+      }
+    });
+
+    ffmpeg.on('error', (error) => {
+      if (this.process === ffmpeg) this.handleExit(null, error);
+    });
+
+    ffmpeg.on('close', (code) => {
+      if (this.process === ffmpeg) this.handleExit(code);
+    });
+  }
+
+  /**
+   * ffmpeg ha terminado sin que se pidiera: avisar y relanzar con backoff
+   */
+  handleExit(code, error = null) {
+    this.process = null;
+    if (!this.running) return;
+
+    this.stats.errors++;
+    if (error) {
+      logger.error(`Error iniciando FFmpeg vídeo: ${error.message}`);
+    } else {
+      logger.warn(`FFmpeg vídeo cerrado con código: ${code}`);
+    }
+    for (const subscriber of this.subscribers) {
+      subscriber.sendError(error && error.code === 'ENOENT'
+        ? 'FFmpeg no está instalado en el servidor'
+        : 'Error al capturar pantalla');
+    }
+
+    const delay = this.restartDelay;
+    this.restartDelay = Math.min(this.restartDelay * 2, MAX_RESTART_DELAY);
+    logger.warn(`⚠️ Reiniciando codificador de pantalla en ${delay}ms (${this.key})`);
+
+    this.restartTimer = setTimeout(() => {
+      this.restartTimer = null;
+      if (!this.running) return;
+      this.stats.restarts++;
+      screenEncoderRestartsTotal.inc();
+      this.spawnEncoder();
+    }, delay);
+  }
+
+  handleInit({ data, codec, width, height }) {
+    this.restartDelay = RESTART_DELAY;
+    this.generation++;
+    this.gop = [];
+    this.gopBytes = 0;
+    this.init = {
+      type: 'init',
+      format: 'fmp4',
+      generation: this.generation,
+      codec,
+      data,
+      width,
+      height,
+      timestamp: Date.now()
+    };
+    this.deliver(this.init);
+  }
+
+  handleFragment({ data, key }) {
+    if (!this.init) return;
+
+    const frame = {
+      type: 'video',
+      format: 'fmp4',
+      generation: this.generation,
+      seq: ++this.seq,
+      key,
+      data,
+      width: this.init.width,
+      height: this.init.height,
+      timestamp: Date.now()
+    };
+
+    this.stats.frames++;
+    this.stats.bytes += data.length;
+    if (key) {
+      this.stats.keyframes++;
+      this.gop = [];
+      this.gopBytes = 0;
+    }
+    // Sin keyframe inicial el GOP no sirve; si crece demasiado se descarta
+    if (key || this.gop.length > 0) {
+      this.gop.push(frame);
+      this.gopBytes += data.length;
+      if (this.gopBytes > MAX_GOP_BYTES) {
+        this.gop = [];
+        this.gopBytes = 0;
+      }
+    }
+
+    this.deliver(frame);
+  }
+
+  deliver(frame) {
+    let needsInit = false;
+    for (const subscriber of this.subscribers) {
+      if (!subscriber.push(frame)) needsInit = true;
+    }
+    if (needsInit) this.requestKeyframe();
+  }
+
+  /**
+   * Reenvía el segmento de inicialización y el GOP actual. Los suscriptores
+   * que ya los tienen los ignoran (generación y secuencia). Las peticiones
+   * seguidas se agrupan: quien se quede sin init lo vuelve a pedir con el
+   * siguiente frame
+   */
+  requestKeyframe() {
+    const now = Date.now();
+    if (!this.init || now - this.lastReplay < REPLAY_INTERVAL) return;
+    this.lastReplay = now;
+    for (const subscriber of this.subscribers) {
+      subscriber.push(this.init);
+      for (const frame of this.gop) {
+        subscriber.push(frame);
+      }
+    }
+  }
+
+  /**
+   * El codificador produce frames a ritmo fijo; no hay nada que acelerar
+   */
+  boost() {}
+
+  getStats() {
+    return {
+      profile: this.key,
+      engine: 'ffmpeg',
+      settings: this.capture.getSettings(),
+      subscribers: this.subscribers.size,
+      fps: this.fps,
+      codec: this.init ? this.init.codec : null,
+      width: this.init ? this.init.width : 0,
+      height: this.init ? this.init.height : 0,
+      gopFrames: this.gop.length,
+      ...this.stats
+    };
+  }
+}
+
+export default VideoCaptureLoop;
@@ -0,0 +1,193 @@
+/**
+ * Separación en frames y agrupación en lotes de la salida de ffmpeg.
+ *
+ * - PCM (s16le): bytes crudos, se cortan en lotes de duración fija.
+ * - Opus: contenedor Ogg; se extraen los paquetes Opus (se omiten OpusHead/OpusTags).
+ * - AAC: frames ADTS completos (WebCodecs los decodifica sin descripción).
+ */
+
+const OGG_CAPTURE = Buffer.from('OggS');
+const OGG_HEADER_SIZE = 27;
+
+/**
+ * Extrae paquetes de un flujo Ogg que llega en trozos arbitrarios
+ */
+export class OggPacketParser {
+  constructor() {
+    this.buffer = Buffer.alloc(0);
+    this.partial = [];     // segmentos de un paquete que continúa en la página siguiente
+    this.packetCount = 0;
+  }
+
+  push(chunk) {
+    this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+    const packets = [];
+
+    while (true) {
+      const start = this.buffer.indexOf(OGG_CAPTURE);
+      if (start === -1) {
+        // Conservar por si "OggS" quedó cortado al final
+        this.buffer = this.buffer.subarray(Math.max(0, this.buffer.length - 3));
+        break;
+      }
+      if (start > 0) this.buffer = this.buffer.subarray(start);
+      if (this.buffer.length < OGG_HEADER_SIZE) break;
+
+      const segmentCount = this.buffer[26];
+      const headerSize = OGG_HEADER_SIZE + segmentCount;
+      if (this.buffer.length < headerSize) break;
+
+      const lacing = this.buffer.subarray(OGG_HEADER_SIZE, headerSize);
+      const bodySize = lacing.reduce((sum, value) => sum + value, 0);
+      if (this.buffer.length < headerSize + bodySize) break;
+
+      const continued = (this.buffer[5] & 0x01) !== 0;
+      if (!continued) this.partial = [];
+
+      let offset = headerSize;
+      let packetStart = offset;
+      for (const value of lacing) {
+        offset += value;
+        if (value < 255) {
+          this.partial.push(this.buffer.subarray(packetStart, offset));
+          const packet = this.partial.length === 1 ? Buffer.from(this.partial[0]) : Buffer.concat(this.partial);
+          this.partial = [];
+          this.packetCount++;
+          // Los dos primeros paquetes son cabeceras (OpusHead, OpusTags)
+          if (this.packetCount > 2) packets.push(packet);
+          packetStart = offset;
+        }
+      }
+      if (packetStart < offset) {
+        this.partial.push(Buffer.from(this.buffer.subarray(packetStart, offset)));
+      }
+
+      this.buffer = this.buffer.subarray(headerSize + bodySize);
+    }
+
+    return packets;
+  }
+}
+
+/**
+ * Extrae frames ADTS (AAC) de un flujo que llega en trozos arbitrarios
+ */
+export class AdtsFrameParser {
+  constructor() {
+    this.buffer = Buffer.alloc(0);
+  }
+
+  push(chunk) {
+    this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+    const frames = [];
+    let offset = 0;
+
+    while (this.buffer.length - offset >= 7) {
+      // Sincronización 0xFFF
+      if (this.buffer[offset] !== 0xFF || (this.buffer[offset + 1] & 0xF0) !== 0xF0) {
+        offset++;
+        continue;
+      }
+      const length = ((this.buffer[offset + 3] & 0x03) << 11)
+        | (this.buffer[offset + 4] << 3)
+        | ((this.buffer[offset + 5] & 0xE0) >> 5);
+      if (length < 7) {
+        offset++;
+        continue;
+      }
+      if (this.buffer.length - offset < length) break;
+
+      frames.push(Buffer.from(this.buffer.subarray(offset, offset + length)));
+      offset += length;
+    }
+
+    this.buffer = this.buffer.subarray(offset);
+    return frames;
+  }
+}
+
+/**
+ * Agrupa frames en lotes de duración fija con número de secuencia
+ */
+export class AudioBatcher {
+  constructor({ codec, sampleRate, channels, batchMs, onBatch }) {
+    this.codec = codec;
+    this.sampleRate = sampleRate;
+    this.channels = channels;
+    this.batchUs = batchMs * 1000;
+    this.onBatch = onBatch;
+
+    this.frames = [];
+    this.durationUs = 0;
+    this.seq = 0;
+
+    if (codec === 'opus') {
+      this.parser = new OggPacketParser();
+      this.frameDurationUs = 20000; // -frame_duration 20
+    } else if (codec === 'aac') {
+      this.parser = new AdtsFrameParser();
+      this.frameDurationUs = Math.round((1024 / sampleRate) * 1e6);
+    } else {
+      // PCM: el lote se corta por bytes exactos
+      this.parser = null;
+      this.bytesPerSecond = sampleRate * channels * 2;
+      this.batchBytes = Math.round((this.bytesPerSecond * batchMs) / 1000 / (channels * 2)) * channels * 2;
+      this.pcm = [];
+      this.pcmBytes = 0;
+    }
+  }
+
+  push(chunk) {
+    if (!this.parser) {
+      this.pushPcm(chunk);
+      return;
+    }
+
+    for (const frame of this.parser.push(chunk)) {
+      this.frames.push(frame);
+      this.durationUs += this.frameDurationUs;
+      // Máximo 255 frames por lote (u8 en la cabecera)
+      if (this.durationUs >= this.batchUs || this.frames.length >= 255) {
+        this.flush();
+      }
+    }
+  }
+
+  pushPcm(chunk) {
+    this.pcm.push(chunk);
+    this.pcmBytes += chunk.length;
+
+    while (this.pcmBytes >= this.batchBytes) {
+      const all = this.pcm.length === 1 ? this.pcm[0] : Buffer.concat(this.pcm);
+      const batch = all.subarray(0, this.batchBytes);
+      const rest = all.subarray(this.batchBytes);
+      this.pcm = rest.length ? [rest] : [];
+      this.pcmBytes = rest.length;
+
+      this.frames = [batch];
+      this.durationUs = Math.round((batch.length / this.bytesPerSecond) * 1e6);
+      this.flush();
+    }
+  }
+
+  flush() {
+    if (this.frames.length === 0) return;
+
+    const frames = this.frames;
+    const data = frames.length === 1 ? frames[0] : Buffer.concat(frames);
+    this.seq++;
+
+    this.onBatch(data, {
+      seq: this.seq,
+      timestamp: Date.now(),
+      codec: this.codec,
+      sampleRate: this.sampleRate,
+      channels: this.channels,
+      frames: frames.map(frame => frame.length),
+      duration: this.durationUs
+    });
+
+    this.frames = [];
+    this.durationUs = 0;
+  }
+}
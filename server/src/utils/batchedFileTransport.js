@@ -0,0 +1,148 @@
+import winston from 'winston';
+import fs from 'fs';
+
+const MESSAGE = Symbol.for('message');
+
+// Tras un error de escritura (p. ej. disco lleno) se descartan líneas durante este tiempo
+const ERROR_BACKOFF_MS = 30000;
+
+/**
+ * Transporte de winston que escribe a archivo en lotes asíncronos.
+ *
+ * Las líneas se acumulan en memoria y se escriben con un único appendFile
+ * cada `flushInterval` ms (o antes si el lote supera `flushBytes`). El buffer
+ * está acotado: si el disco no da abasto o falla, las líneas sobrantes se
+ * descartan y se deja constancia con una sola línea al reanudar. El archivo
+ * rota por tamaño (archivo.log -> archivo.log.1 -> ... -> archivo.log.N).
+ */
+export default class BatchedFileTransport extends winston.Transport {
+  constructor({
+    filename,
+    maxSize = 10 * 1024 * 1024,
+    maxFiles = 5,
+    flushInterval = 200,
+    flushBytes = 64 * 1024,
+    maxBufferBytes = 1024 * 1024,
+    ...options
+  }) {
+    super(options);
+    this.filename = filename;
+    this.maxSize = maxSize;
+    this.maxFiles = maxFiles;
+    this.flushInterval = flushInterval;
+    this.flushBytes = flushBytes;
+    this.maxBufferBytes = maxBufferBytes;
+
+    this.pending = [];
+    this.pendingBytes = 0;
+    this.dropped = 0;
+    this.pausedUntil = 0;
+    this.timer = null;
+    this.flushing = null;
+
+    try {
+      this.size = fs.statSync(filename).size;
+    } catch {
+      this.size = 0;
+    }
+
+    // Última oportunidad para lo que quede en memoria (process.exit incluido)
+    process.once('exit', () => this.flushSync());
+  }
+
+  log(info, callback) {
+    const line = `${info[MESSAGE]}\n`;
+
+    if (Date.now() < this.pausedUntil || this.pendingBytes + line.length > this.maxBufferBytes) {
+      this.dropped++;
+    } else {
+      this.pending.push(line);
+      this.pendingBytes += line.length;
+
+      if (this.pendingBytes >= this.flushBytes) {
+        this.flush();
+      } else if (!this.timer) {
+        this.timer = setTimeout(() => this.flush(), this.flushInterval);
+        this.timer.unref();
+      }
+    }
+
+    callback();
+  }
+
+  /**
+   * Escribe todo lo pendiente; las llamadas concurrentes comparten la misma escritura
+   */
+  flush() {
+    clearTimeout(this.timer);
+    this.timer = null;
+
+    if (!this.flushing) {
+      this.flushing = this.writePending().finally(() => {
+        this.flushing = null;
+      });
+    }
+    return this.flushing;
+  }
+
+  async writePending() {
+    while (this.pending.length > 0 || (this.dropped > 0 && Date.now() >= this.pausedUntil)) {
+      const data = this.takeBatch();
+      const bytes = Buffer.byteLength(data);
+
+      try {
+        if (this.size > 0 && this.size + bytes > this.maxSize) {
+          await this.rotate();
+        }
+        await fs.promises.appendFile(this.filename, data);
+        this.size += bytes;
+      } catch (error) {
+        // No se registra con el logger (provocaría más escrituras fallidas)
+        this.dropped += data.split('\n').length - 1;
+        this.pausedUntil = Date.now() + ERROR_BACKOFF_MS;
+        this.emit('warn', error);
+        return;
+      }
+    }
+  }
+
+  takeBatch() {
+    const lines = this.pending;
+    this.pending = [];
+    this.pendingBytes = 0;
+
+    if (this.dropped > 0) {
+      lines.unshift(`${JSON.stringify({
+        level: 'warn',
+        message: `⚠️ ${this.dropped} líneas de log descartadas (buffer lleno o error de escritura)`,
+        timestamp: new Date().toISOString()
+      })}\n`);
+      this.dropped = 0;
+    }
+    return lines.join('');
+  }
+
+  async rotate() {
+    const { filename, maxFiles } = this;
+
+    await fs.promises.unlink(`${filename}.${maxFiles}`).catch(() => {});
+    for (let i = maxFiles - 1; i >= 1; i--) {
+      await fs.promises.rename(`${filename}.${i}`, `${filename}.${i + 1}`).catch(() => {});
+    }
+    await fs.promises.rename(filename, `${filename}.1`).catch(() => {});
+    this.size = 0;
+  }
+
+  flushSync() {
+    if (this.pending.length === 0 && this.dropped === 0) return;
+    try {
+      fs.appendFileSync(this.filename, this.takeBatch());
+    } catch {
+      // El proceso está terminando: no hay dónde informar
+    }
+  }
+
+  close() {
+    this.flushSync();
+  }
+}
@@ -3,6 +3,8 @@ import { fileURLToPath } from 'url';
 import { dirname, join } from 'path';
 import fs from 'fs';
 
+import BatchedFileTransport from './batchedFileTransport.js';
+
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
 
@@ -12,6 +14,21 @@ if (!fs.existsSync(logsDir)) {
   fs.mkdirSync(logsDir, { recursive: true });
 }
 
+// Rotación por tamaño de cada archivo de log
+const MAX_SIZE = (parseInt(process.env.LOG_MAX_SIZE_MB) || 10) * 1024 * 1024;
+const MAX_FILES = parseInt(process.env.LOG_MAX_FILES) || 5;
+
+// Límite por mensaje: tras LOG_RATE_LIMIT repeticiones en la ventana solo se
+// escribe 1 de cada LOG_SAMPLE_EVERY (0 = ninguna) y al cerrar la ventana se
+// resume lo suprimido ("590 mensajes idénticos suprimidos")
+const RATE_LIMIT = parseInt(process.env.LOG_RATE_LIMIT) || 10;
+const RATE_WINDOW_MS = parseInt(process.env.LOG_RATE_WINDOW_MS) || 60000;
+const SAMPLE_EVERY = parseInt(process.env.LOG_SAMPLE_EVERY ?? '100') || 0;
+const MAX_TRACKED_KEYS = 1000;
+
+// En modo cluster cada worker rota su propio archivo
+const fileSuffix = process.env.CLUSTER_WORKER_ID ? `-worker${process.env.CLUSTER_WORKER_ID}` : '';
+
 const logger = winston.createLogger({
   level: process.env.LOG_LEVEL || 'info',
   format: winston.format.combine(
@@ -22,12 +39,16 @@ const logger = winston.createLogger({
   ),
   defaultMeta: { service: 'remote-desktop-server' },
   transports: [
-    new winston.transports.File({ 
-      filename: join(logsDir, 'error.log'), 
-      level: 'error' 
+    new BatchedFileTransport({
+      filename: join(logsDir, `error${fileSuffix}.log`),
+      level: 'error',
+      maxSize: MAX_SIZE,
+      maxFiles: MAX_FILES
     }),
-    new winston.transports.File({ 
-      filename: join(logsDir, 'combined.log') 
+    new BatchedFileTransport({
+      filename: join(logsDir, `combined${fileSuffix}.log`),
+      maxSize: MAX_SIZE,
+      maxFiles: MAX_FILES
     })
   ]
 });
@@ -42,4 +63,83 @@ if (process.env.NODE_ENV !== 'production') {
   }));
 }
 
-export default logger;
\ No newline at end of file
+/**
+ * Clave de un mensaje: nivel + texto + mensaje del error adjunto, si lo hay
+ * (el mismo "Error captura pantalla:" con causas distintas no se agrupa)
+ */
+const messageKey = (level, message, meta) => {
+  const text = message instanceof Error ? message.message : String(message);
+  const error = meta.find(item => item instanceof Error);
+  return `${level}\u0001${text}\u0001${error ? error.message : ''}`;
+};
+
+/**
+ * Contador por clave en ventanas fijas de RATE_WINDOW_MS
+ */
+class LogRateLimiter {
+  constructor(report) {
+    this.report = report;
+    this.windows = new Map(); // clave -> { count, sampled, suppressed }
+    this.startedAt = Date.now();
+    setInterval(() => this.sweep(), RATE_WINDOW_MS).unref();
+  }
+
+  allow(key) {
+    let window = this.windows.get(key);
+    if (!window) {
+      if (this.windows.size >= MAX_TRACKED_KEYS) this.sweep();
+      window = { count: 0, sampled: 0, suppressed: 0 };
+      this.windows.set(key, window);
+    }
+
+    window.count++;
+    if (window.count <= RATE_LIMIT) return true;
+
+    if (SAMPLE_EVERY > 0 && (window.count - RATE_LIMIT) % SAMPLE_EVERY === 0) {
+      window.sampled++;
+      return true;
+    }
+    window.suppressed++;
+    return false;
+  }
+
+  sweep() {
+    const seconds = Math.round((Date.now() - this.startedAt) / 1000);
+    for (const [key, window] of this.windows) {
+      if (window.suppressed > 0) this.report(key, window, seconds);
+    }
+    this.windows.clear();
+    this.startedAt = Date.now();
+  }
+}
+
+const write = {};
+const limiter = new LogRateLimiter((key, { suppressed, sampled }, seconds) => {
+  const [level, text, error] = key.split('\u0001');
+  const sampledNote = sampled > 0 ? ` (${sampled} muestreados)` : '';
+  write[level](
+    `🔇 ${suppressed} mensajes idénticos suprimidos en ${seconds}s${sampledNote}: ${text}${error ? ` ${error}` : ''}`
+  );
+});
+
+// Cada nivel comprueba primero si está activo (sin formatear nada si no lo está)
+// y después el límite por mensaje
+for (const level of Object.keys(logger.levels)) {
+  write[level] = logger[level].bind(logger);
+  logger[level] = (message, ...meta) => {
+    if (!logger.isLevelEnabled(level)) return logger;
+    if (!limiter.allow(messageKey(level, message, meta))) return logger;
+    return write[level](message, ...meta);
+  };
+}
+
+/**
+ * Escribe a disco lo pendiente (p. ej. antes de un cierre controlado)
+ */
+logger.flush = () => Promise.all(
+  logger.transports
+    .filter(transport => transport instanceof BatchedFileTransport)
+    .map(transport => transport.flush())
+);
+
+export default logger;
@@ -0,0 +1,46 @@
+/**
+ * Agrupa mensajes en ráfagas.
+ *
+ * El primer mensaje tras un periodo tranquilo sale inmediatamente; los que
+ * llegan durante los `windowMs` siguientes se entregan juntos al cerrar la
+ * ventana (o antes si se alcanzan `maxBatch`). Con tráfico bajo no añade
+ * latencia y con ráfagas reduce los emits a uno por ventana.
+ */
+export default class MessageBatcher {
+  constructor(flush, { windowMs = 50, maxBatch = 100 } = {}) {
+    this.flush = flush;
+    this.windowMs = windowMs;
+    this.maxBatch = maxBatch;
+    this.pending = [];
+    this.timer = null;
+  }
+
+  push(item) {
+    if (!this.timer) {
+      this.flush([item]);
+      this.openWindow();
+      return;
+    }
+
+    this.pending.push(item);
+    if (this.pending.length >= this.maxBatch) {
+      this.drain();
+    }
+  }
+
+  openWindow() {
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      if (this.pending.length > 0) {
+        this.drain();
+        this.openWindow();
+      }
+    }, this.windowMs);
+  }
+
+  drain() {
+    const items = this.pending;
+    this.pending = [];
+    this.flush(items);
+  }
+}
@@ -0,0 +1,343 @@
+import { monitorEventLoopDelay, performance } from 'perf_hooks';
+
+/**
+ * Métricas en formato de texto de Prometheus (sin dependencias).
+ *
+ * Los contadores e histogramas se actualizan en las rutas críticas con
+ * operaciones O(1) (un Map por combinación de etiquetas), así que pueden
+ * quedarse activos en producción. Los valores que ya mantienen los servicios
+ * (suscriptores, colas, streams) se leen solo al hacer scrape mediante
+ * `collect`.
+ */
+
+// Segundos: de 1 ms a 2,5 s (etapas de captura, latencia de entrada, escrituras)
+export const DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5];
+
+const escapeLabel = (value) => String(value)
+  .replace(/\\/g, '\\\\')
+  .replace(/"/g, '\\"')
+  .replace(/\n/g, '\\n');
+
+const formatLabels = (labels) => {
+  const entries = Object.entries(labels);
+  if (entries.length === 0) return '';
+  return `{${entries.map(([key, value]) => `${key}="${escapeLabel(value)}"`).join(',')}}`;
+};
+
+const formatValue = (value) => {
+  if (value === Infinity) return '+Inf';
+  if (value === -Infinity) return '-Inf';
+  if (Number.isNaN(value)) return 'NaN';
+  return String(value);
+};
+
+class Metric {
+  constructor({ name, help, labelNames = [], collect = null }, type) {
+    this.name = name;
+    this.help = help;
+    this.type = type;
+    this.labelNames = labelNames;
+    this.collectHook = collect;
+    this.values = new Map(); // clave de etiquetas -> valor
+  }
+
+  key(labels) {
+    if (this.labelNames.length === 0) return '';
+    return this.labelNames.map(name => labels[name] ?? '').join('\u0001');
+  }
+
+  labelsFromKey(key) {
+    if (this.labelNames.length === 0) return {};
+    const parts = key.split('\u0001');
+    return Object.fromEntries(this.labelNames.map((name, i) => [name, parts[i]]));
+  }
+
+  reset() {
+    this.values.clear();
+  }
+
+  samples() {
+    return [...this.values.entries()].map(([key, value]) => ({
+      name: this.name,
+      labels: this.labelsFromKey(key),
+      value
+    }));
+  }
+}
+
+export class Counter extends Metric {
+  constructor(config) {
+    super(config, 'counter');
+  }
+
+  inc(labels = {}, value = 1) {
+    if (typeof labels === 'number') {
+      value = labels;
+      labels = {};
+    }
+    const key = this.key(labels);
+    this.values.set(key, (this.values.get(key) || 0) + value);
+  }
+}
+
+export class Gauge extends Metric {
+  constructor(config) {
+    super(config, 'gauge');
+  }
+
+  set(labels = {}, value = 0) {
+    if (typeof labels === 'number') {
+      value = labels;
+      labels = {};
+    }
+    this.values.set(this.key(labels), value);
+  }
+
+  inc(labels = {}, value = 1) {
+    if (typeof labels === 'number') {
+      value = labels;
+      labels = {};
+    }
+    const key = this.key(labels);
+    this.values.set(key, (this.values.get(key) || 0) + value);
+  }
+
+  dec(labels = {}, value = 1) {
+    if (typeof labels === 'number') {
+      value = labels;
+      labels = {};
+    }
+    this.inc(labels, -value);
+  }
+}
+
+export class Histogram extends Metric {
+  constructor(config) {
+    super(config, 'histogram');
+    this.buckets = config.buckets || DEFAULT_BUCKETS;
+  }
+
+  observe(labels = {}, value = 0) {
+    if (typeof labels === 'number') {
+      value = labels;
+      labels = {};
+    }
+    const key = this.key(labels);
+    let entry = this.values.get(key);
+    if (!entry) {
+      entry = { counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 };
+      this.values.set(key, entry);
+    }
+
+    // Solo se incrementa el primer bucket; los acumulados se calculan al exportar
+    let i = 0;
+    while (i < this.buckets.length && value > this.buckets[i]) i++;
+    if (i < this.buckets.length) entry.counts[i]++;
+    entry.sum += value;
+    entry.count++;
+  }
+
+  /**
+   * Devuelve una función que, al llamarla, registra los segundos transcurridos
+   */
+  startTimer(labels = {}) {
+    const start = performance.now();
+    return () => {
+      const seconds = (performance.now() - start) / 1000;
+      this.observe(labels, seconds);
+      return seconds;
+    };
+  }
+
+  samples() {
+    const samples = [];
+    for (const [key, entry] of this.values) {
+      const labels = this.labelsFromKey(key);
+      let cumulative = 0;
+      this.buckets.forEach((bound, i) => {
+        cumulative += entry.counts[i];
+        samples.push({ name: `${this.name}_bucket`, labels: { ...labels, le: String(bound) }, value: cumulative });
+      });
+      samples.push({ name: `${this.name}_bucket`, labels: { ...labels, le: '+Inf' }, value: entry.count });
+      samples.push({ name: `${this.name}_sum`, labels, value: entry.sum });
+      samples.push({ name: `${this.name}_count`, labels, value: entry.count });
+    }
+    return samples;
+  }
+}
+
+export class Registry {
+  constructor() {
+    this.registered = new Map(); // nombre -> métrica
+  }
+
+  register(metric) {
+    if (this.registered.has(metric.name)) {
+      throw new Error(`Métrica duplicada: ${metric.name}`);
+    }
+    this.registered.set(metric.name, metric);
+    return metric;
+  }
+
+  counter(config) {
+    return this.register(new Counter(config));
+  }
+
+  gauge(config) {
+    return this.register(new Gauge(config));
+  }
+
+  histogram(config) {
+    return this.register(new Histogram(config));
+  }
+
+  /**
+   * Familias de métricas (estructura serializable, p. ej. para agregarlas entre workers)
+   */
+  async collect() {
+    const families = [];
+    for (const metric of this.registered.values()) {
+      if (metric.collectHook) {
+        await metric.collectHook.call(metric, metric);
+      }
+      families.push({
+        name: metric.name,
+        help: metric.help,
+        type: metric.type,
+        samples: metric.samples()
+      });
+    }
+    return families;
+  }
+
+  /**
+   * Formato de texto de Prometheus (versión 0.0.4)
+   */
+  static render(families) {
+    const lines = [];
+    for (const family of families) {
+      lines.push(`# HELP ${family.name} ${family.help}`);
+      lines.push(`# TYPE ${family.name} ${family.type}`);
+      for (const sample of family.samples) {
+        lines.push(`${sample.name}${formatLabels(sample.labels)} ${formatValue(sample.value)}`);
+      }
+    }
+    return `${lines.join('\n')}\n`;
+  }
+
+  async metrics() {
+    return Registry.render(await this.collect());
+  }
+}
+
+export const CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8';
+
+const registry = new Registry();
+
+// ---------------------------------------------------------------------------
+// Proceso
+// ---------------------------------------------------------------------------
+
+const eventLoopDelay = monitorEventLoopDelay({ resolution: 20 });
+eventLoopDelay.enable();
+
+registry.gauge({
+  name: 'nodejs_eventloop_lag_seconds',
+  help: 'Retardo del event loop desde el último scrape',
+  labelNames: ['quantile'],
+  collect() {
+    // El histograma está en nanosegundos; se reinicia en cada scrape
+    for (const quantile of [0.5, 0.9, 0.99]) {
+      this.set({ quantile: String(quantile) }, eventLoopDelay.percentile(quantile * 100) / 1e9);
+    }
+    this.set({ quantile: '1' }, eventLoopDelay.max / 1e9);
+    eventLoopDelay.reset();
+  }
+});
+
+registry.gauge({
+  name: 'process_resident_memory_bytes',
+  help: 'Memoria residente del proceso',
+  collect() {
+    this.set(process.memoryUsage.rss());
+  }
+});
+
+registry.gauge({
+  name: 'nodejs_heap_used_bytes',
+  help: 'Heap de V8 en uso',
+  collect() {
+    this.set(process.memoryUsage().heapUsed);
+  }
+});
+
+registry.counter({
+  name: 'process_cpu_seconds_total',
+  help: 'Tiempo de CPU consumido (usuario + sistema)',
+  collect() {
+    const { user, system } = process.cpuUsage();
+    this.values.set('', (user + system) / 1e6);
+  }
+});
+
+// ---------------------------------------------------------------------------
+// Rutas críticas (los servicios las actualizan directamente)
+// ---------------------------------------------------------------------------
+
+export const screenStageSeconds = registry.histogram({
+  name: 'remote_desktop_screen_stage_seconds',
+  help: 'Tiempo por etapa de captura: grab (screenshot), resize, diff, encode y frame (total)',
+  labelNames: ['stage']
+});
+
+export const screenFramesTotal = registry.counter({
+  name: 'remote_desktop_screen_frames_sent_total',
+  help: 'Frames de pantalla emitidos a sockets',
+  labelNames: ['type']
+});
+
+export const screenBytesTotal = registry.counter({
+  name: 'remote_desktop_screen_bytes_sent_total',
+  help: 'Bytes de imagen emitidos a sockets',
+  labelNames: ['type']
+});
+
+export const screenDroppedTotal = registry.counter({
+  name: 'remote_desktop_screen_frames_dropped_total',
+  help: 'Frames descartados o fusionados por congestión de un socket'
+});
+
+export const screenEncoderRestartsTotal = registry.counter({
+  name: 'remote_desktop_screen_encoder_restarts_total',
+  help: 'Reinicios del codificador ffmpeg de pantalla (SCREEN_ENGINE=ffmpeg)'
+});
+
+export const inputLatencySeconds = registry.histogram({
+  name: 'remote_desktop_input_latency_seconds',
+  help: 'Tiempo desde que llega un evento de entrada hasta que se aplica',
+  labelNames: ['event']
+});
+
+export const uploadBytesTotal = registry.counter({
+  name: 'remote_desktop_upload_bytes_total',
+  help: 'Bytes recibidos en subidas de archivos'
+});
+
+export const uploadChunkSeconds = registry.histogram({
+  name: 'remote_desktop_upload_chunk_write_seconds',
+  help: 'Tiempo de escritura a disco de cada chunk de subida'
+});
+
+export const downloadBytesTotal = registry.counter({
+  name: 'remote_desktop_download_bytes_total',
+  help: 'Bytes enviados en descargas de archivos',
+  labelNames: ['status']
+});
+
+export const audioBytesTotal = registry.counter({
+  name: 'remote_desktop_audio_bytes_total',
+  help: 'Bytes de audio producidos por ffmpeg',
+  labelNames: ['codec']
+});
+
+export default registry;
@@ -0,0 +1,75 @@
+import os from 'os';
+import { createInterface } from 'readline';
+import logger from './logger.js';
+import { PUBLIC_ACCESS_ENABLED } from '../config/auth.js';
+
+// Función para preguntar modo de red
+export const askNetworkMode = () => {
+  // Modo fijado por entorno (launcher con varias instancias, pm2, etc.)
+  if (process.env.NETWORK_MODE === 'local') {
+    return Promise.resolve({ host: '127.0.0.1', mode: 'local' });
+  }
+  if (process.env.NETWORK_MODE === 'public') {
+    return Promise.resolve({ host: '0.0.0.0', mode: 'public' });
+  }
+
+  return new Promise((resolve) => {
+    const rl = createInterface({
+      input: process.stdin,
+      output: process.stdout
+    });
+
+    console.log('\n🌐 Seleccione el modo de acceso de red:');
+    console.log('  1. Solo red local (localhost) - Más seguro, solo accesible desde esta computadora');
+    console.log('  2. Cualquier red (público) - Accesible desde cualquier dispositivo en la red\n');
+
+    rl.question('Seleccione una opción (1 o 2): ', (answer) => {
+      rl.close();
+      const choice = answer.trim();
+      if (choice === '1') {
+        console.log('✅ Modo seleccionado: Solo red local (127.0.0.1)\n');
+        resolve({ host: '127.0.0.1', mode: 'local' });
+      } else if (choice === '2') {
+        console.log('⚠️  Modo seleccionado: Acceso público (0.0.0.0) - Cualquier dispositivo en la red puede conectarse\n');
+        resolve({ host: '0.0.0.0', mode: 'public' });
+      } else {
+        console.log('⚠️  Opción inválida. Usando modo seguro: Solo red local\n');
+        resolve({ host: '127.0.0.1', mode: 'local' });
+      }
+    });
+  });
+};
+
+/**
+ * Direcciones IPv4 externas de la máquina
+ */
+export const getNetworkAddresses = () => Object.values(os.networkInterfaces())
+  .flat()
+  .filter(iface => iface.family === 'IPv4' && !iface.internal)
+  .map(iface => iface.address);
+
+/**
+ * Mensajes de arranque (también los usa el proceso primario del cluster)
+ */
+export const logStartup = (networkConfig, port) => {
+  logger.info(`🚀 Servidor remoto ejecutándose en puerto ${port}`);
+  logger.info(`📱 Acceso local: http://localhost:${port}`);
+
+  if (networkConfig.mode === 'public') {
+    const networkInterfaces = getNetworkAddresses();
+
+    if (networkInterfaces.length > 0) {
+      logger.info(`🌐 Acceso de red: http://${networkInterfaces[0]}:${port}`);
+      logger.info(`   (disponible en cualquier dispositivo de la red)`);
+    }
+  } else {
+    logger.info(`🔒 Acceso restringido: Solo localhost (127.0.0.1)`);
+  }
+
+  if (PUBLIC_ACCESS_ENABLED) {
+    logger.info(`🌐 Acceso público internet: Habilitado (máx: ${process.env.MAX_PUBLIC_CONNECTIONS || 5} conexiones)`);
+  } else {
+    logger.info(`🌐 Acceso público internet: Deshabilitado`);
+  }
+  logger.info(`🔒 Modo: ${process.env.NODE_ENV || 'development'}`);
+};
@@ -0,0 +1,202 @@
+import { createReadStream } from 'fs';
+import { randomBytes } from 'crypto';
+import { pipeline } from 'stream/promises';
+
+// Máximo de rangos aceptados en una petición (evita respuestas multipart abusivas)
+const MAX_RANGES = 16;
+
+// Lecturas grandes: menos syscalls y menos chunks por archivo
+const READ_HIGH_WATER_MARK = 1024 * 1024;
+
+/**
+ * ETag a partir de tamaño y fecha de modificación.
+ * Es fuerte para que If-Range permita reanudar descargas.
+ */
+export const fileETag = (stat) => `"${stat.size.toString(16)}-${Math.floor(stat.mtimeMs).toString(16)}"`;
+
+/**
+ * Comprueba If-None-Match / If-Modified-Since (RFC 9110: If-None-Match tiene prioridad)
+ */
+export const isNotModified = (req, etag, mtime) => {
+  const ifNoneMatch = req.headers['if-none-match'];
+  if (ifNoneMatch) {
+    if (ifNoneMatch.trim() === '*') return true;
+    const weak = (tag) => tag.trim().replace(/^W\//, '');
+    return ifNoneMatch.split(',').some(tag => weak(tag) === weak(etag));
+  }
+
+  const ifModifiedSince = req.headers['if-modified-since'];
+  if (ifModifiedSince) {
+    const since = Date.parse(ifModifiedSince);
+    // Las fechas HTTP tienen resolución de segundos
+    return !Number.isNaN(since) && Math.floor(mtime.getTime() / 1000) * 1000 <= since;
+  }
+
+  return false;
+};
+
+/**
+ * If-Range: el rango solo se respeta si el recurso no cambió
+ */
+const isRangeFresh = (req, etag, mtime) => {
+  const ifRange = req.headers['if-range'];
+  if (!ifRange) return true;
+
+  if (ifRange.includes('"')) {
+    // Comparación fuerte: un ETag débil nunca valida If-Range
+    return !etag.startsWith('W/') && ifRange.trim() === etag;
+  }
+
+  const date = Date.parse(ifRange);
+  return !Number.isNaN(date) && Math.floor(mtime.getTime() / 1000) * 1000 <= date;
+};
+
+/**
+ * Interpreta la cabecera Range.
+ * Devuelve null si no hay rango válido (se envía el archivo completo),
+ * -1 si ningún rango es satisfacible, o la lista de rangos ordenados y fusionados.
+ */
+export const parseRange = (header, size) => {
+  if (!header || !header.startsWith('bytes=')) return null;
+
+  const specs = header.slice('bytes='.length).split(',');
+  if (specs.length > MAX_RANGES) return null;
+
+  const ranges = [];
+  for (const spec of specs) {
+    const match = /^\s*(\d*)\s*-\s*(\d*)\s*$/.exec(spec);
+    if (!match || (match[1] === '' && match[2] === '')) return null;
+
+    let start;
+    let end;
+    if (match[1] === '') {
+      // Sufijo: últimos N bytes
+      const length = parseInt(match[2], 10);
+      if (length === 0) continue;
+      start = Math.max(size - length, 0);
+      end = size - 1;
+    } else {
+      start = parseInt(match[1], 10);
+      end = match[2] === '' ? size - 1 : Math.min(parseInt(match[2], 10), size - 1);
+      if (match[2] !== '' && parseInt(match[2], 10) < start) return null;
+    }
+
+    if (start < size && start <= end) {
+      ranges.push({ start, end });
+    }
+  }
+
+  if (ranges.length === 0) return -1;
+
+  // Fusionar rangos solapados o contiguos
+  ranges.sort((a, b) => a.start - b.start);
+  const merged = [ranges[0]];
+  for (const range of ranges.slice(1)) {
+    const last = merged[merged.length - 1];
+    if (range.start <= last.end + 1) {
+      last.end = Math.max(last.end, range.end);
+    } else {
+      merged.push(range);
+    }
+  }
+
+  return merged;
+};
+
+const streamRange = (filepath, res, start, end) => pipeline(
+  createReadStream(filepath, { start, end, highWaterMark: READ_HIGH_WATER_MARK }),
+  res,
+  { end: false }
+);
+
+/**
+ * Envía un archivo respetando Range (206, multirango), If-Range,
+ * If-None-Match / If-Modified-Since (304) y HEAD.
+ */
+export const sendFileWithRanges = async (req, res, filepath, stat, { contentType = 'application/octet-stream' } = {}) => {
+  const etag = fileETag(stat);
+
+  res.setHeader('Accept-Ranges', 'bytes');
+  res.setHeader('ETag', etag);
+  res.setHeader('Last-Modified', stat.mtime.toUTCString());
+  res.setHeader('Cache-Control', 'private, no-cache');
+
+  if (isNotModified(req, etag, stat.mtime)) {
+    res.status(304).end();
+    return { status: 304, bytes: 0 };
+  }
+
+  const ranges = isRangeFresh(req, etag, stat.mtime) ? parseRange(req.headers.range, stat.size) : null;
+
+  if (ranges === -1) {
+    res.setHeader('Content-Range', `bytes */${stat.size}`);
+    res.status(416).end();
+    return { status: 416, bytes: 0 };
+  }
+
+  const isHead = req.method === 'HEAD';
+
+  // Archivo completo
+  if (!ranges) {
+    res.status(200);
+    res.setHeader('Content-Type', contentType);
+    res.setHeader('Content-Length', stat.size);
+    if (isHead || stat.size === 0) {
+      res.end();
+      return { status: 200, bytes: 0 };
+    }
+    await pipeline(createReadStream(filepath, { highWaterMark: READ_HIGH_WATER_MARK }), res);
+    return { status: 200, bytes: stat.size };
+  }
+
+  // Un solo rango
+  if (ranges.length === 1) {
+    const { start, end } = ranges[0];
+    res.status(206);
+    res.setHeader('Content-Type', contentType);
+    res.setHeader('Content-Range', `bytes ${start}-${end}/${stat.size}`);
+    res.setHeader('Content-Length', end - start + 1);
+    if (isHead) {
+      res.end();
+      return { status: 206, bytes: 0 };
+    }
+    await pipeline(
+      createReadStream(filepath, { start, end, highWaterMark: READ_HIGH_WATER_MARK }),
+      res
+    );
+    return { status: 206, bytes: end - start + 1 };
+  }
+
+  // Varios rangos: multipart/byteranges
+  const boundary = randomBytes(12).toString('hex');
+  const parts = ranges.map(({ start, end }, i) => ({
+    start,
+    end,
+    head: `${i === 0 ? '' : '\r\n'}--${boundary}\r\n`
+      + `Content-Type: ${contentType}\r\n`
+      + `Content-Range: bytes ${start}-${end}/${stat.size}\r\n\r\n`
+  }));
+  const tail = `\r\n--${boundary}--\r\n`;
+  const length = parts.reduce(
+    (sum, part) => sum + Buffer.byteLength(part.head) + (part.end - part.start + 1),
+    Buffer.byteLength(tail)
+  );
+
+  res.status(206);
+  res.setHeader('Content-Type', `multipart/byteranges; boundary=${boundary}`);
+  res.setHeader('Content-Length', length);
+  if (isHead) {
+    res.end();
+    return { status: 206, bytes: 0 };
+  }
+
+  let bytes = 0;
+  for (const part of parts) {
+    res.write(part.head);
+    await streamRange(filepath, res, part.start, part.end);
+    bytes += part.end - part.start + 1;
+  }
+  res.end(tail);
+
+  return { status: 206, bytes };
+};
@@ -0,0 +1,162 @@
+/**
+ * Protocolo binario para screen_frame y audio_data.
+ *
+ * Los clientes que se conectan con `auth: { binary: true }` reciben
+ * Buffers como adjuntos binarios de socket.io (sin base64):
+ *
+ *   socket.emit('screen_frame', header, [jpeg, jpeg, ...])
+ *   socket.emit('audio_data', header, chunk)
+ *
+ * Cabecera de pantalla (little endian, 24 + 8 * tiles bytes):
+ *   0  u8  versión          1  u8  tipo (0 = full, 1 = delta, 2 = init, 3 = video)
+ *   2  u8  formato (0 = jpeg, 1 = fmp4)  3  u8  flags (bit 0 = keyframe)
+ *   4  u32 secuencia        8  f64 timestamp (ms)
+ *   16 u16 ancho            18 u16 alto
+ *   20 u16 nº de tiles      22 u16 reservado
+ *   24 + 8*i: x u16, y u16, ancho u16, alto u16
+ *
+ * Con SCREEN_ENGINE=ffmpeg los frames son segmentos de MP4 fragmentado
+ * (H.264): 'init' (ftyp + moov) y 'video' (moof + mdat, uno por frame),
+ * ambos como un único tile que ocupa toda la pantalla.
+ *
+ * Cabecera de audio (little endian, 24 + 4 * frames bytes):
+ *   0  u8  versión          1  u8  códec (0 = pcm_s16le, 1 = opus, 2 = aac)
+ *   2  u8  canales          3  u8  nº de frames del lote
+ *   4  u32 secuencia        8  f64 timestamp (ms)
+ *   16 u32 sample rate      20 u32 duración del lote (µs)
+ *   24 + 4*i: longitud en bytes del frame i (los frames van concatenados)
+ *
+ * El resto de clientes sigue recibiendo el formato JSON con base64.
+ */
+
+export const PROTOCOL_VERSION = 1;
+export const SCREEN_HEADER_SIZE = 24;
+export const SCREEN_TILE_HEADER_SIZE = 8;
+export const AUDIO_HEADER_SIZE = 24;
+export const AUDIO_FRAME_HEADER_SIZE = 4;
+
+const FRAME_TYPES = { full: 0, delta: 1, init: 2, video: 3 };
+const IMAGE_FORMATS = { jpeg: 0, fmp4: 1 };
+const FLAG_KEYFRAME = 0x01;
+const AUDIO_CODECS = { pcm_s16le: 0, opus: 1, aac: 2 };
+
+// Las conversiones se hacen una vez por frame y se comparten entre sockets
+const legacyCache = new WeakMap();
+const binaryCache = new WeakMap();
+
+/**
+ * Indica si el cliente negoció el protocolo binario en el handshake
+ */
+export const wantsBinary = (socket) => {
+  const auth = socket.handshake && socket.handshake.auth;
+  return Boolean(auth && (auth.binary === true || auth.binary === 1 || auth.binary === '1'));
+};
+
+/**
+ * Lista de tiles de un frame (un frame completo es un único tile)
+ */
+const frameTiles = (frame) => {
+  if (frame.type === 'delta') return frame.tiles;
+  return [{ x: 0, y: 0, width: frame.width, height: frame.height, data: frame.data }];
+};
+
+/**
+ * Cabecera + lista de Buffers JPEG para clientes binarios
+ */
+export const encodeScreenFrame = (frame) => {
+  const cached = binaryCache.get(frame);
+  if (cached) return cached;
+
+  const tiles = frameTiles(frame);
+  const header = Buffer.alloc(SCREEN_HEADER_SIZE + SCREEN_TILE_HEADER_SIZE * tiles.length);
+  header.writeUInt8(PROTOCOL_VERSION, 0);
+  header.writeUInt8(FRAME_TYPES[frame.type] ?? 0, 1);
+  header.writeUInt8(IMAGE_FORMATS[frame.format] ?? 0, 2);
+  header.writeUInt8(frame.key ? FLAG_KEYFRAME : 0, 3);
+  header.writeUInt32LE((frame.seq || 0) >>> 0, 4);
+  header.writeDoubleLE(frame.timestamp, 8);
+  header.writeUInt16LE(frame.width, 16);
+  header.writeUInt16LE(frame.height, 18);
+  header.writeUInt16LE(tiles.length, 20);
+
+  tiles.forEach((tile, i) => {
+    const offset = SCREEN_HEADER_SIZE + SCREEN_TILE_HEADER_SIZE * i;
+    header.writeUInt16LE(tile.x, offset);
+    header.writeUInt16LE(tile.y, offset + 2);
+    header.writeUInt16LE(tile.width, offset + 4);
+    header.writeUInt16LE(tile.height, offset + 6);
+  });
+
+  const encoded = { header, buffers: tiles.map(tile => tile.data) };
+  binaryCache.set(frame, encoded);
+  return encoded;
+};
+
+/**
+ * Frame en formato JSON/base64 para clientes antiguos
+ */
+export const toLegacyScreenFrame = (frame) => {
+  const cached = legacyCache.get(frame);
+  if (cached) return cached;
+
+  const legacy = frame.type === 'delta'
+    ? {
+        ...frame,
+        tiles: frame.tiles.map(tile => ({ ...tile, data: tile.data.toString('base64') }))
+      }
+    : { ...frame, data: frame.data.toString('base64') };
+
+  legacyCache.set(frame, legacy);
+  return legacy;
+};
+
+/**
+ * Emite un frame de pantalla en el formato negociado por el socket
+ */
+export const emitScreenFrame = (socket, frame, binary) => {
+  if (binary) {
+    const { header, buffers } = encodeScreenFrame(frame);
+    socket.emit('screen_frame', header, buffers);
+  } else {
+    socket.emit('screen_frame', toLegacyScreenFrame(frame));
+  }
+};
+
+/**
+ * Cabecera de un lote de audio
+ */
+export const encodeAudioHeader = ({ seq, timestamp, sampleRate, channels, codec = 'pcm_s16le', frames = [], duration = 0 }) => {
+  const header = Buffer.alloc(AUDIO_HEADER_SIZE + AUDIO_FRAME_HEADER_SIZE * frames.length);
+  header.writeUInt8(PROTOCOL_VERSION, 0);
+  header.writeUInt8(AUDIO_CODECS[codec] ?? 0, 1);
+  header.writeUInt8(channels, 2);
+  header.writeUInt8(frames.length, 3);
+  header.writeUInt32LE(seq >>> 0, 4);
+  header.writeDoubleLE(timestamp, 8);
+  header.writeUInt32LE(sampleRate, 16);
+  header.writeUInt32LE(duration >>> 0, 20);
+  frames.forEach((length, i) => {
+    header.writeUInt32LE(length, AUDIO_HEADER_SIZE + AUDIO_FRAME_HEADER_SIZE * i);
+  });
+  return header;
+};
+
+/**
+ * Emite un lote de audio en el formato negociado por el socket
+ */
+export const emitAudioChunk = (socket, chunk, info, binary) => {
+  if (binary) {
+    socket.emit('audio_data', encodeAudioHeader(info), chunk);
+  } else {
+    socket.emit('audio_data', {
+      audio: chunk.toString('base64'),
+      timestamp: info.timestamp,
+      seq: info.seq,
+      codec: info.codec || 'pcm_s16le',
+      sampleRate: info.sampleRate,
+      channels: info.channels,
+      frames: info.frames,
+      duration: info.duration
+    });
+  }
+};
@@ -0,0 +1,122 @@
+/**
+ * Separación en fragmentos de la salida MP4 fragmentada de ffmpeg.
+ *
+ * Con `-movflags empty_moov+default_base_moof+frag_every_frame` ffmpeg
+ * escribe primero el segmento de inicialización (ftyp + moov) y después un
+ * fragmento (moof + mdat) por frame. El tamaño de cada caja va en su
+ * cabecera, así que un fragmento se entrega en cuanto llega su último byte
+ * (sin esperar al frame siguiente). El cliente los añade tal cual a un
+ * SourceBuffer de MSE.
+ */
+
+const BOX_HEADER_SIZE = 8;
+
+// Tipos de NAL H.264 (los 5 bits bajos del primer byte)
+const NAL_SLICE = 1;
+const NAL_IDR = 5;
+
+const hex = (value) => value.toString(16).padStart(2, '0').toUpperCase();
+
+/**
+ * Códec RFC 6381 ("avc1.42C01F") y tamaño a partir del moov
+ */
+export const describeInit = (moov) => {
+  const info = { codec: 'avc1.42E01F', width: 0, height: 0 };
+
+  // avcC: versión, perfil, compatibilidad y nivel tras la cabecera de la caja
+  const avcC = moov.indexOf('avcC', 0, 'latin1');
+  if (avcC !== -1 && avcC + 8 <= moov.length) {
+    info.codec = `avc1.${hex(moov[avcC + 5])}${hex(moov[avcC + 6])}${hex(moov[avcC + 7])}`;
+  }
+
+  // Entrada avc1 de stsd: 6 reservados + 2 data_reference_index + 16 predefinidos, luego ancho y alto
+  const avc1 = moov.indexOf('avc1', 0, 'latin1');
+  if (avc1 !== -1 && avc1 + 32 <= moov.length) {
+    info.width = moov.readUInt16BE(avc1 + 28);
+    info.height = moov.readUInt16BE(avc1 + 30);
+  }
+
+  return info;
+};
+
+/**
+ * Indica si el mdat empieza con un frame IDR (NALs con prefijo de 4 bytes)
+ */
+export const isKeyframe = (mdat) => {
+  let offset = BOX_HEADER_SIZE;
+  while (offset + 5 <= mdat.length) {
+    const length = mdat.readUInt32BE(offset);
+    const type = mdat[offset + 4] & 0x1F;
+    if (type === NAL_IDR) return true;
+    if (type === NAL_SLICE) return false;
+    // SEI, SPS, PPS, AUD...: seguir hasta el primer slice
+    offset += 4 + length;
+  }
+  return false;
+};
+
+/**
+ * Extrae segmentos de inicialización y fragmentos de un flujo MP4 que llega
+ * en trozos arbitrarios
+ */
+export class Mp4FragmentParser {
+  constructor() {
+    this.buffer = Buffer.alloc(0);
+    this.ftyp = null;
+    this.moof = null;
+  }
+
+  push(chunk) {
+    this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+    const segments = [];
+
+    while (this.buffer.length >= BOX_HEADER_SIZE) {
+      let size = this.buffer.readUInt32BE(0);
+      const type = this.buffer.toString('latin1', 4, 8);
+
+      if (size === 1) {
+        // Tamaño de 64 bits (no debería darse con un frame por fragmento)
+        if (this.buffer.length < 16) break;
+        size = Number(this.buffer.readBigUInt64BE(8));
+      }
+      if (size < BOX_HEADER_SIZE) {
+        throw new Error(`Caja MP4 inválida: ${type} (${size} bytes)`);
+      }
+      if (this.buffer.length < size) break;
+
+      const box = Buffer.from(this.buffer.subarray(0, size));
+      this.buffer = this.buffer.subarray(size);
+
+      switch (type) {
+        case 'ftyp':
+          this.ftyp = box;
+          break;
+        case 'moov':
+          segments.push({
+            type: 'init',
+            data: this.ftyp ? Buffer.concat([this.ftyp, box]) : box,
+            ...describeInit(box)
+          });
+          break;
+        case 'moof':
+          this.moof = box;
+          break;
+        case 'mdat':
+          if (this.moof) {
+            segments.push({
+              type: 'fragment',
+              data: Buffer.concat([this.moof, box]),
+              key: isKeyframe(box)
+            });
+            this.moof = null;
+          }
+          break;
+        default:
+          // styp, sidx, free, mfra...: el cliente no los necesita
+          break;
+      }
+    }
+
+    return segments;
+  }
+}
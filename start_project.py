@@ -9,16 +9,14 @@ Uso:
     python start_project.py --install  # Instalar dependencias primero
 """
 
+# Solo módulos baratos a nivel de módulo: el resto (asyncio, subprocess,
+# json, hashlib...) se importa dentro de la función que lo necesita para que
+# `--check-only` y `--help` arranquen rápido.
 import os
 import sys
-import subprocess
 import argparse
 import time
 import signal
-import traceback
-from pathlib import Path
-from threading import Thread
-import platform
 
 
 # Colores para terminal
@@ -32,9 +30,16 @@ class Colors:
     ENDC = '\033[0m'
     BOLD = '\033[1m'
 
+IS_WINDOWS = sys.platform == 'win32'
+
 # Contador de errores
 ERROR_COUNT = 0
 
+# Duración de cada fase del launcher (--timings)
+PHASE_TIMINGS = []
+TIMINGS_ENABLED = False
+LAUNCH_START = time.monotonic()
+
 def log_error(message, exception=None, critical=False):
     """Log errors with detailed information"""
     global ERROR_COUNT
@@ -45,6 +50,7 @@ def log_error(message, exception=None, critical=False):
     if exception:
         print(f"{Colors.RED}   Detalles: {str(exception)}{Colors.ENDC}")
         if os.getenv('DEBUG'):
+            import traceback
             print(f"{Colors.YELLOW}   Traceback:{Colors.ENDC}")
             traceback.print_exc()
     
@@ -58,8 +64,35 @@ def log_error(message, exception=None, critical=False):
     
     return False
 
+class timed_phase:
+    """Context manager que registra la duración de una fase del launcher"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        PHASE_TIMINGS.append((self.name, time.monotonic() - self.start))
+        return False
+
+
+def print_timings():
+    """Muestra la duración de cada fase si se pidió --timings"""
+    if not TIMINGS_ENABLED:
+        return
+    print(f"\n{Colors.CYAN}{Colors.BOLD}⏱️  Tiempos por fase:{Colors.ENDC}")
+    for name, elapsed in PHASE_TIMINGS:
+        print(f"   {Colors.CYAN}{name:<24}{Colors.ENDC} {elapsed * 1000:8.1f} ms")
+    total = time.monotonic() - LAUNCH_START
+    print(f"   {Colors.BOLD}{'total':<24}{Colors.ENDC} {total * 1000:8.1f} ms")
+
+
 def safe_run(command, cwd=None, shell=True, check=True, capture_output=True, error_msg=None):
     """Safely run a subprocess command with error handling"""
+    import subprocess
     try:
         result = subprocess.run(
             command,
@@ -93,84 +126,251 @@ def print_banner():
     """
     print(banner)
 
+# Herramientas requeridas: (ejecutable, nombre, prefijo de versión, URL de descarga)
+PREREQUISITE_TOOLS = [
+    ('node', 'Node.js', '', 'https://nodejs.org/'),
+    ('npm', 'npm', 'v', None),
+]
+
+PREREQUISITES_CACHE_FILE = 'prerequisites.json'
+
+
+def get_cache_dir():
+    """Directorio de caché del launcher (XDG_CACHE_HOME o LOCALAPPDATA)"""
+    from pathlib import Path
+    if IS_WINDOWS:
+        base = os.getenv('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+    else:
+        base = os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'remote-desktop-web'
+
+
+def load_json_cache(name):
+    """Lee un archivo JSON de la caché; {} si no existe o está corrupto"""
+    import json
+    try:
+        with open(get_cache_dir() / name, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json_cache(name, data):
+    """Escribe un archivo JSON de la caché de forma atómica"""
+    import json
+    try:
+        cache_dir = get_cache_dir()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = cache_dir / f"{name}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, cache_dir / name)
+    except OSError:
+        pass
+
+
+def get_binary_key(path):
+    """Clave de caché de un ejecutable: ruta real + mtime + tamaño"""
+    real = os.path.realpath(path)
+    stat = os.stat(real)
+    return f"{real}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def probe_tool_version(path):
+    """Ejecuta `<herramienta> --version` sin shell. None si falla"""
+    import subprocess
+    try:
+        result = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def resolve_tool_versions(tools):
+    """Obtiene la versión de cada herramienta, usando la caché y sondeando en paralelo"""
+    import shutil
+    cache = load_json_cache(PREREQUISITES_CACHE_FILE)
+    versions = {}
+    to_probe = []
+
+    for tool in tools:
+        path = shutil.which(tool)
+        if not path:
+            versions[tool] = None
+            continue
+        try:
+            key = get_binary_key(path)
+        except OSError:
+            versions[tool] = None
+            continue
+        entry = cache.get(tool)
+        if entry and entry.get('key') == key:
+            versions[tool] = entry['version']
+        else:
+            to_probe.append((tool, path, key))
+
+    if to_probe:
+        from concurrent import futures
+        with futures.ThreadPoolExecutor(max_workers=len(to_probe)) as pool:
+            probed = pool.map(lambda item: probe_tool_version(item[1]), to_probe)
+            for (tool, _, key), version in zip(to_probe, probed):
+                versions[tool] = version
+                if version:
+                    cache[tool] = {'key': key, 'version': version}
+        save_json_cache(PREREQUISITES_CACHE_FILE, cache)
+
+    return versions
+
+
 def check_prerequisites():
     """Verifica que Node.js y npm estén instalados"""
     print(f"{Colors.YELLOW}🔍 Verificando prerrequisitos...{Colors.ENDC}")
-    
-    # Verificar Node.js
-    try:
-        result = subprocess.run(['node', '--version'], 
-                              capture_output=True, text=True, check=True, shell=True)
-        node_version = result.stdout.strip()
-        print(f"{Colors.GREEN}✅ Node.js: {node_version}{Colors.ENDC}")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print(f"{Colors.RED}❌ Node.js no está instalado{Colors.ENDC}")
-        print(f"{Colors.YELLOW}   Descarga desde: https://nodejs.org/{Colors.ENDC}")
-        return False
 
-    
-    # Verificar npm
-    try:
-        result = subprocess.run(['npm', '--version'], 
-                              capture_output=True, text=True, check=True, shell=True)
-        npm_version = result.stdout.strip()
-        print(f"{Colors.GREEN}✅ npm: v{npm_version}{Colors.ENDC}")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print(f"{Colors.RED}❌ npm no está instalado{Colors.ENDC}")
-        return False
+    versions = resolve_tool_versions([tool for tool, _, _, _ in PREREQUISITE_TOOLS])
+
+    for tool, label, prefix, url in PREREQUISITE_TOOLS:
+        version = versions.get(tool)
+        if not version:
+            print(f"{Colors.RED}❌ {label} no está instalado{Colors.ENDC}")
+            if url:
+                print(f"{Colors.YELLOW}   Descarga desde: {url}{Colors.ENDC}")
+            return False
+        print(f"{Colors.GREEN}✅ {label}: {prefix}{version}{Colors.ENDC}")
 
-    
     # Verificar Python
     python_version = f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
     print(f"{Colors.GREEN}✅ Python: v{python_version}{Colors.ENDC}")
     
     return True
 
+
+# Árboles de dependencias npm del proyecto: (directorio, descripción)
+DEPENDENCY_TREES = [
+    (".", "raíz"),
+    ("server", "servidor"),
+    ("client", "cliente"),
+]
+
+# Archivo donde se guarda el hash de package.json/package-lock.json instalado
+INSTALL_STAMP_FILE = ".install-stamp"
+
+# Máximo de instalaciones npm simultáneas
+MAX_INSTALL_WORKERS = int(os.getenv('INSTALL_WORKERS', '3'))
+
+
+def compute_manifest_hash(tree):
+    """Calcula el hash de package.json y package-lock.json de un árbol"""
+    import hashlib
+    from pathlib import Path
+    digest = hashlib.sha256()
+    for name in ("package.json", "package-lock.json"):
+        manifest = Path(tree) / name
+        digest.update(name.encode('utf-8'))
+        if manifest.exists():
+            digest.update(manifest.read_bytes())
+    return digest.hexdigest()
+
+
+def get_stamp_path(tree):
+    """Ruta del stamp de instalación dentro de node_modules"""
+    from pathlib import Path
+    return Path(tree) / "node_modules" / INSTALL_STAMP_FILE
+
+
+def is_tree_up_to_date(tree):
+    """Indica si node_modules corresponde al lockfile actual del árbol"""
+    stamp = get_stamp_path(tree)
+    if not stamp.exists():
+        return False
+    try:
+        return stamp.read_text(encoding='utf-8').strip() == compute_manifest_hash(tree)
+    except OSError:
+        return False
+
+
+def write_install_stamp(tree):
+    """Guarda el hash del lockfile instalado"""
+    stamp = get_stamp_path(tree)
+    stamp.parent.mkdir(parents=True, exist_ok=True)
+    stamp.write_text(compute_manifest_hash(tree), encoding='utf-8')
+
+
 def check_dependencies():
-    """Verifica si las dependencias están instaladas"""
+    """Verifica si las dependencias están instaladas y al día con su lockfile"""
+    from pathlib import Path
     try:
-        root_node_modules = Path("node_modules").exists()
-        server_node_modules = Path("server/node_modules").exists()
-        client_node_modules = Path("client/node_modules").exists()
-        
-        if not root_node_modules:
-            log_error("No se encontraron dependencias raíz (node_modules)", critical=False)
-        if not server_node_modules:
-            log_error("No se encontraron dependencias del servidor", critical=False)
-        if not client_node_modules:
-            log_error("No se encontraron dependencias del cliente", critical=False)
-        
-        return root_node_modules and server_node_modules and client_node_modules
+        all_ok = True
+        for tree, label in DEPENDENCY_TREES:
+            if not (Path(tree) / "node_modules").exists():
+                log_error(f"No se encontraron dependencias {label} (node_modules)", critical=False)
+                all_ok = False
+            elif not is_tree_up_to_date(tree):
+                print(f"{Colors.YELLOW}⚠️  Dependencias {label} desactualizadas respecto a package.json/lockfile{Colors.ENDC}")
+                all_ok = False
+        return all_ok
     except Exception as e:
         log_error("Error verificando dependencias", e)
         return False
 
 
-def install_dependencies():
-    """Instala todas las dependencias del proyecto"""
+def get_install_command(tree):
+    """Devuelve el comando npm para un árbol: `npm ci` si hay lockfile"""
+    import shutil
+    from pathlib import Path
+    npm = shutil.which('npm') or 'npm'
+    if (Path(tree) / "package-lock.json").exists():
+        return [npm, 'ci', '--no-audit', '--no-fund']
+    return [npm, 'install', '--no-audit', '--no-fund']
+
+
+def install_tree(tree, label, force=False):
+    """Instala un árbol de dependencias. Devuelve (label, estado, segundos)"""
+    start = time.monotonic()
+
+    if not force and is_tree_up_to_date(tree):
+        return label, 'cached', 0.0
+
+    command = get_install_command(tree)
+    result = safe_run(
+        command,
+        cwd=tree,
+        shell=False,
+        error_msg=f"Error instalando dependencias {label}"
+    )
+    elapsed = time.monotonic() - start
+
+    if not result or result.returncode != 0:
+        return label, 'failed', elapsed
+
+    write_install_stamp(tree)
+    return label, command[1], elapsed
+
+
+def install_dependencies(force=False):
+    """Instala las dependencias del proyecto en paralelo, omitiendo árboles sin cambios"""
+    from concurrent import futures
     print(f"\n{Colors.YELLOW}📦 Instalando dependencias...{Colors.ENDC}")
     print(f"{Colors.CYAN}   Esto puede tomar varios minutos...{Colors.ENDC}\n")
-    
+
     success = True
-    
-    # Instalar dependencias raíz
-    print(f"{Colors.BLUE}   → Instalando dependencias raíz...{Colors.ENDC}")
-    result = safe_run(['npm', 'install'], cwd=".", error_msg="Error instalando dependencias raíz")
-    if not result or result.returncode != 0:
-        success = False
-    
-    # Instalar dependencias server
-    print(f"{Colors.BLUE}   → Instalando dependencias del servidor...{Colors.ENDC}")
-    result = safe_run(['npm', 'install'], cwd="server", error_msg="Error instalando dependencias del servidor")
-    if not result or result.returncode != 0:
-        success = False
-    
-    # Instalar dependencias client
-    print(f"{Colors.BLUE}   → Instalando dependencias del cliente...{Colors.ENDC}")
-    result = safe_run(['npm', 'install'], cwd="client", error_msg="Error instalando dependencias del cliente")
-    if not result or result.returncode != 0:
-        success = False
-    
+    workers = max(1, min(MAX_INSTALL_WORKERS, len(DEPENDENCY_TREES)))
+
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = [
+            pool.submit(install_tree, tree, label, force)
+            for tree, label in DEPENDENCY_TREES
+        ]
+        for future in jobs:
+            label, status, elapsed = future.result()
+            if status == 'cached':
+                print(f"{Colors.GREEN}   ✓ Dependencias {label}: sin cambios en el lockfile, se omite{Colors.ENDC}")
+            elif status == 'failed':
+                success = False
+            else:
+                print(f"{Colors.BLUE}   → Dependencias {label} instaladas con npm {status} ({elapsed:.1f}s){Colors.ENDC}")
+
     if success:
         print(f"\n{Colors.GREEN}✅ Todas las dependencias instaladas correctamente{Colors.ENDC}")
         return True
@@ -179,81 +379,528 @@ def install_dependencies():
         return False
 
 
-def run_command(command, cwd, name, color):
-    """Ejecuta un comando y muestra output con color"""
+# Puertos de los servicios
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8443'))
+CLIENT_PORT = int(os.getenv('CLIENT_PORT', '3000'))
+
+# Tiempo máximo de espera hasta que un servicio esté listo (segundos)
+READY_TIMEOUT = float(os.getenv('READY_TIMEOUT', '120'))
+PROBE_INTERVAL = 0.25
+
+# Política de reinicio (mismos nombres que server/ecosystem.config.js de pm2)
+MAX_RESTARTS = 10
+MIN_UPTIME = 10.0
+RESTART_DELAY = 0.5
+MAX_RESTART_DELAY = 30.0
+
+# Tiempo de gracia entre SIGTERM y SIGKILL al detener un grupo de procesos
+KILL_TIMEOUT = 5.0
+
+
+def get_services(instances=1, network_mode=None):
+    """Construye la lista de servicios, en orden de dependencias"""
+    services = []
+
+    for i in range(instances):
+        port = SERVER_PORT + i
+        env = {'PORT': str(port)}
+        if network_mode:
+            env['NETWORK_MODE'] = network_mode
+        services.append({
+            'name': 'SERVER' if i == 0 else f'SERVER-{i + 1}',
+            'command': ['npm', 'run', 'dev'],
+            'cwd': 'server',
+            'env': env,
+            'color': Colors.GREEN,
+            'url': f"http://localhost:{port}",
+            'depends_on': [],
+            'probes': [
+                ('tcp', ('127.0.0.1', port)),
+                ('http', f"http://127.0.0.1:{port}/api/health"),
+            ],
+            'autorestart': True,
+        })
+
+    services.append({
+        'name': 'CLIENT',
+        'command': ['npm', 'start'],
+        'cwd': 'client',
+        'env': {'PORT': str(CLIENT_PORT), 'BROWSER': 'none'},
+        'color': Colors.CYAN,
+        'url': f"http://localhost:{CLIENT_PORT}",
+        'depends_on': ['SERVER'],
+        'probes': [
+            ('tcp', ('127.0.0.1', CLIENT_PORT)),
+        ],
+        'autorestart': True,
+    })
+
+    return services
+
+
+async def probe_tcp(address, timeout=0.5):
+    """Comprueba si un puerto TCP acepta conexiones"""
+    import asyncio
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(*address), timeout)
+        writer.close()
+        await writer.wait_closed()
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+
+async def probe_http(url, timeout=1.0):
+    """Comprueba que el servidor HTTP responde (cualquier código: un 429 o un
+    500 también prueban que está escuchando)"""
+    import asyncio
+    import urllib.parse
+    parts = urllib.parse.urlsplit(url)
     try:
-        process = subprocess.Popen(
-            command,
-            cwd=cwd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, parts.port or 80), timeout
         )
-        
-        prefix = f"{color}[{name}]{Colors.ENDC}"
-        
         try:
-            for line in process.stdout:
-                line = line.rstrip()
-                if line:
-                    print(f"{prefix} {line}")
-        except Exception as e:
-            log_error(f"Error leyendo output de {name}", e, critical=False)
-        
-        process.wait()
-        
-        if process.returncode != 0:
-            log_error(f"El proceso {name} terminó con código {process.returncode}", critical=False)
-        
-        return process.returncode
-        
-    except Exception as e:
-        log_error(f"No se pudo iniciar el proceso {name}", e, critical=False)
-        return -1
+            request = f"GET {parts.path or '/'} HTTP/1.0\r\nHost: {parts.netloc}\r\n\r\n"
+            writer.write(request.encode('ascii'))
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+        finally:
+            writer.close()
+        fields = status_line.split()
+        return len(fields) >= 2 and fields[0].startswith(b'HTTP/')
+    except (OSError, asyncio.TimeoutError):
+        return False
 
 
-def start_services():
-    """Inicia el servidor y cliente en paralelo"""
-    print(f"\n{Colors.YELLOW}🚀 Iniciando servicios...{Colors.ENDC}\n")
-    
-    server_thread = None
-    client_thread = None
-    
-    try:
-        # Crear threads para cada servicio
-        server_thread = Thread(
-            target=run_command,
-            args=(['npm', 'run', 'dev'], 'server', 'SERVER', Colors.GREEN)
+PROBES = {
+    'tcp': probe_tcp,
+    'http': probe_http,
+}
+
+
+# Multiplexor de logs de los procesos hijos
+LOG_READ_SIZE = 64 * 1024
+LOG_FLUSH_INTERVAL = 0.05
+LOG_PARTIAL_TIMEOUT = 0.2
+LOG_BUFFER_MAX_BYTES = 4 * 1024 * 1024
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+
+class RotatingFileSink:
+    """Archivo de log que rota por tamaño (archivo.1 ... archivo.N)"""
+
+    def __init__(self, path, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS):
+        from pathlib import Path
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'ab')
+        self.size = self.file.tell()
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self.file = open(self.path, 'ab')
+        self.size = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def close(self):
+        self.file.close()
+
+
+class LogMultiplexer:
+    """Lee la salida de los hijos por bloques y la vuelca a la terminal por lotes
+
+    Las líneas se acumulan en un buffer circular limitado en bytes; si la
+    terminal no da abasto se descartan las más antiguas en lugar de bloquear
+    los pipes de los procesos hijos.
+    """
+
+    def __init__(self, json_mode=False, log_file=None, max_bytes=LOG_BUFFER_MAX_BYTES,
+                 flush_interval=LOG_FLUSH_INTERVAL):
+        import collections
+        self.json_mode = json_mode
+        self.sink = RotatingFileSink(log_file) if log_file else None
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.buffer = collections.deque()
+        self.buffered_bytes = 0
+        self.dropped = 0
+
+    def emit(self, service, color, line):
+        """Encola una línea de un servicio, descartando las más antiguas si se llena"""
+        record = (time.time(), service, color, line)
+        self.buffer.append(record)
+        self.buffered_bytes += len(line)
+        while self.buffered_bytes > self.max_bytes and self.buffer:
+            _, _, _, old = self.buffer.popleft()
+            self.buffered_bytes -= len(old)
+            self.dropped += 1
+
+    async def pump(self, service, color, stream):
+        """Lee un stream por bloques grandes y lo separa en líneas"""
+        import asyncio
+        pending = b''
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.read(LOG_READ_SIZE), LOG_PARTIAL_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Línea sin salto final (p.ej. un prompt): mostrarla igualmente
+                if pending:
+                    self.emit(service, color, pending.decode('utf-8', errors='replace'))
+                    pending = b''
+                continue
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                line = line.rstrip(b'\r')
+                if line.strip():
+                    self.emit(service, color, line.decode('utf-8', errors='replace'))
+        if pending.strip():
+            self.emit(service, color, pending.decode('utf-8', errors='replace'))
+
+    def format_batch(self, records):
+        """Devuelve (texto para la terminal, bytes para el archivo)"""
+        import json
+        if self.json_mode:
+            text = ''.join(
+                json.dumps({'ts': ts, 'service': service, 'line': line}, ensure_ascii=False) + '\n'
+                for ts, service, _, line in records
+            )
+            return text, text.encode('utf-8')
+
+        terminal = ''.join(f"{color}[{service}]{Colors.ENDC} {line}\n" for _, service, color, line in records)
+        plain = ''.join(
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))} [{service}] {line}\n"
+            for ts, service, _, line in records
         )
-        
-        client_thread = Thread(
-            target=run_command,
-            args=(['npm', 'start'], 'client', 'CLIENT', Colors.CYAN)
+        return terminal, plain.encode('utf-8')
+
+    def write_batch(self, records):
+        terminal, data = self.format_batch(records)
+        sys.stdout.write(terminal)
+        sys.stdout.flush()
+        if self.sink:
+            self.sink.write(data)
+
+    async def flush(self):
+        """Vuelca el contenido del buffer en un único write"""
+        import asyncio
+        if self.dropped:
+            self.emit('LAUNCHER', Colors.YELLOW, f"⚠️  {self.dropped} líneas descartadas (salida demasiado rápida)")
+            self.dropped = 0
+        if not self.buffer:
+            return
+        records = list(self.buffer)
+        self.buffer.clear()
+        self.buffered_bytes = 0
+        # Escribir fuera del bucle para que los lectores sigan vaciando los pipes
+        await asyncio.get_running_loop().run_in_executor(None, self.write_batch, records)
+
+    async def run(self, stopping):
+        """Vuelca el buffer periódicamente hasta que se pida detener"""
+        import asyncio
+        while not stopping.is_set():
+            await self.flush()
+            try:
+                await asyncio.wait_for(stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        await self.flush()
+        if self.sink:
+            self.sink.close()
+
+
+async def wait_exit(process, interval=0.1):
+    """Espera a que termine el proceso aunque sus nietos mantengan los pipes abiertos"""
+    import asyncio
+    # process.wait() no retorna hasta que se cierran los pipes del hijo
+    while process.returncode is None:
+        await asyncio.sleep(interval)
+    return process.returncode
+
+
+class ManagedProcess:
+    """Proceso hijo supervisado: arranque, salida, sondas, reinicio y parada"""
+
+    def __init__(self, service, supervisor):
+        import asyncio
+        self.service = service
+        self.name = service['name']
+        self.supervisor = supervisor
+        self.process = None
+        self.restarts = 0
+        self.ready = asyncio.Event()
+        self.finished = asyncio.Event()
+        # Las sondas agotaron READY_TIMEOUT: los dependientes y el resumen dejan de esperar
+        self.unready = asyncio.Event()
+        self.ready_time = None
+
+    async def spawn(self):
+        """Lanza el comando sin shell en su propio grupo de procesos"""
+        import subprocess
+        import shutil
+        import asyncio
+        command = list(self.service['command'])
+        command[0] = shutil.which(command[0]) or command[0]
+
+        env = dict(os.environ)
+        env.update(self.service.get('env', {}))
+
+        kwargs = {}
+        if IS_WINDOWS:
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs['start_new_session'] = True
+
+        self.process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=self.service['cwd'],
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            **kwargs
         )
-        
-        # Iniciar threads
-        server_thread.daemon = True
-        client_thread.daemon = True
-        
-        server_thread.start()
-        time.sleep(2)  # Esperar 2 segundos para que el servidor inicie primero
-        client_thread.start()
-        
+        return self.process
+
+    async def pump_output(self, process):
+        """Reenvía la salida del proceso al multiplexor de logs"""
+        await self.supervisor.log.pump(self.name, self.service['color'], process.stdout)
+
+    async def wait_until_ready(self, process, timeout=READY_TIMEOUT):
+        """Espera a que pasen todas las sondas del servicio.
+
+        Al agotar el timeout marca el servicio como no disponible pero sigue
+        sondeando: si responde más tarde pasa a listo.
+        """
+        import asyncio
+        start = time.monotonic()
+        pending = list(self.service['probes'])
+        self.unready.clear()
+
+        while pending:
+            if process.returncode is not None:
+                return
+            if not self.unready.is_set() and time.monotonic() - start > timeout:
+                log_error(f"{self.name} no respondió a las sondas en {timeout:.0f}s", critical=False)
+                self.unready.set()
+            kind, target = pending[0]
+            if await PROBES[kind](target):
+                pending.pop(0)
+            else:
+                await asyncio.sleep(PROBE_INTERVAL)
+
+        self.ready_time = time.monotonic() - start
+        self.unready.clear()
+        self.ready.set()
+        print(f"{Colors.GREEN}✅ {self.name} listo en {self.ready_time:.2f}s → {self.service['url']}{Colors.ENDC}")
+
+    async def wait_for_dependencies(self):
+        """Espera a que las dependencias estén listas. False si alguna terminó antes"""
+        import asyncio
+        deps = [self.supervisor.processes[name] for name in self.service['depends_on']]
+        warned = set()
+        while not all(dep.ready.is_set() for dep in deps):
+            if self.supervisor.stopping.is_set():
+                return False
+            failed = [dep.name for dep in deps if dep.finished.is_set()]
+            if failed:
+                log_error(f"{self.name} no se inicia: {', '.join(failed)} terminó antes de estar listo", critical=False)
+                return False
+            # Un servicio lento (primer build, pregunta de modo de red) puede estar
+            # listo más tarde: se avisa una vez y se sigue esperando
+            unready = [dep.name for dep in deps if dep.unready.is_set() and dep.name not in warned]
+            if unready:
+                print(f"{Colors.YELLOW}⏳ {self.name} sigue esperando a {', '.join(unready)} (no respondió a tiempo){Colors.ENDC}")
+                warned.update(unready)
+            await asyncio.sleep(PROBE_INTERVAL)
+        return True
+
+    async def run(self):
+        """Bucle de vida del servicio con reinicio automático y backoff"""
+        import asyncio
+        try:
+            if not await self.wait_for_dependencies():
+                return
+
+            delay = RESTART_DELAY
+            while not self.supervisor.stopping.is_set():
+                try:
+                    process = await self.spawn()
+                except OSError as e:
+                    log_error(f"No se pudo iniciar el proceso {self.name}", e, critical=False)
+                    return
+
+                started = time.monotonic()
+                output = asyncio.ensure_future(self.pump_output(process))
+                probe = asyncio.ensure_future(self.wait_until_ready(process))
+
+                await wait_exit(process)
+                # Limpiar nietos que sigan vivos y mantengan el pipe abierto
+                self.signal_group(signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(asyncio.shield(output), KILL_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.signal_group(getattr(signal, 'SIGKILL', None))
+                    await output
+                probe.cancel()
+                self.ready.clear()
+
+                if self.supervisor.stopping.is_set():
+                    return
+
+                log_error(f"El proceso {self.name} terminó con código {process.returncode}", critical=False)
+
+                if not self.service.get('autorestart'):
+                    return
+                if time.monotonic() - started >= MIN_UPTIME:
+                    delay = RESTART_DELAY
+                    self.restarts = 0
+                if self.restarts >= MAX_RESTARTS:
+                    log_error(f"{self.name} superó {MAX_RESTARTS} reinicios. No se reiniciará", critical=False)
+                    return
+
+                self.restarts += 1
+                print(f"{Colors.YELLOW}🔁 Reiniciando {self.name} en {delay:.1f}s (intento {self.restarts}/{MAX_RESTARTS}){Colors.ENDC}")
+                try:
+                    await asyncio.wait_for(self.supervisor.stopping.wait(), delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, MAX_RESTART_DELAY)
+        finally:
+            self.finished.set()
+
+    def signal_group(self, sig):
+        """Envía una señal a todo el grupo de procesos del hijo"""
+        import subprocess
+        process = self.process
+        if process is None:
+            return
+        try:
+            if IS_WINDOWS:
+                if sig == signal.SIGTERM:
+                    process.send_signal(signal.CTRL_BREAK_EVENT)
+                else:
+                    subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)], capture_output=True)
+            else:
+                os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    async def terminate(self, timeout=KILL_TIMEOUT):
+        """Detiene el grupo de procesos: SIGTERM y, si no responde, SIGKILL"""
+        import asyncio
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        self.signal_group(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(wait_exit(process), timeout)
+        except asyncio.TimeoutError:
+            print(f"{Colors.YELLOW}⚠️  {self.name} no respondió a SIGTERM, forzando cierre...{Colors.ENDC}")
+            self.signal_group(getattr(signal, 'SIGKILL', None))
+            await wait_exit(process)
+
+
+class Supervisor:
+    """Bucle asyncio único que gestiona todos los procesos hijos"""
+
+    def __init__(self, services, log_format='text', log_file=None):
+        self.services = services
+        self.processes = {}
+        self.stopping = None
+        self.log_format = log_format
+        self.log_file = log_file
+        self.log = None
+
+    def request_stop(self):
+        if not self.stopping.is_set():
+            print(f"\n\n{Colors.YELLOW}🛑 Deteniendo servicios...{Colors.ENDC}")
+            self.stopping.set()
+
+    def install_signal_handlers(self):
+        import asyncio
+        if IS_WINDOWS:
+            return
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.request_stop)
+
+    async def report_when_ready(self):
+        """Muestra el resumen cuando todos los servicios están listos o han fallado"""
+        import asyncio
+        start = time.monotonic()
+        for managed in self.processes.values():
+            while not (managed.ready.is_set() or managed.finished.is_set() or managed.unready.is_set()):
+                await asyncio.sleep(PROBE_INTERVAL)
+
         print(f"\n{Colors.GREEN}{Colors.BOLD}✨ Servicios iniciados:{Colors.ENDC}")
-        print(f"   {Colors.CYAN}→ Servidor: http://localhost:8443{Colors.ENDC}")
-        print(f"   {Colors.CYAN}→ Cliente:  http://localhost:3000{Colors.ENDC}")
+        for managed in self.processes.values():
+            label = managed.name.capitalize()
+            if managed.ready.is_set():
+                print(f"   {Colors.CYAN}→ {label}: {managed.service['url']} ({managed.ready_time:.2f}s){Colors.ENDC}")
+            else:
+                print(f"   {Colors.RED}→ {label}: no disponible{Colors.ENDC}")
+        PHASE_TIMINGS.append(('servicios listos', time.monotonic() - start))
+        print_timings()
         print(f"\n{Colors.YELLOW}Presiona Ctrl+C para detener todos los servicios{Colors.ENDC}\n")
-        
-        # Mantener el script corriendo
-        while (server_thread and server_thread.is_alive()) or (client_thread and client_thread.is_alive()):
-            time.sleep(1)
-            
+
+    async def run(self):
+        import asyncio
+        self.stopping = asyncio.Event()
+        self.log = LogMultiplexer(json_mode=self.log_format == 'json', log_file=self.log_file)
+        self.processes = {service['name']: ManagedProcess(service, self) for service in self.services}
+        self.install_signal_handlers()
+
+        flusher = asyncio.ensure_future(self.log.run(self.stopping))
+        tasks = [asyncio.ensure_future(managed.run()) for managed in self.processes.values()]
+        report = asyncio.ensure_future(self.report_when_ready())
+        stop = asyncio.ensure_future(self.stopping.wait())
+
+        try:
+            await asyncio.wait([stop, asyncio.gather(*tasks)], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.stopping.set()
+            report.cancel()
+            await asyncio.gather(*(managed.terminate() for managed in self.processes.values()))
+            await asyncio.gather(*tasks, return_exceptions=True)
+            stop.cancel()
+            await flusher
+            await self.log.close()
+
+
+def start_services(instances=1, network_mode=None, log_format='text', log_file=None):
+    """Inicia los servicios bajo el supervisor asyncio"""
+    import asyncio
+    print(f"\n{Colors.YELLOW}🚀 Iniciando servicios...{Colors.ENDC}\n")
+
+    supervisor = Supervisor(get_services(instances, network_mode), log_format, log_file)
+    try:
+        asyncio.run(supervisor.run())
+        print(f"{Colors.GREEN}✅ Servicios detenidos{Colors.ENDC}")
     except KeyboardInterrupt:
-        print(f"\n\n{Colors.YELLOW}🛑 Deteniendo servicios...{Colors.ENDC}")
-        time.sleep(1)
+        # Windows: Ctrl+C llega como KeyboardInterrupt; asyncio.run ya canceló las tareas
         print(f"{Colors.GREEN}✅ Servicios detenidos{Colors.ENDC}")
     except Exception as e:
         log_error("Error en los servicios", e, critical=False)
@@ -267,12 +914,12 @@ def setup_signal_handlers():
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
-    if platform.system() != 'Windows':
+    if not IS_WINDOWS:
         signal.signal(signal.SIGTERM, signal_handler)
 
 def main():
     """Función principal"""
-    global ERROR_COUNT
+    global ERROR_COUNT, TIMINGS_ENABLED
     
     parser = argparse.ArgumentParser(
         description='Inicia el proyecto Remote Desktop Web desde VS Code',
@@ -282,7 +929,9 @@ Ejemplos:
   python start_project.py           # Iniciar proyecto
   python start_project.py --install # Instalar dependencias e iniciar
   python start_project.py -i        # Instalar dependencias e iniciar (corto)
+  python start_project.py --force-install # Reinstalar todo aunque no haya cambios
   python start_project.py --debug   # Modo debug con información detallada de errores
+  python start_project.py --instances 3 --network local # 3 servidores (8443-8445)
         """
     )
     parser.add_argument(
@@ -290,6 +939,32 @@ Ejemplos:
         action='store_true',
         help='Instalar dependencias antes de iniciar'
     )
+    parser.add_argument(
+        '--force-install',
+        action='store_true',
+        help='Reinstalar todas las dependencias aunque el lockfile no haya cambiado'
+    )
+    parser.add_argument(
+        '--instances',
+        type=int,
+        default=1,
+        help='Número de instancias del servidor (puertos consecutivos desde 8443)'
+    )
+    parser.add_argument(
+        '--network',
+        choices=['local', 'public'],
+        help='Modo de red del servidor sin preguntar (por defecto: local si hay varias instancias)'
+    )
+    parser.add_argument(
+        '--log-format',
+        choices=['text', 'json'],
+        default='text',
+        help='Formato de la salida de los servicios (json: una línea JSON por mensaje)'
+    )
+    parser.add_argument(
+        '--log-file',
+        help='Guardar también la salida de los servicios en este archivo (rota a los 10MB)'
+    )
     parser.add_argument(
         '--check-only',
         action='store_true',
@@ -300,8 +975,19 @@ Ejemplos:
         action='store_true',
         help='Mostrar información detallada de errores (traceback)'
     )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Mostrar cuánto tarda cada fase del launcher'
+    )
     
     args = parser.parse_args()
+    TIMINGS_ENABLED = args.timings
+
+    if args.instances < 1:
+        parser.error('--instances debe ser al menos 1')
+    if args.instances > 1 and not args.network:
+        args.network = 'local'
     
     # Habilitar modo debug si se solicita
     if args.debug:
@@ -316,7 +1002,9 @@ Ejemplos:
         print_banner()
         
         # Verificar prerrequisitos
-        if not check_prerequisites():
+        with timed_phase('prerrequisitos'):
+            prerequisites_ok = check_prerequisites()
+        if not prerequisites_ok:
             print(f"\n{Colors.RED}❌ Prerrequisitos no cumplidos. Abortando.{Colors.ENDC}")
             if ERROR_COUNT > 0:
                 print(f"{Colors.YELLOW}   Se encontraron {ERROR_COUNT} errores.{Colors.ENDC}")
@@ -327,11 +1015,16 @@ Ejemplos:
                 print(f"\n{Colors.GREEN}✅ Todos los prerrequisitos están instalados{Colors.ENDC}")
             else:
                 print(f"\n{Colors.YELLOW}⚠️  Se encontraron {ERROR_COUNT} problemas.{Colors.ENDC}")
+            print_timings()
             sys.exit(0)
         
         # Verificar/instalar dependencias
-        if args.install or not check_dependencies():
-            if not install_dependencies():
+        with timed_phase('dependencias'):
+            needs_install = args.install or args.force_install or not check_dependencies()
+        if needs_install:
+            with timed_phase('instalación'):
+                installed = install_dependencies(force=args.force_install)
+            if not installed:
                 print(f"\n{Colors.RED}❌ No se pudieron instalar las dependencias{Colors.ENDC}")
                 if ERROR_COUNT > 0:
                     print(f"{Colors.YELLOW}   Total de errores: {ERROR_COUNT}{Colors.ENDC}")
@@ -340,7 +1033,12 @@ Ejemplos:
             print(f"{Colors.GREEN}✅ Dependencias ya instaladas{Colors.ENDC}")
         
         # Iniciar servicios
-        start_services()
+        start_services(
+            instances=args.instances,
+            network_mode=args.network,
+            log_format=args.log_format,
+            log_file=args.log_file
+        )
         
     except Exception as e:
         log_error("Error fatal en la ejecución principal", e, critical=True)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de versiones de update.py contra un servidor HTTP local
+que hace de API de GitHub (sin red).
+
+    python -m unittest discover tests
+"""
+
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update  # noqa: E402
+
+ETAG = '"v1"'
+COMMIT = {
+    'sha': 'abcdef1234567890abcdef1234567890abcdef12',
+    'commit': {
+        'message': 'Primera línea\n\nDetalle',
+        'author': {'name': 'Dev', 'date': '2024-05-01T10:00:00Z'}
+    }
+}
+
+
+class FakeGitHub(BaseHTTPRequestHandler):
+    """Responde con el estado configurado en el servidor y guarda las cabeceras recibidas"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        status = server.status
+
+        if status == 200 and self.headers.get('If-None-Match') == ETAG and server.honor_etag:
+            status = 304
+
+        self.send_response(status)
+        if status == 200:
+            body = json.dumps(COMMIT).encode('utf-8')
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    """Puerto local sin nadie escuchando (para simular conexión rechazada)"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class UpdateCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGitHub)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/repos/x/commits/main"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = {key: os.environ.get(key) for key in ('XDG_CACHE_HOME', 'LOCALAPPDATA', 'UPDATE_API_URL')}
+        os.environ['XDG_CACHE_HOME'] = self.tmp.name
+        os.environ['LOCALAPPDATA'] = self.tmp.name
+        os.environ['UPDATE_API_URL'] = self.url
+        # GITHUB_API_URL se lee al importar: apuntarlo al servidor local
+        self.original_url = update.GITHUB_API_URL
+        update.GITHUB_API_URL = self.url
+
+        self.server.requests.clear()
+        self.server.status = 200
+        self.server.honor_etag = True
+
+    def tearDown(self):
+        update.GITHUB_API_URL = self.original_url
+        for key, value in self.env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        self.tmp.cleanup()
+
+    def fetch(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return update.get_remote_commit(**kwargs)
+
+    def entry(self):
+        return update.load_cache().get(update.GITHUB_API_URL)
+
+    def expire(self):
+        """Marca la entrada de caché como fuera del TTL"""
+        cache = update.load_cache()
+        cache[update.GITHUB_API_URL]['fetched_at'] = time.time() - 3600
+        update.save_cache(cache)
+        return cache[update.GITHUB_API_URL]['fetched_at']
+
+    def test_200_stores_etag(self):
+        commit = self.fetch(ttl=300)
+        self.assertEqual(commit['sha'], 'abcdef1')
+        self.assertEqual(commit['message'], 'Primera línea')
+        self.assertNotIn('cached', commit)
+        self.assertEqual(self.entry()['etag'], ETAG)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertNotIn('If-None-Match', self.server.requests[0])
+
+    def test_within_ttl_makes_no_request(self):
+        self.fetch(ttl=300)
+        commit = self.fetch(ttl=300)
+        self.assertTrue(commit['cached'])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_revalidation_304(self):
+        self.fetch(ttl=300)
+        expired_at = self.expire()
+
+        commit = self.fetch(ttl=300)
+        self.assertTrue(commit['cached'])
+        self.assertEqual(commit['sha'], 'abcdef1')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[1].get('If-None-Match'), ETAG)
+        self.assertGreater(self.entry()['fetched_at'], expired_at)
+
+    def test_refresh_bypasses_ttl(self):
+        self.fetch(ttl=300)
+        self.fetch(ttl=300, refresh=True)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[1].get('If-None-Match'), ETAG)
+
+    def test_offline_with_cache(self):
+        self.fetch(ttl=300)
+        self.expire()
+        commit = self.fetch(offline=True)
+        self.assertTrue(commit['cached'])
+        self.assertEqual(commit['sha'], 'abcdef1')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_offline_without_cache(self):
+        self.assertIsNone(self.fetch(offline=True))
+        self.assertEqual(self.server.requests, [])
+
+    def test_error_status_falls_back_to_cache(self):
+        self.fetch(ttl=300)
+        for status in (403, 500, 503):
+            with self.subTest(status=status):
+                self.expire()
+                self.server.status = status
+                commit = self.fetch(ttl=300)
+                self.assertTrue(commit['cached'])
+                self.assertEqual(commit['sha'], 'abcdef1')
+
+    def test_error_status_without_cache(self):
+        self.server.status = 403
+        self.assertIsNone(self.fetch(ttl=300))
+
+    def test_connection_error_falls_back_to_cache(self):
+        update.GITHUB_API_URL = f"http://127.0.0.1:{free_port()}/repos/x/commits/main"
+        update.save_cache({update.GITHUB_API_URL: {
+            'etag': ETAG,
+            'last_modified': None,
+            'fetched_at': time.time() - 3600,
+            'commit': update.parse_commit(COMMIT)
+        }})
+
+        commit = self.fetch(ttl=300)
+        self.assertTrue(commit['cached'])
+        self.assertEqual(commit['sha'], 'abcdef1')
+
+    def test_connection_error_without_cache(self):
+        update.GITHUB_API_URL = f"http://127.0.0.1:{free_port()}/repos/x/commits/main"
+        self.assertIsNone(self.fetch(ttl=300))
+
+
+if __name__ == '__main__':
+    unittest.main()
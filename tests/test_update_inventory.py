@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Pruebas del inventario de despliegues de update.py (--inventory).
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update  # noqa: E402
+
+
+class LoadInventoryTest(unittest.TestCase):
+
+    def load(self, text):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'hosts.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            return update.load_inventory(path)
+
+    def test_comments_and_blank_lines(self):
+        dirs = self.load('# flota\n\n   # sangrado\n/srv/a\n/srv/b   # comentario\n')
+        self.assertEqual(dirs, ['/srv/a', '/srv/b'])
+
+    def test_hash_inside_path_is_kept(self):
+        dirs = self.load('/srv/app#2\n/srv/app#3 # tercero\n')
+        self.assertEqual(dirs, ['/srv/app#2', '/srv/app#3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,15 +10,11 @@ Uso:
 """
 
 
+# urllib/SSL, json y subprocess se importan dentro de la función que los usa
+# para no pagar su coste de arranque si el script termina antes.
 import os
 import sys
-import subprocess
 import argparse
-import json
-import urllib.request
-import urllib.error
-import traceback
-from pathlib import Path
 
 # Contador de errores global
 ERROR_COUNT = 0
@@ -45,6 +41,7 @@ def log_error(message, exception=None, critical=False):
     if exception:
         print(f"{Colors.RED}   Detalles: {str(exception)}{Colors.ENDC}")
         if os.getenv('DEBUG'):
+            import traceback
             print(f"{Colors.YELLOW}   Traceback:{Colors.ENDC}")
             traceback.print_exc()
     
@@ -60,6 +57,7 @@ def log_error(message, exception=None, critical=False):
 
 def safe_run(command, cwd=None, shell=True, check=False, capture_output=True, error_msg=None):
     """Safely run a subprocess command with error handling"""
+    import subprocess
     try:
         result = subprocess.run(
             command,
@@ -82,7 +80,14 @@ def safe_run(command, cwd=None, shell=True, check=False, capture_output=True, er
 
 # Configuración
 GITHUB_REPO = "litelis/remote-desktop-web"
-GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/commits/main"
+GITHUB_API_URL = os.getenv('UPDATE_API_URL', f"https://api.github.com/repos/{GITHUB_REPO}/commits/main")
+
+# Caché de la consulta a GitHub (segundos de validez antes de revalidar)
+CACHE_FILE = 'update-cache.json'
+CACHE_TTL = int(os.getenv('UPDATE_CACHE_TTL', '300'))
+
+# Hilos para leer el HEAD de los despliegues en modo flota
+FLEET_WORKERS = 32
 
 
 def print_banner():
@@ -98,30 +103,115 @@ def print_banner():
     """
     print(banner)
 
-def get_remote_commit():
-    """Obtiene el último commit del repositorio remoto"""
+def get_cache_path():
+    """Archivo de caché de respuestas de la API (XDG_CACHE_HOME o LOCALAPPDATA)"""
+    if sys.platform == 'win32':
+        base = os.getenv('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    else:
+        base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'remote-desktop-web', CACHE_FILE)
+
+
+def load_cache():
+    """Lee la caché de respuestas; {} si no existe o está corrupta"""
+    import json
     try:
-        req = urllib.request.Request(
-            GITHUB_API_URL,
-            headers={
-                'User-Agent': 'RemoteDesktopWeb-Updater',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-        )
+        with open(get_cache_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    """Guarda la caché de respuestas de forma atómica"""
+    import json
+    path = get_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log_error("No se pudo guardar la caché de versiones", e)
+
+
+def parse_commit(data):
+    """Extrae los campos que mostramos de la respuesta de la API de commits"""
+    return {
+        'sha': data['sha'][:7],
+        'full_sha': data['sha'],
+        'message': data['commit']['message'].split('\n')[0],
+        'author': data['commit']['author']['name'],
+        'date': data['commit']['author']['date'][:10]
+    }
+
+
+def get_remote_commit(offline=False, refresh=False, ttl=None):
+    """Obtiene el último commit del repositorio remoto
+
+    Las respuestas se guardan en caché con su ETag/Last-Modified: dentro del
+    TTL no se hace ninguna petición, y después se revalida con una petición
+    condicional (un 304 no consume cuota de la API de GitHub).
+    """
+    import json
+    import time
+    import urllib.request
+    import urllib.error
+
+    ttl = CACHE_TTL if ttl is None else ttl
+    cache = load_cache()
+    entry = cache.get(GITHUB_API_URL)
+
+    if offline:
+        if not entry:
+            log_error("Modo offline: no hay versión remota en caché")
+            return None
+        return dict(entry['commit'], cached=True)
+
+    if entry and not refresh and time.time() - entry.get('fetched_at', 0) < ttl:
+        return dict(entry['commit'], cached=True)
+
+    headers = {
+        'User-Agent': 'RemoteDesktopWeb-Updater',
+        'Accept': 'application/vnd.github.v3+json'
+    }
+    if os.getenv('GITHUB_TOKEN'):
+        headers['Authorization'] = f"Bearer {os.getenv('GITHUB_TOKEN')}"
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        req = urllib.request.Request(GITHUB_API_URL, headers=headers)
         
         with urllib.request.urlopen(req, timeout=10) as response:
             data = json.loads(response.read().decode('utf-8'))
-            return {
-                'sha': data['sha'][:7],
-                'full_sha': data['sha'],
-                'message': data['commit']['message'].split('\n')[0],
-                'author': data['commit']['author']['name'],
-                'date': data['commit']['author']['date'][:10]
+            commit = parse_commit(data)
+            cache[GITHUB_API_URL] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+                'commit': commit
             }
+            save_cache(cache)
+            return commit
     except urllib.error.HTTPError as e:
+        if e.code == 304 and entry:
+            entry['fetched_at'] = time.time()
+            save_cache(cache)
+            return dict(entry['commit'], cached=True)
+        if entry:
+            # Límite de peticiones o error del servidor: usar la última respuesta conocida
+            print(f"{Colors.YELLOW}⚠️  GitHub respondió {e.code}, usando la versión en caché{Colors.ENDC}")
+            return dict(entry['commit'], cached=True)
         log_error(f"Error HTTP al consultar GitHub: {e.code}", e)
         return None
     except urllib.error.URLError as e:
+        if entry:
+            print(f"{Colors.YELLOW}⚠️  Sin conexión ({e.reason}), usando la versión en caché{Colors.ENDC}")
+            return dict(entry['commit'], cached=True)
         log_error(f"Error de conexión: {e.reason}", e)
         return None
     except Exception as e:
@@ -132,6 +222,11 @@ def get_remote_commit():
 def get_git_commit():
 
     """Obtiene el commit actual de git"""
+    try:
+        return read_git_head('.')['sha'][:7]
+    except (OSError, ValueError):
+        pass
+
     result = safe_run(
         ['git', 'rev-parse', '--short', 'HEAD'],
         error_msg="Error obteniendo commit actual de git"
@@ -141,6 +236,66 @@ def get_git_commit():
     return None
 
 
+def resolve_git_dir(repo_dir):
+    """Devuelve (git_dir, common_dir) de un checkout, soportando worktrees (.git como archivo)"""
+    dot_git = os.path.join(repo_dir, '.git')
+    if os.path.isfile(dot_git):
+        with open(dot_git, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if not content.startswith('gitdir:'):
+            raise ValueError(f"{dot_git} no es un gitfile válido")
+        git_dir = os.path.normpath(os.path.join(repo_dir, content[len('gitdir:'):].strip()))
+    elif os.path.isdir(dot_git):
+        git_dir = dot_git
+    else:
+        raise FileNotFoundError(f"No es un repositorio git: {repo_dir}")
+
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, 'commondir')
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, 'r', encoding='utf-8') as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    return git_dir, common_dir
+
+
+def read_ref(common_dir, ref):
+    """Resuelve una ref (refs/heads/...) como archivo suelto o en packed-refs"""
+    ref_path = os.path.join(common_dir, *ref.split('/'))
+    if os.path.isfile(ref_path):
+        with open(ref_path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+
+    packed = os.path.join(common_dir, 'packed-refs')
+    if os.path.isfile(packed):
+        with open(packed, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith(('#', '^')):
+                    continue
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    return None
+
+
+def read_git_head(repo_dir='.'):
+    """Lee el commit de HEAD directamente de .git, sin lanzar procesos git
+
+    Devuelve {'sha', 'branch'}; branch es None con HEAD desacoplado.
+    """
+    git_dir, common_dir = resolve_git_dir(repo_dir)
+    with open(os.path.join(git_dir, 'HEAD'), 'r', encoding='utf-8') as f:
+        head = f.read().strip()
+
+    if head.startswith('ref:'):
+        ref = head[len('ref:'):].strip()
+        sha = read_ref(common_dir, ref)
+        if not sha:
+            raise ValueError(f"No se pudo resolver {ref}")
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+        return {'sha': sha, 'branch': branch}
+    return {'sha': head, 'branch': None}
+
+
 def check_git_installed():
     """Verifica que git esté instalado"""
     result = safe_run(['git', '--version'], error_msg="Git no está instalado")
@@ -153,6 +308,107 @@ def check_git_repo():
     return result is not None and result.returncode == 0
 
 
+def load_inventory(path):
+    """Lee un inventario: un directorio de despliegue por línea.
+
+    Son comentarios las líneas que empiezan por # y lo que sigue a un #
+    precedido de espacio; un # dentro de la ruta (/srv/app#2) se conserva.
+    """
+    import re
+    base = os.path.dirname(os.path.abspath(path))
+    dirs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#'):
+                continue
+            line = re.sub(r'\s+#.*$', '', line)
+            if line:
+                dirs.append(os.path.join(base, os.path.expanduser(line)))
+    return dirs
+
+
+def check_deployment(repo_dir, remote_sha):
+    """Compara el HEAD de un despliegue con el commit remoto.
+
+    Solo se leen los archivos de .git (sin lanzar git por despliegue), así que
+    no se sabe si un HEAD distinto está por detrás, por delante o divergido:
+    se marca como 'differs'.
+    """
+    result = {'path': repo_dir, 'sha': None, 'branch': None, 'status': 'error', 'error': None}
+    try:
+        head = read_git_head(repo_dir)
+    except (OSError, ValueError) as e:
+        result['error'] = str(e)
+        return result
+
+    result['sha'] = head['sha'][:7]
+    result['branch'] = head['branch']
+    result['status'] = 'up-to-date' if head['sha'] == remote_sha else 'differs'
+    return result
+
+
+def check_fleet(dirs, remote, workers=FLEET_WORKERS):
+    """Resuelve en paralelo el HEAD de todos los despliegues contra un único commit remoto"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(dirs)))) as pool:
+        return list(pool.map(lambda d: check_deployment(d, remote['full_sha']), dirs))
+
+
+def print_fleet_table(results, remote):
+    """Muestra el estado de la flota como tabla"""
+    labels = {
+        'up-to-date': f"{Colors.GREEN}✅ al día{Colors.ENDC}",
+        'differs': f"{Colors.YELLOW}⚠️  distinto del remoto{Colors.ENDC}",
+        'error': f"{Colors.RED}❌ error{Colors.ENDC}",
+    }
+    width = max([len(r['path']) for r in results] + [len('Despliegue')])
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}📊 Flota ({len(results)} despliegues) - remoto {remote['sha']}:{Colors.ENDC}")
+    print(f"   {'Despliegue':<{width}}  {'Local':<8} {'Rama':<16} Estado")
+    for r in results:
+        detail = f" ({r['error']})" if r['error'] else ''
+        print(f"   {r['path']:<{width}}  {r['sha'] or '-':<8} {r['branch'] or '-':<16} {labels[r['status']]}{detail}")
+
+    differs = sum(1 for r in results if r['status'] == 'differs')
+    errors = sum(1 for r in results if r['status'] == 'error')
+    print(f"\n   {Colors.BLUE}Al día:{Colors.ENDC} {len(results) - differs - errors}   "
+          f"{Colors.BLUE}Distintos:{Colors.ENDC} {differs}   {Colors.BLUE}Errores:{Colors.ENDC} {errors}")
+
+
+def run_fleet(args):
+    """Modo flota: consulta el remoto una vez y compara todos los despliegues"""
+    import json
+    import contextlib
+
+    dirs = list(args.fleet or [])
+    if args.inventory:
+        try:
+            dirs.extend(load_inventory(args.inventory))
+        except OSError as e:
+            log_error(f"No se pudo leer el inventario {args.inventory}", e, critical=True)
+    if not dirs:
+        log_error("No se indicó ningún despliegue (--fleet o --inventory)", critical=True)
+
+    # En modo JSON los mensajes van a stderr para no mezclarse con el informe
+    output = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext()
+    with output:
+        if not args.json:
+            print_banner()
+            print(f"{Colors.YELLOW}🌐 Consultando GitHub...{Colors.ENDC}")
+        remote = get_remote_commit(offline=args.offline, refresh=args.refresh, ttl=args.cache_ttl)
+    if not remote:
+        sys.exit(1)
+
+    results = check_fleet(dirs, remote, workers=args.workers)
+
+    if args.json:
+        print(json.dumps({'remote': remote, 'deployments': results}, indent=2))
+    else:
+        print_fleet_table(results, remote)
+
+
 def main():
 
     """Función principal"""
@@ -165,6 +421,10 @@ def main():
 Ejemplos:
   python update.py         # Mostrar información de versiones
   python update.py --debug # Modo debug con información detallada de errores
+  python update.py --offline # Usar solo la versión remota guardada en caché
+  python update.py --refresh # Revalidar con GitHub aunque la caché no haya caducado
+  python update.py --fleet /srv/rdw-1 /srv/rdw-2  # Comprobar varios despliegues
+  python update.py --inventory hosts.txt --json   # Inventario (un directorio por línea), salida JSON
         """
     )
     parser.add_argument(
@@ -172,6 +432,44 @@ Ejemplos:
         action='store_true',
         help='Mostrar información detallada de errores (traceback)'
     )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='No consultar GitHub: usar la última respuesta guardada en caché'
+    )
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Ignorar el TTL de la caché (la petición sigue siendo condicional)'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=int,
+        default=CACHE_TTL,
+        help=f'Segundos de validez de la caché (por defecto: {CACHE_TTL})'
+    )
+    parser.add_argument(
+        '--fleet',
+        nargs='+',
+        metavar='DIR',
+        help='Modo flota: directorios de despliegue a comparar con el remoto'
+    )
+    parser.add_argument(
+        '--inventory',
+        metavar='FILE',
+        help='Modo flota: archivo con un directorio de despliegue por línea'
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Modo flota: mostrar el resultado en JSON'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=FLEET_WORKERS,
+        help=f'Modo flota: lecturas de repositorios en paralelo (por defecto: {FLEET_WORKERS})'
+    )
     
     args = parser.parse_args()
     
@@ -181,6 +479,10 @@ Ejemplos:
         print(f"{Colors.CYAN}🐛 Modo DEBUG habilitado{Colors.ENDC}\n")
     
     try:
+        if args.fleet or args.inventory:
+            run_fleet(args)
+            return
+
         # Imprimir banner
         print_banner()
         
@@ -201,7 +503,7 @@ Ejemplos:
         
         # Obtener commits
         print(f"\n{Colors.YELLOW}🌐 Consultando GitHub...{Colors.ENDC}")
-        remote = get_remote_commit()
+        remote = get_remote_commit(offline=args.offline, refresh=args.refresh, ttl=args.cache_ttl)
         if not remote:
             if ERROR_COUNT > 0:
                 print(f"\n{Colors.RED}❌ Se encontraron {ERROR_COUNT} errores. Abortando.{Colors.ENDC}")
@@ -213,6 +515,8 @@ Ejemplos:
         print(f"\n{Colors.CYAN}{Colors.BOLD}📊 Información de versiones:{Colors.ENDC}")
         print(f"   {Colors.BLUE}Remoto:{Colors.ENDC}  {Colors.GREEN}{remote['sha']}{Colors.ENDC} - {remote['message'][:50]}")
         print(f"   {Colors.BLUE}Autor:{Colors.ENDC}   {remote['author']} ({remote['date']})")
+        if remote.get('cached'):
+            print(f"   {Colors.BLUE}Fuente:{Colors.ENDC}  {Colors.YELLOW}caché local{Colors.ENDC}")
         
         if git_current:
             print(f"   {Colors.BLUE}Local:{Colors.ENDC}   {Colors.CYAN}{git_current}{Colors.ENDC}")